@@ -1,31 +1,49 @@
-import src.pydub_override
 import src.subprocess_handler
+import json
 import logging
 import os
 import sys
+import time
 import tkinter as tk
 from tkinter import messagebox
 
+_START = time.perf_counter()
 
-def setup_tkdnd():
+# Set to a file path to write startup timings there as JSON and exit once the window is
+# interactive (used by src/startup_benchmark.py)
+STARTUP_REPORT_ENV = "M4A_TO_MP3_STARTUP_REPORT"
+
+
+def enable_drag_and_drop(root, app):
+    """Load tkdnd into the running interpreter and register the file list as a drop target"""
     try:
-        import tkinterdnd2
-        root = tkinterdnd2.TkinterDnD.Tk()
+        from tkinterdnd2 import TkinterDnD
+        TkinterDnD.require(root)
+        app.file_list.setup_drag_drop()
         logging.info("TkinterDnD initialized successfully.")
-        return root
-    except ImportError as e:
+    except (ImportError, RuntimeError, tk.TclError) as e:
         logging.error(f"TkinterDnD initialization failed: {e}")
-        root = tk.Tk()
         messagebox.showwarning(
             "Limited Functionality",
             "Drag and drop feature is not available.\nPlease use the browse button to select files."
         )
-        return root
+
+
+def write_startup_report(root, path, timings):
+    """Record time-to-interactive once Tk is idle, then close the window"""
+    timings['interactive'] = time.perf_counter() - _START
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(timings, f)
+    root.destroy()
 
 
 def main():
+    timings = {}
     from src.gui import ConverterGUI
-    root = setup_tkdnd()
+    timings['imports'] = time.perf_counter() - _START
+
+    # A plain Tk root maps the window without waiting for tkdnd to load
+    root = tk.Tk()
     root.title("M4A to MP3 Converter")
     root.minsize(600, 400)
 
@@ -38,8 +56,14 @@ def main():
     root.geometry(f"{window_width}x{window_height}+{x}+{y}")
 
     app = ConverterGUI(root)
+    timings['window'] = time.perf_counter() - _START
+    root.after_idle(enable_drag_and_drop, root, app)
+
+    report_path = os.environ.get(STARTUP_REPORT_ENV)
+    if report_path:
+        root.after_idle(lambda: root.after_idle(write_startup_report, root, report_path, timings))
     root.mainloop()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -2,9 +2,21 @@
 M4A to MP3 Converter application.
 """
 
-from src.gui import ConverterGUI
-from src.converter import AudioConverter
-from src.translations import Translations
+import importlib
 
 __version__ = '1.0.0'
-__all__ = ['ConverterGUI', 'AudioConverter', 'Translations']
\ No newline at end of file
+__all__ = ['ConverterGUI', 'AudioConverter', 'Translations']
+
+# Resolved on first access so the conversion engine (and `python -m src`)
+# can be imported on machines without a display or Tk.
+_LAZY_ATTRIBUTES = {
+    'ConverterGUI': 'src.gui',
+    'AudioConverter': 'src.converter',
+    'Translations': 'src.translations',
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        return getattr(importlib.import_module(_LAZY_ATTRIBUTES[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,33 @@
+"""
+Conversion backends: probe, decode and encode implementations for AudioConverter.
+"""
+
+from .base import Backend, ConversionJob, PCMAudio, select_backend
+from .ffmpeg_backend import FFmpegBackend
+from .inprocess import InProcessBackend
+from .pydub_backend import PydubBackend
+
+BACKENDS = {backend.name: backend for backend in (FFmpegBackend, InProcessBackend, PydubBackend)}
+# Earlier name of the ffmpeg backend, still accepted in Config.CONVERSION_ENGINE
+ALIASES = {"direct": "ffmpeg"}
+
+
+def create_backends(config, ffmpeg_handler, processes=None):
+    """One instance of every backend, by name"""
+    return {name: backend(config, ffmpeg_handler, processes) for name, backend in BACKENDS.items()}
+
+
+def backend_order(config):
+    """Backend names to try for each job: Config.CONVERSION_ENGINE, then Config.CONVERSION_BACKENDS"""
+    order = []
+    for name in [config.CONVERSION_ENGINE, *config.CONVERSION_BACKENDS]:
+        name = ALIASES.get(name, name)
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown conversion backend {name!r}, expected one of {', '.join(BACKENDS)}")
+        if name not in order:
+            order.append(name)
+    return order
+
+
+__all__ = ['ALIASES', 'BACKENDS', 'Backend', 'ConversionJob', 'FFmpegBackend', 'InProcessBackend',
+           'PCMAudio', 'PydubBackend', 'backend_order', 'create_backends', 'select_backend']
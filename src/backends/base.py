@@ -0,0 +1,138 @@
+# base.py
+import os
+import shutil
+import threading
+from collections import namedtuple
+from pathlib import Path
+
+from ..media_info import probe_media
+from ..scheduler import ESTIMATED_BYTES_PER_SECOND
+
+# One conversion: targets is a list of (OutputProfile, output path); processor is
+# the converter's optional AudioSegment callable; audio_filter an optional ffmpeg
+# filter chain (e.g. loudness normalization) applied before every target's encoder
+ConversionJob = namedtuple('ConversionJob', ['source', 'targets', 'duration', 'processor', 'audio_filter'],
+                           defaults=(None,))
+
+# Decoded audio as interleaved signed 16-bit little-endian samples
+PCMAudio = namedtuple('PCMAudio', ['data', 'sample_rate', 'channels'])
+
+# Assumed for memory estimates when the container headers do not say
+DEFAULT_SAMPLE_RATE = 48000
+DEFAULT_CHANNELS = 2
+
+
+def parse_bitrate(bitrate):
+    """Bitrate in kbit/s from an ffmpeg style value such as "320k" or "128000", or None"""
+    value = str(bitrate).strip().lower()
+    try:
+        if value.endswith('k'):
+            return int(value[:-1])
+        return int(value) // 1000
+    except ValueError:
+        return None
+
+
+def decoded_size(job, info=None):
+    """Bytes of 16-bit PCM job.source decodes to, estimated from its MediaInfo or file size"""
+    duration = job.duration or (info.duration if info else None)
+    if not duration:
+        try:
+            duration = os.path.getsize(job.source) / ESTIMATED_BYTES_PER_SECOND
+        except OSError:
+            duration = 0
+    sample_rate = (info.sample_rate if info else None) or DEFAULT_SAMPLE_RATE
+    channels = (info.channels if info else None) or DEFAULT_CHANNELS
+    return int(duration * sample_rate * channels * 2)
+
+
+def ffmpeg_available(ffmpeg_handler):
+    executable = ffmpeg_handler.get_executable()
+    return Path(executable).exists() or shutil.which(executable) is not None
+
+
+class Backend:
+    """Probes, decodes and encodes audio for AudioConverter.
+
+    Subclasses set name, implement decode and encode, and override convert
+    when they can transcode more efficiently than a decode followed by one
+    encode per target. convert is called from worker threads, one job per
+    call, and must raise RuntimeError once cancel() has been called.
+    """
+
+    name = None
+    # Whether convert's memory is used by child processes it registers in its
+    # processes argument, so each job's peak can be measured on its own
+    memory_in_children = False
+
+    def __init__(self, config, ffmpeg_handler, processes=None):
+        self.config = config
+        self.ffmpeg_handler = ffmpeg_handler
+        # ProcessRegistry for any child processes the backend starts
+        self.processes = processes
+        self._cancelled = threading.Event()
+
+    def is_available(self):
+        """Whether the libraries or binaries this backend needs are installed"""
+        return True
+
+    def version(self):
+        """Version string of the underlying codec libraries, part of the cache key"""
+        return None
+
+    def supports(self, job):
+        """Whether this backend can perform job exactly as requested"""
+        return job.processor is None and job.audio_filter is None
+
+    def memory_estimate(self, job, info=None):
+        """Estimated peak memory of convert(job) in bytes; info is the source's MediaInfo if known
+
+        The default convert holds the whole decoded file while it encodes.
+        """
+        return self.config.MEMORY_PER_PROCESS_BYTES + int(self.config.MEMORY_PCM_FACTOR
+                                                          * decoded_size(job, info))
+
+    def probe(self, path):
+        """MediaInfo for path, or None"""
+        return probe_media(path, self.ffmpeg_handler)
+
+    def decode(self, path) -> PCMAudio:
+        raise NotImplementedError
+
+    def encode(self, audio: PCMAudio, output_path, profile):
+        """Encode audio to an MP3 at output_path with profile's settings"""
+        raise NotImplementedError
+
+    def convert(self, job, record, progress_callback=None, processes=None):
+        """Decode job.source once and encode it into every target
+
+        Stage times are added to record (a FileMetrics). progress_callback,
+        if given, is called with (encoded_seconds, speed). processes is the
+        job's own ProcessRegistry (a child of the backend's), for the child
+        processes of this job only.
+        """
+        with record.stage("decode"):
+            audio = self.decode(job.source)
+        with record.stage("encode"):
+            for profile, output_path in job.targets:
+                self._check_cancelled()
+                self.encode(audio, output_path, profile)
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def reset(self):
+        self._cancelled.clear()
+
+    def _check_cancelled(self):
+        if self._cancelled.is_set():
+            raise RuntimeError("Conversion cancelled")
+
+
+def select_backend(backends, job, order):
+    """The first backend named in order that is installed and supports job"""
+    for name in order:
+        backend = backends.get(name)
+        if backend is not None and backend.is_available() and backend.supports(job):
+            return backend
+    raise RuntimeError(f"No conversion backend can handle {job.source} (tried {', '.join(order)})")
@@ -0,0 +1,130 @@
+# ffmpeg_backend.py
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+from ..ffmpeg_engine import FFmpegEngine
+from ..media_info import probe_decoded
+from ..segmented import SegmentedEncoder
+from .base import Backend, PCMAudio, ffmpeg_available
+
+
+class FFmpegBackend(Backend):
+    """Transcodes with ffmpeg child processes, straight from M4A to MP3"""
+
+    name = "ffmpeg"
+    memory_in_children = True
+
+    def __init__(self, config, ffmpeg_handler, processes=None):
+        super().__init__(config, ffmpeg_handler, processes)
+        self.engine = FFmpegEngine(config, ffmpeg_handler, processes)
+        self.segmenter = SegmentedEncoder(config, self.engine, ffmpeg_handler)
+
+    def is_available(self):
+        return (ffmpeg_available(self.ffmpeg_handler)
+                and self.ffmpeg_handler.has_encoder(self.config.MP3_ENCODER))
+
+    def version(self):
+        return self.ffmpeg_handler.get_version()
+
+    def supports(self, job):
+        return job.processor is None
+
+    def memory_estimate(self, job, info=None):
+        """ffmpeg streams the audio: one process, or one per parallel segment of a long file"""
+        processes = 1
+        if self._segmentable(job):
+            processes = self.config.SEGMENT_WORKERS or os.cpu_count() or 1
+        return processes * self.config.MEMORY_PER_PROCESS_BYTES
+
+    def decode(self, path):
+        info = probe_decoded(path, self.ffmpeg_handler)
+        if info is None or not info.sample_rate or not info.channels:
+            raise RuntimeError(f"ffmpeg cannot read {path}")
+        with tempfile.TemporaryDirectory(prefix=".decode_") as folder:
+            raw_path = Path(folder) / "audio.raw"
+            self.engine.run([
+                self.ffmpeg_handler.get_executable(),
+                *self.config.FFMPEG_PARAMS,
+                '-nostdin',
+                '-y',
+                '-i', str(path),
+                '-map', '0:a:0',
+                '-ar', str(info.sample_rate),
+                '-ac', str(info.channels),
+                '-f', 's16le',
+                str(raw_path),
+            ])
+            return PCMAudio(raw_path.read_bytes(), info.sample_rate, info.channels)
+
+    def encode(self, audio, output_path, profile):
+        with tempfile.TemporaryDirectory(prefix=".encode_") as folder:
+            raw_path = Path(folder) / "audio.raw"
+            raw_path.write_bytes(audio.data)
+            self.engine.convert(
+                raw_path, output_path,
+                input_args=['-f', 's16le', '-ar', str(audio.sample_rate), '-ac', str(audio.channels)],
+                output_args=profile.encoder_args(),
+                bitrate=profile.resolved_bitrate(self.config)
+            )
+
+    def convert(self, job, record, progress_callback=None, processes=None):
+        """Transcode into every target with one ffmpeg process
+
+        A single target of a file above the threshold is encoded as parallel segments.
+        """
+        with record.stage("encode"):
+            self._transcode(job, progress_callback, *self._engines(processes))
+
+    def _engines(self, processes):
+        """FFmpegEngine and SegmentedEncoder registering their processes in processes"""
+        if processes is None:
+            return self.engine, self.segmenter
+        engine = FFmpegEngine(self.config, self.ffmpeg_handler, processes)
+        return engine, SegmentedEncoder(self.config, engine, self.ffmpeg_handler)
+
+    @staticmethod
+    def _output_args(job, profile):
+        if job.audio_filter:
+            return ['-af', job.audio_filter, *profile.encoder_args()]
+        return profile.encoder_args()
+
+    def _outputs(self, job):
+        return [(output_path, profile.resolved_bitrate(self.config), self._output_args(job, profile))
+                for profile, output_path in job.targets]
+
+    def _transcode(self, job, progress_callback, engine, segmenter):
+        if len(job.targets) > 1:
+            engine.convert_multi(job.source, self._outputs(job), progress_callback)
+            return
+
+        profile, output_path = job.targets[0]
+        bitrate = profile.resolved_bitrate(self.config)
+        if self._segmentable(job):
+            segments, sample_rate = segmenter.plan(job.source)
+            if segments:
+                try:
+                    segmenter.convert(job.source, output_path, segments, sample_rate,
+                                           progress_callback, bitrate, profile.encoder_args())
+                    return
+                except RuntimeError as e:
+                    self._check_cancelled()
+                    logging.warning(f"Segmented encoding of {job.source} failed ({e}), "
+                                    f"encoding it in a single pass")
+        engine.convert(job.source, output_path, progress_callback=progress_callback,
+                       output_args=self._output_args(job, profile), bitrate=bitrate)
+
+    def _segmentable(self, job):
+        """Whether job is a single target long enough to be encoded as parallel segments"""
+        if len(job.targets) != 1:
+            return False
+        # Resampling would move the segments off the MP3 frame grid, and a filter
+        # such as loudnorm would run on each segment on its own
+        return (job.targets[0][0].sample_rate is None and job.audio_filter is None
+                and self.segmenter.applies(job.duration))
+
+    def convert_batch(self, jobs, progress_callback=None, processes=None):
+        """Convert several short ConversionJobs with a single ffmpeg process"""
+        engine, _ = self._engines(processes)
+        engine.convert_batch([(job.source, self._outputs(job)) for job in jobs], progress_callback)
@@ -0,0 +1,209 @@
+# inprocess.py
+"""
+Conversion inside the Python process: libav decoding through PyAV and LAME
+encoding through lameenc, without spawning ffmpeg or piping audio between
+processes. Both packages are optional (pip install av lameenc); without them
+the backend reports itself unavailable. PyAV alone takes a noticeable part
+of a second to import, so both are only imported once the backend is
+considered for a job.
+
+The MP3s are plain CBR streams with an ID3v2.4 tag carrying the source's
+text metadata. Unlike ffmpeg's output they have no Xing/LAME header, so
+players do not get encoder delay/padding for gapless playback.
+"""
+
+import threading
+import time
+
+from ..segmented import MP3_SAMPLE_RATES
+from .base import Backend, PCMAudio, parse_bitrate
+
+# Set by _import_codecs()
+av = None
+lameenc = None
+_import_lock = threading.Lock()
+_import_failed = False
+
+# Bitrates LAME accepts for CBR MPEG-1/2 Layer III, in kbit/s
+LAME_BITRATES = frozenset((8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160, 192, 224, 256, 320))
+
+# MP4 metadata keys as libavformat names them, and the ID3v2.4 frames ffmpeg maps them to
+ID3_FRAMES = {
+    'title': 'TIT2',
+    'artist': 'TPE1',
+    'album_artist': 'TPE2',
+    'album': 'TALB',
+    'composer': 'TCOM',
+    'genre': 'TCON',
+    'date': 'TDRC',
+    'track': 'TRCK',
+    'disc': 'TPOS',
+    'copyright': 'TCOP',
+}
+
+PCM_CHUNK_SECONDS = 1
+
+
+def _import_codecs():
+    """Import PyAV and lameenc on first use; False if either is not installed"""
+    global av, lameenc, _import_failed
+    with _import_lock:
+        if av is None and not _import_failed:
+            try:
+                # Plain import statements (binding the globals) so PyInstaller still finds both
+                import lameenc
+                import av
+            except ImportError:
+                _import_failed = True
+        return av is not None and lameenc is not None
+
+
+def _syncsafe(value):
+    return bytes(((value >> 21) & 0x7F, (value >> 14) & 0x7F, (value >> 7) & 0x7F, value & 0x7F))
+
+
+def id3_tag(metadata):
+    """ID3v2.4 tag with a UTF-8 text frame per known metadata key, or b'' if there are none"""
+    frames = b''
+    for key, frame_id in ID3_FRAMES.items():
+        value = metadata.get(key)
+        if value:
+            text = b'\x03' + str(value).encode('utf-8')
+            frames += frame_id.encode('ascii') + _syncsafe(len(text)) + b'\x00\x00' + text
+    if not frames:
+        return b''
+    return b'ID3\x04\x00\x00' + _syncsafe(len(frames)) + frames
+
+
+def nearest_mp3_rate(sample_rate):
+    """The MPEG Layer III sample rate closest to sample_rate"""
+    return min(MP3_SAMPLE_RATES, key=lambda rate: (abs(rate - sample_rate), -rate))
+
+
+class _Target:
+    """Resamples decoded frames for one output profile and streams them into LAME"""
+
+    def __init__(self, output_path, profile, bitrate, source_rate, source_channels, metadata):
+        channels = profile.channels or min(source_channels, 2)
+        sample_rate = profile.sample_rate or nearest_mp3_rate(source_rate)
+        self.bytes_per_sample = 2 * channels
+        self.resampler = av.AudioResampler(format='s16', layout='mono' if channels == 1 else 'stereo',
+                                           rate=sample_rate)
+        self.encoder = lameenc.Encoder()
+        self.encoder.set_bit_rate(bitrate)
+        self.encoder.set_in_sample_rate(sample_rate)
+        self.encoder.set_out_sample_rate(sample_rate)
+        self.encoder.set_channels(channels)
+        self.file = open(output_path, 'wb')
+        self.file.write(id3_tag(metadata))
+
+    def write(self, frame):
+        """Encode a decoded frame, or flush everything when frame is None"""
+        for resampled in self.resampler.resample(frame):
+            data = bytes(resampled.planes[0])[:resampled.samples * self.bytes_per_sample]
+            self.file.write(self.encoder.encode(data))
+        if frame is None:
+            self.file.write(self.encoder.flush())
+
+    def close(self):
+        self.file.close()
+
+
+class InProcessBackend(Backend):
+    """Decodes with PyAV and encodes with lameenc, streaming frame by frame"""
+
+    name = "inprocess"
+
+    def is_available(self):
+        return _import_codecs()
+
+    def version(self):
+        from importlib.metadata import version
+        return f"PyAV {av.__version__}, lameenc {version('lameenc')}"
+
+    def supports(self, job):
+        if job.processor is not None or job.audio_filter is not None:
+            return False
+        if self.config.MP3_ENCODER != "libmp3lame":
+            return False
+        for profile, _ in job.targets:
+            if parse_bitrate(profile.resolved_bitrate(self.config)) not in LAME_BITRATES:
+                return False
+            if profile.channels not in (None, 1, 2):
+                return False
+            if profile.sample_rate is not None and profile.sample_rate not in MP3_SAMPLE_RATES:
+                return False
+        return True
+
+    def memory_estimate(self, job, info=None):
+        # convert() streams frame by frame; only decode() holds a whole file
+        return self.config.MEMORY_PER_PROCESS_BYTES
+
+    def _frames(self, container):
+        """Decoded frames of the first audio stream, checking for cancellation in between"""
+        stream = container.streams.audio[0]
+        for frame in container.decode(stream):
+            self._check_cancelled()
+            yield frame
+
+    def decode(self, path):
+        with av.open(str(path)) as container:
+            stream = container.streams.audio[0]
+            channels = stream.codec_context.channels
+            resampler = av.AudioResampler(format='s16', layout=stream.codec_context.layout.name,
+                                          rate=stream.codec_context.sample_rate)
+            chunks = []
+            for frame in self._frames(container):
+                for resampled in resampler.resample(frame):
+                    chunks.append(bytes(resampled.planes[0])[:resampled.samples * 2 * channels])
+            for resampled in resampler.resample(None):
+                chunks.append(bytes(resampled.planes[0])[:resampled.samples * 2 * channels])
+            return PCMAudio(b''.join(chunks), stream.codec_context.sample_rate, channels)
+
+    def encode(self, audio, output_path, profile):
+        target = _Target(output_path, profile, parse_bitrate(profile.resolved_bitrate(self.config)),
+                         audio.sample_rate, audio.channels, {})
+        layout = 'mono' if audio.channels == 1 else 'stereo' if audio.channels == 2 else audio.channels
+        chunk = audio.sample_rate * PCM_CHUNK_SECONDS * 2 * audio.channels
+        try:
+            for offset in range(0, len(audio.data), chunk):
+                self._check_cancelled()
+                data = audio.data[offset:offset + chunk]
+                frame = av.AudioFrame(format='s16', layout=layout, samples=len(data) // (2 * audio.channels))
+                frame.planes[0].update(data)
+                frame.sample_rate = audio.sample_rate
+                target.write(frame)
+            target.write(None)
+        finally:
+            target.close()
+
+    def convert(self, job, record, progress_callback=None, processes=None):
+        """Decode job.source once, feeding every frame to one LAME encoder per target"""
+        started = time.perf_counter()
+        decode_seconds = 0.0
+        targets = []
+        try:
+            with av.open(str(job.source)) as container:
+                context = container.streams.audio[0].codec_context
+                for profile, output_path in job.targets:
+                    targets.append(_Target(output_path, profile,
+                                           parse_bitrate(profile.resolved_bitrate(self.config)),
+                                           context.sample_rate, context.channels, container.metadata))
+                decode_started = time.perf_counter()
+                for frame in self._frames(container):
+                    decode_seconds += time.perf_counter() - decode_started
+                    for target in targets:
+                        target.write(frame)
+                    if progress_callback and frame.time is not None:
+                        elapsed = time.perf_counter() - started
+                        progress_callback(frame.time, frame.time / elapsed if elapsed else None)
+                    decode_started = time.perf_counter()
+            for target in targets:
+                target.write(None)
+        except av.FFmpegError as e:
+            raise RuntimeError(f"Cannot decode {job.source}: {e}") from e
+        finally:
+            for target in targets:
+                target.close()
+            record.add("decode", decode_seconds)
+            record.add("encode", time.perf_counter() - started - decode_seconds)
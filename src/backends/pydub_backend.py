@@ -0,0 +1,91 @@
+# pydub_backend.py
+import importlib.util
+import subprocess
+import sys
+
+from ..process_registry import bind as bind_processes
+from .base import Backend, PCMAudio, ffmpeg_available
+
+
+class PydubBackend(Backend):
+    """Decodes to an AudioSegment in Python and exports every target from it
+
+    The only backend that can run the converter's sample-level audio_processor.
+    """
+
+    name = "pydub"
+
+    def __init__(self, config, ffmpeg_handler, processes=None):
+        super().__init__(config, ffmpeg_handler, processes)
+        self._audio_segment = None
+
+    def _segment_type(self):
+        """pydub's AudioSegment, imported and configured on first use (pydub is slow to import)"""
+        if self._audio_segment is None:
+            from pydub import AudioSegment
+            self._configure_pydub(AudioSegment)
+            self._audio_segment = AudioSegment
+        return self._audio_segment
+
+    def _configure_pydub(self, AudioSegment):
+        """Configure pydub settings for optimal performance"""
+        startupinfo = None
+        if sys.platform == 'win32':
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+            startupinfo.wShowWindow = subprocess.SW_HIDE
+
+        AudioSegment.converter = self.ffmpeg_handler.get_executable()
+        AudioSegment.converter_kwargs = {
+            'hide_banner': None,
+            'loglevel': 'panic',
+            'startupinfo': startupinfo,
+            'shell': False,
+            'stdin': subprocess.PIPE,
+            'stdout': subprocess.PIPE,
+            'stderr': subprocess.PIPE,
+        }
+
+    def is_available(self):
+        # pydub runs ffmpeg for both decoding and encoding
+        return importlib.util.find_spec('pydub') is not None and ffmpeg_available(self.ffmpeg_handler)
+
+    def version(self):
+        return self.ffmpeg_handler.get_version()
+
+    def supports(self, job):
+        return True
+
+    def _load(self, path, processes=None):
+        with bind_processes(processes or self.processes):
+            return self._segment_type().from_file(str(path), format="m4a")
+
+    def _export(self, audio, output_path, profile, audio_filter=None, processes=None):
+        filter_args = ['-af', audio_filter] if audio_filter else []
+        with bind_processes(processes or self.processes):
+            audio.export(
+                str(output_path),
+                format="mp3",
+                bitrate=profile.resolved_bitrate(self.config),
+                parameters=self.config.FFMPEG_PARAMS + filter_args + profile.encoder_args()
+            )
+
+    def decode(self, path):
+        audio = self._load(path).set_sample_width(2)
+        return PCMAudio(audio.raw_data, audio.frame_rate, audio.channels)
+
+    def encode(self, audio, output_path, profile):
+        AudioSegment = self._segment_type()
+        segment = AudioSegment(data=audio.data, sample_width=2,
+                               frame_rate=audio.sample_rate, channels=audio.channels)
+        self._export(segment, output_path, profile)
+
+    def convert(self, job, record, progress_callback=None, processes=None):
+        with record.stage("decode"):
+            audio = self._load(job.source, processes)
+            if job.processor is not None:
+                audio = job.processor(audio)
+        with record.stage("encode"):
+            for profile, output_path in job.targets:
+                self._check_cancelled()
+                self._export(audio, output_path, profile, job.audio_filter, processes)
@@ -0,0 +1,283 @@
+# benchmark.py
+"""
+Throughput benchmark for the conversion pipeline.
+
+Generates synthetic M4A corpora with the local FFmpeg, converts them with
+every requested backend/concurrency combination and writes the results as
+JSON so runs can be compared before and after a change:
+
+    python -m src.benchmark --output before.json
+    python -m src.benchmark --output after.json --compare before.json
+
+Backends (see src/backends) are compared side by side; each run uses only
+the named backend, and backends that are not installed are skipped.
+
+Each combination runs in a fresh child process so peak RSS and spawned
+process counts are not polluted by earlier runs.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from .backends import ALIASES, BACKENDS
+from .config import Config
+from .ffmpeg_handler import FFmpegHandler
+from .metrics import percentile
+from .translations import Translations
+
+# name -> list of (count, seconds, sample_rate, channels); "quick" keeps CI-sized runs short
+CORPORA = {
+    "full": {
+        "short_clips": [(300, 3, 44100, 1)],
+        "long_files": [(3, 1800, 48000, 2)],
+        "mixed": [(6, 60, rate, channels)
+                  for rate in (22050, 32000, 44100, 48000) for channels in (1, 2)],
+    },
+    "quick": {
+        "short_clips": [(40, 3, 44100, 1)],
+        "long_files": [(2, 120, 48000, 2)],
+        "mixed": [(2, 15, rate, channels)
+                  for rate in (22050, 32000, 44100, 48000) for channels in (1, 2)],
+    },
+}
+
+
+def generate_corpus(corpus_dir, scale, ffmpeg):
+    """Create (or reuse) the synthetic M4A files for a scale; returns {name: [paths]}"""
+    corpus_dir = Path(corpus_dir) / scale
+    corpora = {}
+    for name, groups in CORPORA[scale].items():
+        folder = corpus_dir / name
+        folder.mkdir(parents=True, exist_ok=True)
+        files = []
+        for group, (count, seconds, rate, channels) in enumerate(groups):
+            for index in range(count):
+                path = folder / f"{name}_{group:02d}_{index:04d}_{rate}_{channels}ch.m4a"
+                if not path.exists():
+                    # Deterministic content: a different tone per file, plus low-level noise
+                    frequency = 220 + (index * 37 + group * 11) % 880
+                    source = (f"sine=frequency={frequency}:sample_rate={rate}:duration={seconds}")
+                    subprocess.run(
+                        [ffmpeg, "-hide_banner", "-loglevel", "error", "-nostdin", "-y",
+                         "-f", "lavfi", "-i", source,
+                         "-f", "lavfi", "-i", f"anoisesrc=a=0.02:r={rate}:d={seconds}:seed={index}",
+                         "-filter_complex", "amix=inputs=2:duration=first",
+                         "-ac", str(channels), "-c:a", "aac", "-b:a", "128k", str(path)],
+                        check=True
+                    )
+                files.append(str(path))
+        corpora[name] = files
+    return corpora
+
+
+def run_one(files, engine, concurrency, bitrate):
+    """Convert files once in this process and return the measurements"""
+    from .converter import AudioConverter
+
+    config = Config()
+    config.CONVERSION_ENGINE = engine
+    # Measure this backend alone rather than falling back to another one
+    config.CONVERSION_BACKENDS = []
+    config.CACHE_ENABLED = False
+    config.MP3_BITRATE = bitrate
+    translations = Translations()
+    translations.current_lang = "en"
+    converter = AudioConverter(config, FFmpegHandler(config, translations), translations)
+
+    started_at = {}
+    latencies = []
+    summary = {}
+
+    def on_event(event):
+        kind = event['event']
+        if kind == 'file_started':
+            started_at[event['file']] = event['time']
+        elif kind in ('file_completed', 'file_failed') and event['file'] in started_at:
+            latencies.append(event['time'] - started_at[event['file']])
+        elif kind == 'batch_started':
+            summary['audio_seconds'] = event.get('total_duration', 0)
+        elif kind == 'batch_completed':
+            summary.update(completed=event['completed'], failed=event['failed'],
+                           stage_seconds=event.get('stage_seconds'))
+
+    spawned = [0]
+
+    def count_processes(event, args):
+        # Every child process, including probes and decodes the process registry does not track
+        if event == 'subprocess.Popen':
+            spawned[0] += 1
+
+    # Audit hooks cannot be removed again, which is fine in this one-off child interpreter
+    sys.addaudithook(count_processes)
+    with tempfile.TemporaryDirectory(prefix="m4a_bench_") as output_folder:
+        start = time.perf_counter()
+        asyncio.run(converter.convert_files(files, output_folder, concurrency=concurrency,
+                                            event_callback=on_event))
+        wall = time.perf_counter() - start
+
+    audio_seconds = summary.get('audio_seconds', 0)
+    result = {
+        'files': len(files),
+        'completed': summary.get('completed', 0),
+        'failed': summary.get('failed', len(files)),
+        'wall_seconds': wall,
+        'files_per_second': len(files) / wall if wall else None,
+        'audio_seconds': audio_seconds,
+        'realtime_factor': audio_seconds / wall if wall else None,
+        'latency_p50': percentile(latencies, 0.50),
+        'latency_p95': percentile(latencies, 0.95),
+        'stage_seconds': summary.get('stage_seconds'),
+        'processes_spawned': spawned[0],
+        'peak_rss_kb': None,
+        'peak_children_rss_kb': None,
+    }
+    if resource is not None:
+        # ru_maxrss is in KiB on Linux and bytes on macOS
+        divisor = 1024 if sys.platform == 'darwin' else 1
+        result['peak_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // divisor
+        result['peak_children_rss_kb'] = (
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // divisor)
+    return result
+
+
+def run_isolated(files, engine, concurrency, bitrate):
+    """Run one combination in a child interpreter and return its measurements"""
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as listing:
+        json.dump(files, listing)
+    try:
+        completed = subprocess.run(
+            [sys.executable, "-m", "src.benchmark", "--run-one", listing.name,
+             "--engine", engine, "--concurrency", str(concurrency), "--bitrate", bitrate],
+            stdout=subprocess.PIPE,
+            check=True,
+            cwd=Path(__file__).resolve().parent.parent
+        )
+    finally:
+        os.unlink(listing.name)
+    return json.loads(completed.stdout.decode().strip().splitlines()[-1])
+
+
+def compare(results, baseline_path):
+    """Print per-combination changes against an earlier results file"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    def key(row):
+        return row['corpus'], ALIASES.get(row['engine'], row['engine']), str(row['concurrency'])
+
+    previous = {key(row): row for row in baseline['results']}
+    print(f"{'corpus':<12} {'engine':<9} {'conc':<5} {'files/s':>10} {'delta':>8} {'p95 s':>8} {'delta':>8}",
+          file=sys.stderr)
+    for row in results:
+        old = previous.get(key(row))
+        if not old:
+            continue
+
+        def delta(field, higher_is_better=True):
+            if not old.get(field) or row.get(field) is None:
+                return "n/a"
+            change = (row[field] - old[field]) / old[field] * 100
+            return f"{change if higher_is_better else -change:+.1f}%"
+
+        print(f"{row['corpus']:<12} {row['engine']:<9} {str(row['concurrency']):<5} "
+              f"{row['files_per_second']:>10.2f} {delta('files_per_second'):>8} "
+              f"{row['latency_p95'] or 0:>8.2f} {delta('latency_p95', False):>8}",
+              file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.benchmark",
+                                     description="Benchmark the M4A to MP3 conversion pipeline")
+    parser.add_argument("--scale", choices=sorted(CORPORA), default="quick")
+    parser.add_argument("--corpus-dir", default=os.path.join(tempfile.gettempdir(), "m4a_bench_corpus"),
+                        help="Where synthetic inputs are generated and reused between runs")
+    parser.add_argument("--engines", nargs="+", choices=list(BACKENDS), default=list(BACKENDS),
+                        help="Conversion backends to compare (default: all installed)")
+    parser.add_argument("--concurrency", nargs="+", default=["1", "auto"],
+                        help="Concurrency settings to try (numbers or 'auto')")
+    parser.add_argument("--corpora", nargs="+", help="Subset of corpora to run")
+    parser.add_argument("--bitrate", default="320k")
+    parser.add_argument("--output", help="Write results JSON here (default: stdout)")
+    parser.add_argument("--compare", help="Earlier results JSON to compare against")
+    parser.add_argument("--run-one", help=argparse.SUPPRESS)
+    parser.add_argument("--engine", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_one:
+        with open(args.run_one) as f:
+            files = json.load(f)
+        concurrency = args.concurrency[0]
+        concurrency = int(concurrency) if concurrency.isdigit() else concurrency
+        print(json.dumps(run_one(files, args.engine, concurrency, args.bitrate)))
+        return 0
+
+    config = Config()
+    ffmpeg_handler = FFmpegHandler(config, Translations())
+    ffmpeg = ffmpeg_handler.get_executable()
+    if not shutil.which(ffmpeg) and not Path(ffmpeg).exists():
+        print("FFmpeg not found", file=sys.stderr)
+        return 2
+
+    engines = []
+    versions = {}
+    for engine in args.engines:
+        backend = BACKENDS[engine](config, ffmpeg_handler)
+        if backend.is_available():
+            engines.append(engine)
+            versions[engine] = backend.version()
+        else:
+            print(f"Skipping backend {engine}: not installed", file=sys.stderr)
+
+    corpora = generate_corpus(args.corpus_dir, args.scale, ffmpeg)
+    results = []
+    for name, files in corpora.items():
+        if args.corpora and name not in args.corpora:
+            continue
+        for engine in engines:
+            for concurrency in args.concurrency:
+                print(f"Running {name} / {engine} / concurrency {concurrency}...", file=sys.stderr)
+                row = run_isolated(files, engine, concurrency, args.bitrate)
+                row.update(corpus=name, engine=engine,
+                           concurrency=int(concurrency) if concurrency.isdigit() else concurrency)
+                results.append(row)
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'scale': args.scale,
+            'bitrate': args.bitrate,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'ffmpeg': ffmpeg_handler.get_version(),
+            'backends': versions,
+        },
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text)
+    else:
+        print(text)
+
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+# cache.py
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+from pathlib import Path
+
+from .hashing import file_digest
+
+
+class ConversionCache:
+    """Persistent index of finished conversions keyed by source content.
+
+    A source is identified by the digest of its bytes; the digest is only
+    recomputed when the file's size or mtime changed since it was last seen.
+    Each (digest, encoding parameters) pair maps to an MP3 produced earlier,
+    which can then be reused instead of encoding the file again.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sources ("
+                " path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, digest TEXT)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS outputs ("
+                " digest TEXT, params TEXT, output_path TEXT, output_size INTEGER,"
+                " output_mtime_ns INTEGER, PRIMARY KEY (digest, params))"
+            )
+
+    @staticmethod
+    def params_key(**params):
+        """Stable key for the encoding parameters that influence the output bytes"""
+        encoded = json.dumps(params, sort_keys=True).encode()
+        return hashlib.sha1(encoded).hexdigest()
+
+    def source_digest(self, path):
+        """Content digest of path, hashing only if size/mtime changed since last time"""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, digest FROM sources WHERE path = ?", (path,)
+            ).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+
+        digest = file_digest(path)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sources (path, size, mtime_ns, digest) VALUES (?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, digest)
+            )
+        return digest
+
+    def lookup(self, digest, params):
+        """Return the path of a still-valid cached output, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT output_path, output_size, output_mtime_ns FROM outputs"
+                " WHERE digest = ? AND params = ?", (digest, params)
+            ).fetchone()
+        if not row:
+            return None
+        output_path, size, mtime_ns = row
+        try:
+            stat = os.stat(output_path)
+        except OSError:
+            return None
+        if stat.st_size != size or stat.st_mtime_ns != mtime_ns:
+            return None
+        return Path(output_path)
+
+    def store(self, digest, params, output_path):
+        output_path = os.path.abspath(output_path)
+        stat = os.stat(output_path)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO outputs"
+                " (digest, params, output_path, output_size, output_mtime_ns)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (digest, params, output_path, stat.st_size, stat.st_mtime_ns)
+            )
+
+    @staticmethod
+    def restore(cached_path, output_path, mode="link"):
+        """Materialize a cached output at output_path by hard link or copy
+
+        The link or copy is made under a temporary name and renamed into
+        place, so output_path is never seen half-written.
+        """
+        cached_path, output_path = Path(cached_path), Path(output_path)
+        if output_path.exists() and os.path.samefile(cached_path, output_path):
+            return
+        partial_path = output_path.with_name(output_path.name + '.part')
+        partial_path.unlink(missing_ok=True)
+        linked = False
+        if mode == "link":
+            try:
+                os.link(cached_path, partial_path)
+                linked = True
+            except OSError as e:
+                logging.debug(f"Hard link failed ({e}), copying {cached_path} instead")
+        try:
+            if not linked:
+                shutil.copy2(cached_path, partial_path)
+            os.replace(partial_path, output_path)
+        except Exception:
+            partial_path.unlink(missing_ok=True)
+            raise
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,394 @@
+# cli.py
+import argparse
+import asyncio
+import glob
+import json
+import logging
+import os
+import signal
+import sys
+import time
+
+from .backends import ALIASES, BACKENDS
+from .config import DEFAULT_MP3_BITRATE, Config
+from .ffmpeg_handler import FFmpegHandler
+from .profiles import OutputProfile, check_profiles
+from .scanner import DirectoryScanner
+from .scheduler import JOB_ORDERS
+from .translations import Translations
+
+
+def parse_concurrency(value):
+    if value.lower() == "auto":
+        return "auto"
+    try:
+        workers = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a positive integer or 'auto', got {value!r}")
+    if workers < 1:
+        raise argparse.ArgumentTypeError("concurrency must be at least 1")
+    return workers
+
+
+def parse_memory(value):
+    """Bytes from e.g. "512M" or "4G", or "auto"/"none" """
+    if value.lower() in ("auto", "none"):
+        return None if value.lower() == "none" else "auto"
+    units = {'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3}
+    try:
+        if value[-1:].lower() in units:
+            return int(float(value[:-1]) * units[value[-1].lower()])
+        return int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a size such as 512M or 4G, 'auto' or 'none', got {value!r}")
+
+
+def parse_profile(value):
+    try:
+        return OutputProfile.parse(value)
+    except (TypeError, ValueError) as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m src",
+        description="Convert M4A files to MP3 without the GUI. Progress is written "
+                    "to stdout as JSON lines."
+    )
+    parser.add_argument("inputs", nargs="*",
+                        help="M4A files, directories or glob patterns (e.g. 'archive/**/*.m4a'); "
+                             "optional with --resume")
+    parser.add_argument("-o", "--output", help="Output folder (required unless --worker or --serve)")
+    parser.add_argument("-b", "--bitrate", help="MP3 bitrate (default: %(default)s)",
+                        default=DEFAULT_MP3_BITRATE)
+    parser.add_argument("-p", "--profile", action="append", type=parse_profile, default=[],
+                        help="Output profile, e.g. 'bitrate=64k,channels=mono,template={stem}_64k.mp3' "
+                             "or just '128k' (repeatable; every profile is encoded from one decode)")
+    parser.add_argument("-j", "--concurrency", type=parse_concurrency, default="auto",
+                        help="Parallel conversions, or 'auto' (default: %(default)s)")
+    parser.add_argument("--memory-budget", type=parse_memory, default=argparse.SUPPRESS, metavar="SIZE",
+                        help="Only start conversions while their estimated peak memory fits in SIZE "
+                             "(e.g. 4G; 'auto' = half the RAM, 'none' = no limit; default: auto)")
+    parser.add_argument("--order", choices=JOB_ORDERS,
+                        help="Dispatch order: longest files first, or as given (default: longest_first)")
+    parser.add_argument("--engine", choices=[*BACKENDS, *ALIASES],
+                        help="Preferred conversion backend (default: ffmpeg)")
+    parser.add_argument("--normalize", nargs="?", type=float, const=-23.0, metavar="LUFS",
+                        help="Normalize loudness to this integrated loudness with a measuring first "
+                             "pass (default target: -23, EBU R128)")
+    parser.add_argument("--true-peak", type=float, metavar="DBTP",
+                        help="Maximum true peak when normalizing (default: -1.5)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Re-encode every file instead of reusing earlier identical conversions")
+    parser.add_argument("--no-dedupe", action="store_true",
+                        help="Encode byte-identical input files separately instead of once")
+    parser.add_argument("--cache-mode", choices=["link", "copy"],
+                        help="How cached and duplicate outputs are placed in the output (default: link)")
+    parser.add_argument("-r", "--recursive", action="store_true",
+                        help="Also convert files in subdirectories of input directories")
+    parser.add_argument("--include", action="append",
+                        help="Glob of file names/relative paths to include when scanning directories "
+                             "(repeatable, default: *.m4a)")
+    parser.add_argument("--exclude", action="append", default=[],
+                        help="Glob of file/directory names or relative paths to skip (repeatable)")
+    parser.add_argument("--mirror", action="store_true",
+                        help="Recreate the input folder structure in the output folder")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and convert M4A files as they appear in the input directories")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip files the output folder's job journal records as done; without "
+                             "inputs, re-run every unfinished file from the journal")
+    parser.add_argument("--report", action="append", default=[],
+                        help="Write per-file stage timings to this path after each batch; "
+                             ".csv paths are written as CSV, others as JSON (repeatable)")
+    parser.add_argument("--prometheus",
+                        help="Write batch metrics to this Prometheus textfile (e.g. for node_exporter)")
+    parser.add_argument("--coordinator", nargs="?", const="", metavar="HOST:PORT",
+                        help="Hand the files to workers started with --worker instead of converting "
+                             "them here (default address: 127.0.0.1:8765)")
+    parser.add_argument("--worker", metavar="URL",
+                        help="Run as a worker of the coordinator at URL (e.g. http://farm01:8765); "
+                             "-j sets the number of parallel jobs")
+    parser.add_argument("--stream", action="store_true",
+                        help="Worker: transfer sources and MP3s over HTTP even if the paths are "
+                             "reachable on shared storage")
+    parser.add_argument("--token", help="Shared secret between coordinator and workers")
+    parser.add_argument("--serve", nargs="?", const="", metavar="HOST:PORT",
+                        help="Run the streaming HTTP transcoding service (default address: "
+                             "127.0.0.1:8080); -j limits concurrent transcodes, -b sets the default bitrate")
+    parser.add_argument("--install-ffmpeg", action="store_true",
+                        help="Download, verify and install FFmpeg for this platform, then exit")
+    return parser
+
+
+def collect_inputs(patterns, scanner):
+    """Expand files, directories and glob patterns into a de-duplicated list of paths the filters match"""
+    files = {}
+    directories = [pattern for pattern in patterns if os.path.isdir(pattern)]
+    found = 0
+    for batch in scanner.iter_batches(directories):
+        found += len(batch)
+        emit_json({'event': 'scan_progress', 'found': found})
+        for match in sorted(batch):
+            files.setdefault(os.path.abspath(match), None)
+
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            continue
+        elif glob.has_magic(pattern):
+            matches = sorted(glob.glob(pattern, recursive=True))
+        else:
+            matches = [pattern]
+        root = glob_root(pattern) if glob.has_magic(pattern) else None
+        for match in matches:
+            if os.path.isfile(match) and scanner.matches(match, root):
+                files.setdefault(os.path.abspath(match), None)
+    return list(files)
+
+
+def glob_root(pattern):
+    """The folder a glob pattern starts from: its components up to the first wildcard"""
+    parts = []
+    for part in pattern.replace(os.sep, '/').split('/'):
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    return '/'.join(parts) or '.'
+
+
+def mirror_root(inputs):
+    """With a single input directory, mirror relative to it rather than the files' common folder"""
+    if len(inputs) == 1 and os.path.isdir(inputs[0]):
+        return inputs[0]
+    return None
+
+
+def requires_ffmpeg(config):
+    """Whether a batch cannot run at all without FFmpeg
+
+    The ffmpeg engine (which also encodes long files as segments) and pydub
+    run it for every file, and loudness normalization measures with it. The
+    in-process engine does not; without FFmpeg only the jobs it cannot take
+    fail, when select_backend finds no fallback.
+    """
+    engine = ALIASES.get(config.CONVERSION_ENGINE, config.CONVERSION_ENGINE)
+    return engine in ("ffmpeg", "pydub") or config.LOUDNESS_TARGET is not None
+
+
+def run_batch(coroutine):
+    """asyncio.run, with Ctrl-C raising KeyboardInterrupt
+
+    Since Python 3.11 asyncio.run turns Ctrl-C into cancelling the main
+    task, which convert_files treats as a cancelled batch and returns False.
+    Installing a handler of our own keeps the plain KeyboardInterrupt.
+    """
+    previous = signal.signal(signal.SIGINT, lambda signum, frame: signal.default_int_handler(signum, frame))
+    try:
+        return asyncio.run(coroutine)
+    finally:
+        signal.signal(signal.SIGINT, previous)
+
+
+def emit_json(event):
+    sys.stdout.write(json.dumps(event) + "\n")
+    sys.stdout.flush()
+
+
+def watch(converter, config, args, scanner):
+    """Convert settled files from the watched directories until interrupted
+
+    scanner's filters and recursion select the files, as for a one-off run.
+    """
+    from .watcher import FolderWatcher
+    folders = [path for path in args.inputs if os.path.isdir(path)]
+    if len(folders) != len(args.inputs):
+        emit_json({'event': 'error', 'error': '--watch expects directories as inputs'})
+        return 2
+
+    watcher = FolderWatcher(
+        folders,
+        settle_seconds=config.WATCH_SETTLE_SECONDS,
+        poll_interval=config.WATCH_POLL_INTERVAL,
+        scanner=scanner
+    )
+    # Each batch holds only the files that just settled, so mirror relative to the watched folders
+    try:
+        input_root = os.path.commonpath(watcher.folders)
+    except ValueError:  # Different drives on Windows
+        input_root = None
+    emit_json({'event': 'watch_started', 'folders': watcher.folders})
+    try:
+        for batch in watcher.batches():
+            run_batch(converter.convert_files(
+                batch,
+                args.output,
+                concurrency=args.concurrency,
+                event_callback=emit_json,
+                mirror_tree=args.mirror,
+                input_root=input_root
+            ))
+    except KeyboardInterrupt:
+        converter.cancel_conversion(wait=True)
+        watcher.stop()
+        logging.info("Watch mode stopped from the command line")
+    return 0
+
+
+def run_worker(args):
+    """Convert jobs from a coordinator until interrupted"""
+    from .distributed import Worker
+    config = Config()
+    if args.engine:
+        config.CONVERSION_ENGINE = args.engine
+    if args.token:
+        config.DISTRIBUTED_TOKEN = args.token
+    translations = Translations()
+    translations.current_lang = "en"
+    ffmpeg_handler = FFmpegHandler(config, translations)
+    slots = args.concurrency if args.concurrency != "auto" else os.cpu_count() or 1
+    worker = Worker(config, ffmpeg_handler, args.worker, slots=slots, stream=args.stream)
+    emit_json({'event': 'worker_started', 'worker': worker.name, 'coordinator': args.worker,
+               'slots': worker.slots})
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        logging.info("Worker stopped from the command line")
+    return 0
+
+
+def serve(args):
+    """Run the streaming transcoding service until interrupted"""
+    from .service import TranscodeService
+    config = Config()
+    config.MP3_BITRATE = args.bitrate
+    if args.concurrency != "auto":
+        config.SERVICE_MAX_CONCURRENT = args.concurrency
+    translations = Translations()
+    translations.current_lang = "en"
+    service = TranscodeService(config, FFmpegHandler(config, translations), address=args.serve or None)
+    host, port = service.start()
+    emit_json({'event': 'service_started', 'address': f"{host}:{port}",
+               'max_concurrent': service.admission.max_concurrent})
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        logging.info("Service stopped from the command line")
+    return 0
+
+
+def install_ffmpeg():
+    """Install FFmpeg, reporting download progress as JSON lines"""
+    config = Config()
+    translations = Translations()
+    translations.current_lang = "en"
+    last_report = 0.0
+
+    def progress(downloaded, total):
+        nonlocal last_report
+        now = time.monotonic()
+        if now - last_report >= config.PROGRESS_INTERVAL or downloaded == total:
+            last_report = now
+            emit_json({'event': 'ffmpeg_download', 'downloaded': downloaded, 'total': total})
+
+    ffmpeg_handler = FFmpegHandler(config, translations)
+    installed = ffmpeg_handler.install(lambda text: emit_json({'event': 'status', 'status': text}), progress)
+    if not installed:
+        return 1
+    emit_json({'event': 'ffmpeg_installed', 'path': ffmpeg_handler.get_executable(),
+               'version': ffmpeg_handler.get_version()})
+    return 0
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.install_ffmpeg:
+        return install_ffmpeg()
+    if args.worker:
+        return run_worker(args)
+    if args.serve is not None:
+        return serve(args)
+    if not args.output:
+        parser.error("the following arguments are required: -o/--output")
+    if not args.inputs and (args.watch or not args.resume):
+        parser.error("the following arguments are required: inputs")
+
+    config = Config()
+    config.MP3_BITRATE = args.bitrate
+    if args.engine:
+        config.CONVERSION_ENGINE = args.engine
+    if args.order:
+        config.JOB_ORDER = args.order
+    if 'memory_budget' in vars(args):
+        config.MEMORY_BUDGET_BYTES = args.memory_budget
+    if args.normalize is not None:
+        config.LOUDNESS_TARGET = args.normalize
+    if args.true_peak is not None:
+        config.LOUDNESS_TRUE_PEAK = args.true_peak
+    if args.no_cache:
+        config.CACHE_ENABLED = False
+    if args.cache_mode:
+        config.CACHE_MODE = args.cache_mode
+    if args.no_dedupe:
+        config.DEDUPLICATE_SOURCES = False
+    config.OUTPUT_PROFILES = args.profile
+    try:
+        check_profiles(args.profile, config)
+    except ValueError as e:
+        parser.error(str(e))
+    config.METRICS_REPORTS = args.report
+    if args.prometheus:
+        config.METRICS_PROMETHEUS_PATH = args.prometheus
+    if args.token:
+        config.DISTRIBUTED_TOKEN = args.token
+
+    translations = Translations()
+    translations.current_lang = "en"
+    ffmpeg_handler = FFmpegHandler(config, translations)
+    if requires_ffmpeg(config) and not ffmpeg_handler.check_installation():
+        emit_json({'event': 'error', 'error': 'FFmpeg not found'})
+        return 2
+
+    # The engines are imported only for the mode in use, keeping --help and worker startup fast
+    if args.coordinator is not None:
+        from .distributed import Coordinator
+        converter = Coordinator(config, ffmpeg_handler, translations, address=args.coordinator or None)
+        host, port = converter.start()
+        emit_json({'event': 'coordinator_started', 'address': f"{host}:{port}"})
+    else:
+        from .converter import AudioConverter
+        converter = AudioConverter(config, ffmpeg_handler, translations)
+    scanner = DirectoryScanner(
+        include=args.include or config.SCAN_INCLUDE,
+        exclude=args.exclude or config.SCAN_EXCLUDE,
+        recursive=args.recursive
+    )
+    if args.watch:
+        return watch(converter, config, args, scanner)
+
+    if args.inputs:
+        files = collect_inputs(args.inputs, scanner)
+    else:
+        from .journal import unfinished_sources
+        files = unfinished_sources(args.output)
+    if not files:
+        message = translations.get("no_files" if args.inputs else "nothing_to_resume")
+        emit_json({'event': 'error', 'error': message})
+        return 2
+
+    try:
+        success = run_batch(converter.convert_files(
+            files,
+            args.output,
+            concurrency=args.concurrency,
+            event_callback=emit_json,
+            mirror_tree=args.mirror,
+            input_root=mirror_root(args.inputs),
+            resume=args.resume
+        ))
+    except KeyboardInterrupt:
+        converter.cancel_conversion(wait=True)
+        logging.info("Conversion interrupted from the command line")
+        return 130
+    return 0 if success else 1
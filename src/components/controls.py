@@ -10,6 +10,8 @@ class ControlsComponent:
         self.translations = translations
         self.file_list = file_list_component
         self.start_conversion = None  # Will be set by main GUI
+        self.resume_conversion = None
+        self.stop_conversion = None
         self.config_file = 'config.json'
 
         # Create a frame to hold all controls
@@ -79,9 +81,27 @@ class ControlsComponent:
         self.concurrent_label = ttk.Label(self.frame, text=self.translations.get("concurrent"))
         self.concurrent_label.grid(row=2, column=0, sticky="w")
 
-        self.concurrent = ttk.Spinbox(self.frame, from_=1, to=10, width=5)
-        self.concurrent.set(3)
-        self.concurrent.grid(row=2, column=1, sticky="w", padx=5)
+        # "auto" sizes the worker pool from the CPU count and tunes it while running
+        options_frame = ttk.Frame(self.frame)
+        options_frame.grid(row=2, column=1, columnspan=2, sticky="w", padx=5)
+
+        max_workers = (os.cpu_count() or 1) * 2
+        self.concurrent = ttk.Spinbox(options_frame, values=["auto"] + list(range(1, max_workers + 1)),
+                                      width=5)
+        self.concurrent.set("auto")
+        self.concurrent.pack(side="left")
+
+        # Recreate the input folder's subfolders in the output folder
+        self.mirror_tree = tk.BooleanVar(value=False)
+        self.mirror_check = ttk.Checkbutton(options_frame, text=self.translations.get("mirror_tree"),
+                                            variable=self.mirror_tree)
+        self.mirror_check.pack(side="left", padx=10)
+
+        # Queue the files for remote workers instead of converting them here
+        self.distribute = tk.BooleanVar(value=False)
+        self.distribute_check = ttk.Checkbutton(options_frame, text=self.translations.get("distribute"),
+                                                variable=self.distribute)
+        self.distribute_check.pack(side="left", padx=10)
 
     def setup_progress_and_status(self):
         self.progress_var = tk.DoubleVar()
@@ -103,6 +123,14 @@ class ControlsComponent:
         )
         self.convert_btn.pack(side="left", padx=5)
 
+        # Re-runs whatever the output folder's job journal lists as unfinished
+        self.resume_btn = ttk.Button(
+            button_frame,
+            text=self.translations.get("resume"),
+            command=self._handle_resume_click
+        )
+        self.resume_btn.pack(side="left", padx=5)
+
         self.stop_btn = ttk.Button(
             button_frame,
             text=self.translations.get("stop"),
@@ -114,23 +142,30 @@ class ControlsComponent:
     def _handle_convert_click(self):
         """Handle convert button click"""
         if self.start_conversion:
-            self.convert_btn.state(['disabled'])
-            self.stop_btn.state(['!disabled'])  # Enable stop button
+            self.set_converting_state(True)
             self.start_conversion()
 
+    def _handle_resume_click(self):
+        """Handle resume button click"""
+        if self.resume_conversion:
+            self.set_converting_state(True)
+            self.resume_conversion()
+
     def _handle_stop_click(self):
         """Handle stop button click"""
         if self.stop_conversion:
             self.stop_conversion()
-            self.stop_btn.state(['disabled'])
-            self.convert_btn.state(['!disabled'])
+            self.set_converting_state(False)
 
     def set_converting_state(self, is_converting):
+        """Enable Stop while a batch runs and Convert/Resume otherwise"""
         if is_converting:
             self.convert_btn.state(['disabled'])
+            self.resume_btn.state(['disabled'])
             self.stop_btn.state(['!disabled'])
         else:
             self.convert_btn.state(['!disabled'])
+            self.resume_btn.state(['!disabled'])
             self.stop_btn.state(['disabled'])
             self.progress_var.set(0)  # Reset progress bar
 
@@ -139,9 +174,12 @@ class ControlsComponent:
         self.input_label.configure(text=self.translations.get("input_folder"))
         self.output_label.configure(text=self.translations.get("output_folder"))
         self.concurrent_label.configure(text=self.translations.get("concurrent"))
+        self.mirror_check.configure(text=self.translations.get("mirror_tree"))
+        self.distribute_check.configure(text=self.translations.get("distribute"))
         self.input_button.configure(text=self.translations.get("browse"))
         self.output_button.configure(text=self.translations.get("browse"))
         self.convert_btn.configure(text=self.translations.get("convert"))
+        self.resume_btn.configure(text=self.translations.get("resume"))
         self.status_var.set(self.translations.get("ready"))
 
     def browse_input(self):
@@ -157,37 +195,39 @@ class ControlsComponent:
             self.save_config()  # Save the output path when selected
 
     def add_files_from_folder(self, folder):
-        m4a_files = [os.path.join(folder, f) for f in os.listdir(folder)
-                     if f.lower().endswith('.m4a')]
-        self.file_list.selected_files.update(m4a_files)
-        self.file_list.update_file_list()
+        self.file_list.scan_directories([folder])
 
     def get_concurrent_value(self):
-        return int(self.concurrent.get())
+        value = self.concurrent.get().strip().lower()
+        if value.isdigit() and int(value) > 0:
+            return int(value)
+        return "auto"
+
+    def get_mirror_tree(self):
+        return self.mirror_tree.get()
+
+    def get_distribute(self):
+        return self.distribute.get()
+
+    def get_input_path(self):
+        return self.input_path.get() or None
 
     def get_output_path(self):
         return self.output_path.get()
 
-    def set_converting_state(self, is_converting):
-        if is_converting:
-            self.convert_btn.state(['disabled'])
-        else:
-            self.convert_btn.state(['!disabled'])
-
     def reset_progress(self):
         """Reset progress bar to zero"""
         self.progress_var.set(0)
-        self.update()  # Ensure the UI updates
+
+    # Must be called on the Tk thread; the main loop redraws after each event pump tick
 
     def update_progress(self, value):
         """Update progress bar value"""
         self.progress_var.set(value)
-        self.update()  # Ensure the UI updates immediately
 
     def update_status(self, status):
         """Update status text"""
         self.status_var.set(status)
-        self.update()  # Ensure the UI updates immediately
 
     def update(self):
         """Force the frame to update"""
@@ -1,15 +1,88 @@
 import tkinter as tk
 from tkinter import ttk
-from tkinterdnd2 import DND_FILES
+import tkinter.font as tkfont
+import bisect
 import os
+import queue
+import threading
+
+from ..scanner import DirectoryScanner
+
+
+class FileListModel:
+    """Sorted list of file paths with a compact per-file checked flag.
+
+    Checked state lives in a bytearray parallel to the path list, so the
+    model costs a few bytes per entry instead of a Tk variable per file.
+    Membership is a set, so inserting never renumbers the entries after
+    the insertion point.
+    """
+
+    def __init__(self):
+        self.paths = []
+        self.checked = bytearray()
+        self._known = set()
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __contains__(self, path):
+        return path in self._known
+
+    def add(self, paths):
+        """Add new paths (checked); returns how many were actually new"""
+        new_paths = sorted({path for path in paths if path not in self._known})
+        if not new_paths:
+            return 0
+        # Only the entries from the first insertion point on move, so a scan
+        # streaming in ascending order just appends
+        start = bisect.bisect_left(self.paths, new_paths[0])
+        tail_checked = self.checked[start:]
+        # Both runs are already sorted, which Timsort merges in linear time
+        merged = sorted(self.paths[start:] + new_paths)
+        checked = bytearray()
+        copied = 0
+        for path in new_paths:
+            # Old entries keep their flag, new ones start checked
+            position = bisect.bisect_left(merged, path, len(checked))
+            count = position - len(checked)
+            checked += tail_checked[copied:copied + count]
+            copied += count
+            checked.append(1)
+        checked += tail_checked[copied:]
+        self.paths[start:] = merged
+        self.checked[start:] = checked
+        self._known.update(new_paths)
+        return len(new_paths)
+
+    def remove_checked(self):
+        keep = [i for i, flag in enumerate(self.checked) if not flag]
+        self.paths = [self.paths[i] for i in keep]
+        self.checked = bytearray(len(keep))
+        self._known = set(self.paths)
+
+    def clear(self):
+        self.paths = []
+        self.checked = bytearray()
+        self._known = set()
+
+    def set_all(self, value):
+        self.checked = bytearray(b'\x01' * len(self.paths)) if value else bytearray(len(self.paths))
+
+    def toggle(self, index):
+        self.checked[index] ^= 1
+
+    def checked_paths(self):
+        return [path for path, flag in zip(self.paths, self.checked) if flag]
 
 
 class FileListComponent:
-    def __init__(self, parent, translations):
+    def __init__(self, parent, translations, config):
         self.parent = parent
         self.translations = translations
-        self.selected_files = set()
-        self.file_vars = {}
+        self.config = config
+        self.model = FileListModel()
+        self.top = 0  # Index of the first visible row
         self.setup_component()
 
     def setup_component(self):
@@ -20,8 +93,7 @@ class FileListComponent:
         self.file_frame.grid_rowconfigure(1, weight=1)  # Make row with canvas expandable
 
         self.setup_button_frame()
-        self.create_scrollable_list()
-        self.setup_drag_drop()
+        self.create_virtual_list()
 
     def setup_button_frame(self):
         button_frame = ttk.Frame(self.file_frame)
@@ -34,39 +106,43 @@ class FileListComponent:
         ttk.Button(button_frame, text=self.translations.get("remove_selected"),
                    command=self.remove_selected_files).pack(side="left", padx=5)
 
-    def create_scrollable_list(self):
-        # Create a container frame for the canvas
+    def create_virtual_list(self):
+        """Create a canvas that only draws the rows inside the viewport"""
         container = ttk.Frame(self.file_frame)
         container.grid(row=1, column=0, sticky="nsew", padx=5, pady=5)
         container.grid_columnconfigure(0, weight=1)
         container.grid_rowconfigure(0, weight=1)
 
-        # Create canvas and scrollbar
-        self.canvas = tk.Canvas(container)
-        scrollbar = ttk.Scrollbar(container, orient="vertical", command=self.canvas.yview)
+        self.canvas = tk.Canvas(container, highlightthickness=0)
+        self.scrollbar = ttk.Scrollbar(container, orient="vertical", command=self.yview)
 
-        # Create a frame to contain the list items
-        self.scrollable_frame = ttk.Frame(self.canvas)
-        self.scrollable_frame.bind(
-            "<Configure>",
-            lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-        )
-
-        # Create window inside canvas
-        self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        self.canvas.configure(yscrollcommand=scrollbar.set)
+        self.font = tkfont.nametofont("TkDefaultFont")
+        self.row_height = self.font.metrics("linespace") + 6
 
         # Grid layout
         self.canvas.grid(row=0, column=0, sticky="nsew")
-        scrollbar.grid(row=0, column=1, sticky="ns")
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
 
         # Bind mouse events
         self.canvas.bind('<Enter>', self.bind_mousewheel)
         self.canvas.bind('<Leave>', self.unbind_mousewheel)
+        self.canvas.bind('<Button-1>', self.on_click)
 
         # Bind canvas resize
         self.canvas.bind('<Configure>', self.on_canvas_configure)
 
+    def visible_rows(self):
+        return max(1, self.canvas.winfo_height() // self.row_height)
+
+    def yview(self, *args):
+        """Scrollbar command: ('moveto', fraction) or ('scroll', n, 'units'|'pages')"""
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * len(self.model))
+        elif args[0] == "scroll":
+            step = self.visible_rows() if args[2] == "pages" else 1
+            self.top += int(args[1]) * step
+        self.render()
+
     def bind_mousewheel(self, event=None):
         """Bind mousewheel to scrolling"""
         self.canvas.bind_all("<MouseWheel>", self.on_mousewheel)
@@ -83,21 +159,56 @@ class FileListComponent:
     def on_mousewheel(self, event):
         """Handle mousewheel scrolling"""
         if event.num == 5 or event.delta < 0:
-            self.canvas.yview_scroll(1, "units")
+            self.yview("scroll", 3, "units")
         elif event.num == 4 or event.delta > 0:
-            self.canvas.yview_scroll(-1, "units")
+            self.yview("scroll", -3, "units")
 
     def on_canvas_configure(self, event):
         """Handle canvas resize"""
-        self.canvas.itemconfig("all", width=event.width)
+        self.render()
+
+    def on_click(self, event):
+        """Toggle the checkbox of the clicked row"""
+        index = self.top + event.y // self.row_height
+        if 0 <= index < len(self.model):
+            self.model.toggle(index)
+            self.render()
+
+    def render(self):
+        """Redraw the rows in the viewport; cost is independent of list size"""
+        total = len(self.model)
+        visible = self.visible_rows()
+        self.top = max(0, min(self.top, total - visible))
+        self.canvas.delete("row")
+
+        if not total:
+            self.canvas.create_text(
+                self.canvas.winfo_width() // 2, self.canvas.winfo_height() // 2,
+                text=self.translations.get("drag_drop"), fill="gray", tags="row"
+            )
+            self.scrollbar.set(0, 1)
+            return
+
+        box = self.row_height - 10
+        for row, index in enumerate(range(self.top, min(self.top + visible + 1, total))):
+            y = row * self.row_height
+            self.canvas.create_rectangle(6, y + 5, 6 + box, y + 5 + box, outline="gray40", tags="row")
+            if self.model.checked[index]:
+                self.canvas.create_line(8, y + 5 + box // 2, 6 + box // 2, y + 3 + box,
+                                        4 + box, y + 7, width=2, tags="row")
+            self.canvas.create_text(box + 14, y + self.row_height // 2, anchor="w",
+                                    text=os.path.basename(self.model.paths[index]),
+                                    font=self.font, tags="row")
+
+        self.scrollbar.set(self.top / total, min(1.0, (self.top + visible) / total))
 
     def setup_drag_drop(self):
-        """Configure drag and drop for file list"""
+        """Configure drag and drop for file list, once tkdnd is loaded (see main.enable_drag_and_drop)"""
+        from tkinterdnd2 import DND_FILES
         self.file_frame.drop_target_register(DND_FILES)
         self.canvas.drop_target_register(DND_FILES)
-        self.scrollable_frame.drop_target_register(DND_FILES)
 
-        for widget in (self.file_frame, self.canvas, self.scrollable_frame):
+        for widget in (self.file_frame, self.canvas):
             widget.dnd_bind("<<Drop>>", self.handle_drop)
             widget.dnd_bind("<<DragEnter>>", self.on_drag_enter)
             widget.dnd_bind("<<DragLeave>>", self.on_drag_leave)
@@ -111,55 +222,73 @@ class FileListComponent:
     def handle_drop(self, event):
         self.canvas.configure(relief="flat", borderwidth=0)
         try:
-            if event.data.startswith("{") and event.data.endswith("}"):
-                files = event.data[1:-1].split("} {")
-            else:
-                files = event.data.split()
-
-            for file in files:
-                if file.lower().endswith('.m4a'):
-                    self.selected_files.add(file)
-
-            self.update_file_list()
+            # splitlist understands Tcl's {braced paths with spaces}
+            files = self.canvas.tk.splitlist(event.data)
+            scanner = self.scanner()
+            self.add_files(file for file in files if os.path.isfile(file) and scanner.matches(file))
+            directories = [file for file in files if os.path.isdir(file)]
+            if directories:
+                self.scan_directories(directories)
 
         except Exception as e:
             print(f"Error handling drop: {e}")
 
+    def add_files(self, files):
+        """Add files to the list; only the viewport is redrawn"""
+        if self.model.add(files):
+            self.render()
+
+    def scanner(self):
+        """A DirectoryScanner with the configured include/exclude globs"""
+        return DirectoryScanner(include=self.config.SCAN_INCLUDE, exclude=self.config.SCAN_EXCLUDE)
+
+    def scan_directories(self, directories):
+        """Scan directories recursively in the background, streaming matches into the list"""
+        results = queue.Queue()
+
+        def scan():
+            try:
+                for batch in self.scanner().iter_batches(directories):
+                    results.put(batch)
+            finally:
+                results.put(None)
+
+        threading.Thread(target=scan, daemon=True).start()
+        self._poll_scan_results(results)
+
+    def _poll_scan_results(self, results):
+        found = []
+        finished = False
+        while True:
+            try:
+                batch = results.get_nowait()
+            except queue.Empty:
+                break
+            if batch is None:
+                finished = True
+                break
+            found.extend(batch)
+        if found:
+            self.add_files(found)
+        if not finished:
+            self.canvas.after(100, self._poll_scan_results, results)
+
     def select_all_files(self):
-        for var in self.file_vars.values():
-            var.set(True)
+        self.model.set_all(True)
+        self.render()
 
     def clear_all_files(self):
-        self.selected_files.clear()
-        self.update_file_list()
+        self.model.clear()
+        self.top = 0
+        self.render()
 
     def remove_selected_files(self):
-        to_remove = [file for file, var in self.file_vars.items() if var.get()]
-        for file in to_remove:
-            self.selected_files.discard(file)
-        self.update_file_list()
+        self.model.remove_checked()
+        self.render()
 
     def update_file_list(self):
-        # Clear existing items
-        for widget in self.scrollable_frame.winfo_children():
-            widget.destroy()
-
-        self.file_vars.clear()
-
-        for i, file in enumerate(sorted(self.selected_files)):
-            var = tk.BooleanVar(value=True)
-            self.file_vars[file] = var
-
-            row_frame = ttk.Frame(self.scrollable_frame)
-            row_frame.grid(row=i, column=0, sticky="ew", pady=1)
-            row_frame.grid_columnconfigure(0, weight=1)
-
-            cb = ttk.Checkbutton(
-                row_frame,
-                text=os.path.basename(file),
-                variable=var
-            )
-            cb.grid(row=0, column=0, sticky="w")
+        self.file_frame.configure(text=self.translations.get("files_to_convert"))
+        self.render()
 
     def get_selected_files(self):
-        return [file for file, var in self.file_vars.items() if var.get()]
\ No newline at end of file
+        return self.model.checked_paths()
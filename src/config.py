@@ -1,25 +1,167 @@
 import sys
+import atexit
 import logging
+import logging.handlers
+import queue
 from pathlib import Path
 
+_log_listener = None
+
+DEFAULT_MP3_BITRATE = "320k"
+
+
+def configure_logging(filename='converter.log', level=logging.DEBUG):
+    """Log through a queue so converting threads never wait on file I/O"""
+    global _log_listener
+    root = logging.getLogger()
+    if _log_listener is not None or root.handlers:
+        return
+    handler = logging.FileHandler(filename)
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    log_queue = queue.SimpleQueue()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+    # The listener thread does the formatting and writing; stop() flushes it at exit
+    _log_listener = logging.handlers.QueueListener(log_queue, handler)
+    _log_listener.start()
+    atexit.register(_log_listener.stop)
+
 
 class Config:
     def __init__(self):
-        self.FFMPEG_URL = "https://github.com/BtbN/FFmpeg-Builds/releases/download/latest/ffmpeg-master-latest-win64-gpl.zip"
+        # FFmpeg builds downloaded by the installer (ffmpeg_installer.py) when FFmpeg is missing:
+        # archive per platform under FFMPEG_DOWNLOAD_URL, verified against FFMPEG_SHA256 or, if
+        # that is None, the archive's line in the release's FFMPEG_CHECKSUMS file
+        self.FFMPEG_DOWNLOAD_URL = "https://github.com/BtbN/FFmpeg-Builds/releases/download/latest/"
+        self.FFMPEG_BUILDS = {
+            "win64": "ffmpeg-master-latest-win64-gpl.zip",
+            "linux64": "ffmpeg-master-latest-linux64-gpl.tar.xz",
+            "linuxarm64": "ffmpeg-master-latest-linuxarm64-gpl.tar.xz",
+        }
+        self.FFMPEG_CHECKSUMS = "checksums.sha256"
+        self.FFMPEG_SHA256 = None
+        self.FFMPEG_INSTALL_DIR = Path.home() / '.m4a_to_mp3' / 'ffmpeg'
+        # Times an interrupted download is resumed, and seconds without data before it counts as one
+        self.FFMPEG_DOWNLOAD_RETRIES = 5
+        self.FFMPEG_DOWNLOAD_TIMEOUT = 30
         self.MAX_CONCURRENT_CONVERSIONS = 3
-        self.MP3_BITRATE = "320k"
+        self.MP3_BITRATE = DEFAULT_MP3_BITRATE
         self.FFMPEG_PARAMS = ["-hide_banner", "-loglevel", "panic"]
+        # Version, encoders and filters of the FFmpeg binary, re-probed when its size or mtime changes
+        self.FFMPEG_PROBE_CACHE = Path.home() / '.m4a_to_mp3' / 'ffmpeg_probe.json'
+        # Preferred conversion backend: "ffmpeg" transcodes in a single ffmpeg process,
+        # "inprocess" decodes with PyAV and encodes with lameenc without spawning processes,
+        # "pydub" decodes to PCM first. Jobs the preferred backend is not installed for or
+        # cannot handle go to the first capable backend in CONVERSION_BACKENDS.
+        self.CONVERSION_ENGINE = "ffmpeg"
+        self.CONVERSION_BACKENDS = ["ffmpeg", "inprocess", "pydub"]
+        self.MP3_ENCODER = "libmp3lame"
+        # OutputProfiles (see profiles.py) to produce from one decode of each source;
+        # empty means a single "{stem}.mp3" at MP3_BITRATE
+        self.OUTPUT_PROFILES = []
+        # Inserted before the extension of an output whose name another source already uses,
+        # e.g. "take (2).mp3"; sources are numbered in path order
+        self.OUTPUT_COLLISION_SUFFIX = " ({n})"
+        # Convert byte-identical sources of a batch once; the copies get links to (or copies of)
+        # the MP3s as CACHE_MODE says
+        self.DEDUPLICATE_SOURCES = True
+        # "longest_first" starts long files first so workers finish together; "input" keeps list order
+        self.JOB_ORDER = "longest_first"
+        # Files at least this long (seconds) are split into SEGMENT_SECONDS pieces that are
+        # encoded in parallel by SEGMENT_WORKERS processes (default: CPU count); None disables
+        self.SEGMENT_THRESHOLD_SECONDS = 1800
+        self.SEGMENT_SECONDS = 300
+        self.SEGMENT_WORKERS = None
+        # Files up to SMALL_FILE_SECONDS long (or SMALL_FILE_BYTES when the duration is unknown)
+        # are converted SMALL_FILE_BATCH_SIZE at a time by one ffmpeg process; 1 disables
+        self.SMALL_FILE_SECONDS = 15
+        self.SMALL_FILE_BYTES = 512 * 1024
+        self.SMALL_FILE_BATCH_SIZE = 16
+        # Memory budget (bytes) for the estimated peak memory of the conversions running at once;
+        # "auto" is half the physical memory, None disables. A job that does not fit waits while
+        # smaller ones go ahead; a job larger than the whole budget runs on its own
+        self.MEMORY_BUDGET_BYTES = "auto"
+        # Peak memory estimates: one ffmpeg process (or streaming in-process encode), and the
+        # multiple of a file's decoded 16-bit PCM size held by backends that decode it whole (pydub)
+        self.MEMORY_PER_PROCESS_BYTES = 64 * 1024 ** 2
+        self.MEMORY_PCM_FACTOR = 2.0
+        # Minimum seconds between live progress updates
+        self.PROGRESS_INTERVAL = 0.25
+        # Maximum rate at which the GUI applies queued progress/status updates
+        self.UI_REFRESH_HZ = 20
+        # Seconds a cancelled ffmpeg process gets to exit before it is killed
+        self.CANCEL_GRACE_SECONDS = 3.0
+
+        # Skip files whose identical source was already converted with identical settings
+        self.CACHE_ENABLED = True
+        self.CACHE_PATH = Path.home() / '.m4a_to_mp3' / 'cache.sqlite'
+        # "link" (hard link, falling back to copy) or "copy"; also used for duplicate sources
+        self.CACHE_MODE = "link"
+
+        # Record each file's state in a journal in the output folder so batches can be resumed
+        self.JOURNAL_ENABLED = True
+        # Store a checksum of every finished output in the journal (reads each MP3 once more)
+        self.JOURNAL_CHECKSUMS = True
+
+        # File name globs used when scanning input directories
+        self.SCAN_INCLUDE = ["*.m4a"]
+        self.SCAN_EXCLUDE = []
+
+        # Watch mode: seconds a file's size must stay unchanged before it is converted
+        self.WATCH_SETTLE_SECONDS = 2.0
+        self.WATCH_POLL_INTERVAL = 1.0
+
+        # Distributed mode (distributed.py): address the coordinator listens on, optional shared
+        # secret workers must send, and seconds without a heartbeat before a worker's jobs are
+        # leased to another worker (at most DISTRIBUTED_MAX_ATTEMPTS times per job)
+        self.DISTRIBUTED_LISTEN = "127.0.0.1:8765"
+        self.DISTRIBUTED_TOKEN = None
+        self.DISTRIBUTED_LEASE_SECONDS = 30
+        self.DISTRIBUTED_MAX_ATTEMPTS = 3
+        self.DISTRIBUTED_HEARTBEAT_SECONDS = 2
+        # Seconds an idle worker waits before asking for work again
+        self.DISTRIBUTED_POLL_SECONDS = 1.0
+        # Files offered to the workers at any one time
+        self.DISTRIBUTED_MAX_IN_FLIGHT = 64
+
+        # Streaming HTTP service (service.py): address, concurrent transcodes (None = CPU count),
+        # requests allowed to wait for a slot and for how many seconds before getting 503
+        self.SERVICE_LISTEN = "127.0.0.1:8080"
+        self.SERVICE_MAX_CONCURRENT = None
+        self.SERVICE_QUEUE_SIZE = 16
+        self.SERVICE_QUEUE_TIMEOUT = 30
+        self.SERVICE_MAX_UPLOAD_BYTES = 2 * 1024 ** 3
+        # Seconds a request may go without reading or writing a byte before it is dropped
+        self.SERVICE_IO_TIMEOUT = 60
+        # Where uploads with the moov box at the end are spooled (None = system temp folder)
+        self.SERVICE_SPOOL_DIR = None
+
+        # Loudness normalization (loudness.py): integrated loudness target in LUFS (None disables,
+        # EBU R128 broadcast is -23), maximum true peak in dBTP and loudness range in LU. Sources
+        # with a wider range than LOUDNESS_RANGE are compressed instead of getting a constant gain
+        self.LOUDNESS_TARGET = None
+        self.LOUDNESS_TRUE_PEAK = -1.5
+        self.LOUDNESS_RANGE = 11.0
+        # First-pass measurements by source content, reused for every later conversion
+        self.LOUDNESS_INDEX_PATH = Path.home() / '.m4a_to_mp3' / 'loudness.sqlite'
+        # Files measured in parallel alongside the conversions (None = CPU count)
+        self.LOUDNESS_ANALYSIS_WORKERS = None
+
+        # Per-batch timing reports: paths ending in .csv are written as CSV, others as JSON
+        self.METRICS_REPORTS = []
+        # Optional Prometheus textfile (node_exporter textfile collector) updated after each batch
+        self.METRICS_PROMETHEUS_PATH = None
 
         # Setup logging
-        logging.basicConfig(
-            filename='converter.log',
-            level=logging.DEBUG,
-            format='%(asctime)s - %(levelname)s - %(message)s'
-        )
+        configure_logging()
 
     @property
     def ffmpeg_path(self):
-        # Always point to the 'src' folder for ffmpeg.exe
+        """The installer's FFmpeg if there is one, else the one bundled in the 'src' folder"""
+        name = 'ffmpeg.exe' if sys.platform == 'win32' else 'ffmpeg'
+        installed = Path(self.FFMPEG_INSTALL_DIR) / name
+        if installed.exists():
+            return installed
         if getattr(sys, 'frozen', False):
-            return Path(sys._MEIPASS) / 'src' / 'ffmpeg.exe'
-        return Path(__file__).parent / 'src' / 'ffmpeg.exe'
\ No newline at end of file
+            return Path(sys._MEIPASS) / 'src' / name
+        return Path(__file__).parent / name
\ No newline at end of file
@@ -1,102 +1,730 @@
 # converter.py
 import asyncio
 import logging
-import subprocess
-import sys
+import os
+import threading
+import time
 from concurrent.futures import ThreadPoolExecutor
-from pydub import AudioSegment
-from tkinter import messagebox
 from pathlib import Path
 
+from .backends import ConversionJob, backend_order, create_backends, select_backend
+from .cache import ConversionCache
+from .hashing import file_digest, find_duplicates
+from .journal import open_journal
+from .loudness import LoudnessIndex, loudness_target, measure_loudness, normalization_filter
+from .media_info import probe_media
+from .memory import MemoryMonitor, memory_budget
+from .metrics import BatchMetrics, FileMetrics
+from .profiles import OutputProfile, check_profiles, path_key, resolve_collisions
+from .process_registry import ProcessRegistry
+from .progress import ProgressTracker, format_eta
+from .scheduler import ConcurrencyController, group_small_files, order_jobs
+
+HASH_WORKERS = 4
+
 
 class AudioConverter:
-    def __init__(self, config, ffmpeg_handler, translations):
+    def __init__(self, config, ffmpeg_handler, translations, audio_processor=None, profiles=None):
         self.config = config
         self.ffmpeg_handler = ffmpeg_handler
         self.tr = translations
+        # Optional callable taking and returning an AudioSegment. Sample-level
+        # processing needs decoded audio, so only the pydub backend supports it.
+        self.audio_processor = audio_processor
+        # OutputProfiles to produce from each source (default: Config.OUTPUT_PROFILES)
+        self.profiles = list(profiles) if profiles else None
+        self.processes = ProcessRegistry()
+        # Every backend by name; each job goes to the first capable one in backend_order()
+        self.backends = create_backends(config, ffmpeg_handler, self.processes)
         self._cancel_flag = False
-        self._configure_pydub()
-
-    def _configure_pydub(self):
-        """Configure pydub settings for optimal performance"""
-        AudioSegment.converter = str(self.config.ffmpeg_path)
-        startupinfo = subprocess.STARTUPINFO()
-        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-        startupinfo.wShowWindow = subprocess.SW_HIDE
-
-        AudioSegment.converter = str(self.config.ffmpeg_path)
-        AudioSegment.converter_kwargs = {
-            'hide_banner': None,
-            'loglevel': 'panic',
-            'startupinfo': startupinfo,
-            'shell': False,
-            'stdin': subprocess.PIPE,
-            'stdout': subprocess.PIPE,
-            'stderr': subprocess.PIPE,
-        }
-
-    def cancel_conversion(self):
-        """Signal to stop the conversion process"""
+        self._tasks = []
+        self._executor = None
+        self._event_callback = None
+        self._loop = None
+        self._progress = None
+        self._progress_listener = None
+        self._mirror_root = None
+        # Collision-free (profile, path) outputs of each file of the batch by str(Path(file))
+        self._planned = {}
+        # Byte-identical copies of each converted file of the batch by str(Path(file))
+        self._duplicates = {}
+        self._created_dirs = set()
+        self._dirs_lock = threading.Lock()
+        self.cache = None
+        self.loudness_index = None
+        # Future of each file's loudness normalization filter while normalizing
+        self._loudness = {}
+        self._analysis_executor = None
+        self.journal = None
+        self.metrics = None  # BatchMetrics of the current or last batch
+        # MediaInfo of each file of the batch by str(Path(file)), for memory estimates
+        self._media_info = {}
+        self.memory_monitor = MemoryMonitor(self.processes)
+
+    def _backend_for(self, job: ConversionJob):
+        """The backend that converts job (RuntimeError if none can)"""
+        return select_backend(self.backends, job, backend_order(self.config))
+
+    def _job(self, m4a_file, targets=(), duration=None, audio_filter=None):
+        return ConversionJob(m4a_file and Path(m4a_file), list(targets), duration, self.audio_processor,
+                             audio_filter)
+
+    def _shares_processes(self):
+        """Whether short files can be grouped into shared ffmpeg processes"""
+        try:
+            backend = self._backend_for(self._job(None, [(profile, None) for profile in self._profiles()]))
+        except RuntimeError:
+            return False
+        return backend is self.backends["ffmpeg"]
+
+    def _profiles(self):
+        return self.profiles or self.config.OUTPUT_PROFILES or [OutputProfile()]
+
+    def _open_cache(self):
+        """Open the conversion cache on first use; caching is skipped if it cannot be opened"""
+        if self.cache is None and self.config.CACHE_ENABLED:
+            try:
+                self.cache = ConversionCache(self.config.CACHE_PATH)
+            except Exception as e:
+                logging.error(f"Conversion cache unavailable: {e}")
+        return self.cache
+
+    def _cache_params(self, profile, backend):
+        """Key describing every setting that affects profile's encoded output"""
+        params = dict(
+            engine=backend.name,
+            encoder=self.config.MP3_ENCODER,
+            **profile.cache_fields(self.config),
+            ffmpeg_params=self.config.FFMPEG_PARAMS,
+            engine_version=backend.version(),
+            segment_threshold=self.config.SEGMENT_THRESHOLD_SECONDS,
+            segment_seconds=self.config.SEGMENT_SECONDS,
+        )
+        # The measurements follow from the source digest, so the target is all that is added
+        target = loudness_target(self.config)
+        if target is not None:
+            params['loudness'] = list(target)
+        return ConversionCache.params_key(**params)
+
+    def _open_loudness_index(self):
+        """Open the loudness index on first use; measurements are not kept if it cannot be opened"""
+        if self.loudness_index is None:
+            try:
+                self.loudness_index = LoudnessIndex(self.config.LOUDNESS_INDEX_PATH)
+            except Exception as e:
+                logging.error(f"Loudness index unavailable: {e}")
+        return self.loudness_index
+
+    def _analyze_loudness(self, m4a_file: Path, target):
+        """First normalization pass for m4a_file, skipped if its measurements are indexed
+
+        Runs on the analysis pool. Returns the second-pass filter chain.
+        """
+        record = self._file_metrics(m4a_file)
+        with record.stage("analyze"):
+            index = self.loudness_index
+            measurement = digest = None
+            if index is not None:
+                cache = self.cache
+                digest = cache.source_digest(m4a_file) if cache is not None else file_digest(m4a_file)
+                measurement = index.lookup(digest)
+            if measurement is None:
+                measurement = measure_loudness(self.backends["ffmpeg"].engine, m4a_file)
+                if index is not None:
+                    index.store(digest, measurement)
+            else:
+                logging.debug(f"Reused loudness measurements of {m4a_file}")
+        audio_filter = normalization_filter(target, measurement)
+        if audio_filter is None:
+            logging.warning(f"{m4a_file} is silent; converting it without normalization")
+        return audio_filter
+
+    def _start_analysis(self, jobs):
+        """Measure every file of jobs for loudness normalization, in dispatch order
+
+        The analysis pool is separate from the conversion executor, so files
+        are measured while earlier ones are being encoded.
+        """
+        self._loudness = {}
+        target = loudness_target(self.config)
+        if target is None:
+            return
+        self._open_loudness_index()
+        self._analysis_executor = ThreadPoolExecutor(
+            max_workers=self.config.LOUDNESS_ANALYSIS_WORKERS or os.cpu_count() or 1,
+            thread_name_prefix="loudness"
+        )
+        for files in jobs:
+            for file in files:
+                self._loudness[str(Path(file))] = self._analysis_executor.submit(
+                    self._analyze_loudness, Path(file), target)
+
+    async def _analyzed(self, files):
+        """Wait until the loudness analysis of files is done (failures surface in _audio_filter)"""
+        futures = [self._loudness[key] for key in map(str, map(Path, files)) if key in self._loudness]
+        if futures:
+            await asyncio.wait([asyncio.wrap_future(future) for future in futures])
+
+    def _audio_filter(self, m4a_file):
+        """m4a_file's normalization filter, re-raising a failed analysis"""
+        future = self._loudness.get(str(Path(m4a_file)))
+        return future.result() if future is not None else None
+
+    def _open_journal(self, output_folder: Path):
+        """Open the job journal of output_folder, reusing it across batches into the same folder"""
+        if not self.config.JOURNAL_ENABLED:
+            return None
+        if self.journal is not None and self.journal.db_path.parent != output_folder:
+            self.journal.close()
+            self.journal = None
+        if self.journal is None:
+            self.journal = open_journal(output_folder)
+        return self.journal
+
+    def _record_done(self, m4a_file: Path, output_path: Path):
+        if self.journal is not None:
+            checksum = file_digest(output_path) if self.config.JOURNAL_CHECKSUMS else None
+            self.journal.mark_done(m4a_file, output_path, checksum)
+
+    def _file_metrics(self, file) -> FileMetrics:
+        """The batch's metrics record for file (a throwaway one outside a batch)"""
+        if self.metrics is None:
+            return FileMetrics(str(file))
+        return self.metrics.file(Path(file))
+
+    def _export_metrics(self):
+        self.metrics.finish()
+        totals = self.metrics.stage_totals()
+        busy = sum(seconds for name, seconds in totals.items() if name != "queue")
+        if busy:
+            logging.info("Stage time: " + ", ".join(
+                f"{name} {seconds:.2f}s ({seconds / busy:.0%})"
+                for name, seconds in totals.items() if name != "queue" and seconds))
+        if not (self.config.METRICS_REPORTS or self.config.METRICS_PROMETHEUS_PATH):
+            return
+        try:
+            self.metrics.export(self.config.METRICS_REPORTS, self.config.METRICS_PROMETHEUS_PATH)
+        except Exception as e:
+            logging.error(f"Could not write metrics report: {e}")
+
+    def _probe_durations(self, files):
+        """Durations from container headers only; unknown files map to None"""
+        durations = {}
+        for file in files:
+            record = self._file_metrics(file)
+            with record.stage("probe"):
+                info = probe_media(file)
+            self._media_info[str(Path(file))] = info
+            durations[str(Path(file))] = record.duration = info.duration if info else None
+        return durations
+
+    def _memory_estimate(self, files):
+        """Estimated peak memory in bytes of converting files as one job"""
+        if len(files) > 1:
+            # convert_small_files encodes them all in one ffmpeg process
+            estimate = self.backends["ffmpeg"].memory_estimate(self._job(None))
+        else:
+            m4a_file = Path(files[0])
+            try:
+                audio_filter = self._audio_filter(m4a_file)
+            except Exception:
+                audio_filter = None  # The failed analysis is reported by the conversion
+            job = self._job(m4a_file, [(profile, None) for profile in self._profiles()],
+                            self._file_metrics(m4a_file).duration, audio_filter)
+            try:
+                backend = self._backend_for(job)
+            except RuntimeError:
+                return 0
+            estimate = backend.memory_estimate(job, self._media_info.get(str(m4a_file)))
+        for file in files:
+            self._file_metrics(file).memory_estimate = estimate // len(files)
+        return estimate
+
+    def _find_duplicates(self, files):
+        """{str(Path(file)): [copies]} for each file that has byte-identical copies in files"""
+        cache = self._cache_for_batch()
+        digest = cache.source_digest if cache is not None else file_digest
+        with ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="hash") as pool:
+            return find_duplicates([str(Path(file)) for file in files], digest, pool.map)
+
+    def _report_progress(self, file_key, seconds, speed):
+        """Called from worker threads with the encoder's position in file_key"""
+        if self._progress is None:
+            return
+        self._progress.update(file_key, seconds, speed)
+        if self._progress_listener:
+            self._loop.call_soon_threadsafe(self._progress_listener)
+
+    def _output_paths(self, m4a_file: Path, output_folder: Path):
+        """(profile, path) for each of m4a_file's MP3s
+
+        The source's folder below the input root is mirrored if requested.
+        Within a batch the paths fixed by _plan_outputs are returned.
+        """
+        planned = self._planned.get(str(m4a_file))
+        if planned is not None:
+            return planned
+        folder = output_folder
+        if self._mirror_root is not None:
+            try:
+                relative = os.path.relpath(m4a_file.parent.absolute(), self._mirror_root)
+            except ValueError:  # Different drive on Windows
+                relative = '.'
+            if relative != '.' and not relative.startswith('..'):
+                folder = output_folder / relative
+                self._ensure_dir(folder)
+        outputs = []
+        for profile in self._profiles():
+            output_path = folder / profile.filename(m4a_file, self.config)
+            if output_path.parent != folder:
+                self._ensure_dir(output_path.parent)
+            outputs.append((profile, output_path))
+        return outputs
+
+    def _plan_outputs(self, files, output_folder: Path, journal):
+        """Fix the output paths of the batch, adding Config.OUTPUT_COLLISION_SUFFIX where they collide
+
+        Sources with the same name in different folders would otherwise write
+        the same MP3. Outputs the journal records for other sources count as
+        taken too, so later batches into the folder do not overwrite them.
+        """
+        self._planned = {}
+        outputs = {str(Path(file)): self._output_paths(Path(file), output_folder) for file in files}
+        owners = {}
+        if journal is not None:
+            for output, sources in journal.owners().items():
+                owners[path_key(output)] = {path_key(source) for source in sources}
+        resolved = resolve_collisions(
+            {file: [path for _, path in paths] for file, paths in outputs.items()},
+            owners, self.config.OUTPUT_COLLISION_SUFFIX)
+        renamed = 0
+        for file, paths in outputs.items():
+            self._planned[file] = [(profile, path) for (profile, _), path in zip(paths, resolved[file])]
+            renamed += sum(old != new for (_, old), new in zip(paths, resolved[file]))
+        if renamed:
+            logging.info(f"Renamed {renamed} outputs whose names were taken by other sources")
+
+    @staticmethod
+    def _partial_path(output_path: Path) -> Path:
+        return output_path.with_name(output_path.name + '.part')
+
+    def _ensure_dir(self, folder: Path):
+        """Create an output directory once per batch, however many files land in it"""
+        if folder in self._created_dirs:
+            return
+        with self._dirs_lock:
+            if folder not in self._created_dirs:
+                folder.mkdir(parents=True, exist_ok=True)
+                self._created_dirs.add(folder)
+
+    def _emit(self, event, **fields):
+        """Publish a machine-readable progress event to the batch's listener"""
+        if self._event_callback:
+            self._event_callback({'event': event, 'time': time.time(), **fields})
+
+    def cancel_conversion(self, wait=False):
+        """Stop the conversion: terminate running encodes and abandon queued files
+
+        Safe to call from any thread. Terminating processes can take up to
+        CANCEL_GRACE_SECONDS, so unless wait is True it happens in the background.
+        """
         self._cancel_flag = True
         logging.info("Conversion cancellation requested")
+        for backend in self.backends.values():
+            backend.cancel()
+        if wait:
+            self.processes.terminate_all(self.config.CANCEL_GRACE_SECONDS)
+        else:
+            threading.Thread(
+                target=self.processes.terminate_all,
+                args=(self.config.CANCEL_GRACE_SECONDS,),
+                daemon=True
+            ).start()
+        if self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._cancel_tasks)
+            except RuntimeError:
+                pass  # The batch already finished and its loop is closed
+
+    def _cancel_tasks(self):
+        for task in self._tasks:
+            task.cancel()
+
+    def _start_file(self, m4a_file: Path, outputs, record: FileMetrics, cache, backend):
+        """Mark m4a_file as running and restore its cached outputs
+
+        Returns (source digest, pending) where pending lists the
+        (profile, output path, cache params) still to be encoded.
+        """
+        record.status = "running"
+        record.worker = threading.current_thread().name
+        record.bytes_in = os.path.getsize(m4a_file)
+        if self.journal is not None:
+            for _, output_path in outputs:
+                self.journal.mark_running(m4a_file, output_path)
+
+        if cache is None:
+            return None, [(profile, output_path, None) for profile, output_path in outputs]
+
+        pending, hits = [], []
+        with record.stage("cache"):
+            digest = cache.source_digest(m4a_file)
+            for profile, output_path in outputs:
+                params = self._cache_params(profile, backend)
+                cached = cache.lookup(digest, params)
+                if cached is None:
+                    pending.append((profile, output_path, params))
+                else:
+                    hits.append((cached, output_path))
+        for cached, output_path in hits:
+            with record.stage("write"):
+                cache.restore(cached, output_path, self.config.CACHE_MODE)
+                self._record_done(m4a_file, output_path)
+            logging.info(f"Reused cached conversion {cached} for {output_path}")
+        return digest, pending
+
+    def _pending_targets(self, pending):
+        """(profile, partial path) to encode into for each pending output
+
+        Encoders write to temporary names that only become the real outputs
+        once complete, so a crash never leaves a truncated MP3 behind.
+        """
+        targets = [(profile, self._partial_path(output_path)) for profile, output_path, _ in pending]
+        # Never write through a hard link left behind by an interrupted restore
+        self._discard_partials(targets)
+        return targets
+
+    @staticmethod
+    def _discard_partials(targets):
+        for _, partial_path in targets:
+            partial_path.unlink(missing_ok=True)
+
+    def _finish_file(self, m4a_file: Path, outputs, pending, digest, record: FileMetrics, cache):
+        """Move encoded outputs into place and record them in the cache and journal"""
+        with record.stage("write"):
+            for _, output_path, _ in pending:
+                os.replace(self._partial_path(output_path), output_path)
+            for _, output_path, params in pending:
+                if cache is not None:
+                    cache.store(digest, params, output_path)
+                self._record_done(m4a_file, output_path)
+        record.status = "completed" if pending else "cached"
+        record.bytes_out = sum(os.path.getsize(output_path) for _, output_path in outputs)
+
+    def _conversion_failed(self, m4a_file: Path, outputs, record: FileMetrics, error):
+        logging.error(f"Conversion failed for {m4a_file}: {error}")
+        record.status = "cancelled" if self._cancel_flag else "failed"
+        if self.journal is not None:
+            for _, output_path in outputs:
+                self.journal.mark_failed(m4a_file, output_path, error)
+        if not self._cancel_flag:
+            self._emit('file_failed', file=str(m4a_file), error=str(error))
+
+    def _cache_for_batch(self):
+        # A callable processor cannot be part of a cache key, so its results are never cached
+        return self.cache if self.audio_processor is None else None
 
     async def convert_single_file(self, m4a_file: Path, output_folder: Path) -> bool:
         """Convert a single M4A file to MP3 format"""
         if self._cancel_flag:
             return False
 
+        outputs = []
+        record = self._file_metrics(m4a_file)
         try:
-            output_path = output_folder / f"{m4a_file.stem}.mp3"
+            outputs = self._output_paths(m4a_file, output_folder)
+            file_key = str(m4a_file)
+            cache = self._cache_for_batch()
 
             def convert():
                 if self._cancel_flag:
+                    record.status = "cancelled"
                     return False
+                audio_filter = self._audio_filter(m4a_file)
+                backend = self._backend_for(self._job(m4a_file, outputs, record.duration, audio_filter))
+                digest, pending = self._start_file(m4a_file, outputs, record, cache, backend)
+                targets = self._pending_targets(pending)
+                # The file's own processes, so their memory is measured for this file alone
+                processes = ProcessRegistry(parent=self.processes)
+                try:
+                    if targets:
+                        with self.memory_monitor.track(
+                                record, processes=processes if backend.memory_in_children else None):
+                            backend.convert(
+                                self._job(m4a_file, targets, record.duration, audio_filter), record,
+                                lambda seconds, speed: self._report_progress(file_key, seconds, speed),
+                                processes
+                            )
+                    self._finish_file(m4a_file, outputs, pending, digest, record, cache)
+                except Exception:
+                    self._discard_partials(targets)
+                    raise
+                return True
+
+            return await asyncio.get_event_loop().run_in_executor(self._executor, convert)
+
+        except Exception as e:
+            self._conversion_failed(m4a_file, outputs, record, e)
+            return False
+
+    async def convert_small_files(self, m4a_files, output_folder: Path):
+        """Convert several short files with a single ffmpeg process (see _shares_processes)
+
+        Returns a list of (file, success). If the shared process fails, every
+        file is converted again on its own so the error is reported against
+        the file that caused it.
+        """
+        if self._cancel_flag:
+            return [(file, False) for file in m4a_files]
+        if len(m4a_files) == 1:
+            return [(file, await self.convert_single_file(Path(file), output_folder))
+                    for file in m4a_files]
 
-                audio = AudioSegment.from_file(str(m4a_file), format="m4a")
-                audio.export(
-                    str(output_path),
-                    format="mp3",
-                    bitrate=self.config.MP3_BITRATE,
-                    parameters=self.config.FFMPEG_PARAMS
-                )
+        cache = self._cache_for_batch()
+        ffmpeg = self.backends["ffmpeg"]
+
+        def convert():
+            jobs = []
+            for file in m4a_files:
+                m4a_file = Path(file)
+                record = self._file_metrics(m4a_file)
+                outputs = self._output_paths(m4a_file, output_folder)
+                digest, pending = self._start_file(m4a_file, outputs, record, cache, ffmpeg)
+                jobs.append((m4a_file, outputs, record, digest, pending, self._pending_targets(pending)))
+            encoded = [job for job in jobs if job[5]]
+            durations = {str(job[0]): job[2].duration for job in encoded}
+
+            def report(seconds, speed):
+                # All inputs are decoded side by side, so each is roughly this far along
+                for file_key, duration in durations.items():
+                    self._report_progress(file_key, min(seconds, duration or seconds), speed)
+
+            processes = ProcessRegistry(parent=self.processes)
+            try:
+                if encoded:
+                    started = time.perf_counter()
+                    with self.memory_monitor.track(*(job[2] for job in encoded), processes=processes):
+                        ffmpeg.convert_batch(
+                            [self._job(m4a_file, targets, record.duration, self._audio_filter(m4a_file))
+                             for m4a_file, _, record, _, _, targets in encoded],
+                            report, processes
+                        )
+                    share = (time.perf_counter() - started) / len(encoded)
+                    for job in encoded:
+                        job[2].add("encode", share)
+                for m4a_file, outputs, record, digest, pending, _ in jobs:
+                    self._finish_file(m4a_file, outputs, pending, digest, record, cache)
+            except Exception:
+                for job in jobs:
+                    self._discard_partials(job[5])
+                raise
+
+        try:
+            await asyncio.get_event_loop().run_in_executor(self._executor, convert)
+            return [(file, True) for file in m4a_files]
+        except Exception as e:
+            if self._cancel_flag:
+                for file in m4a_files:
+                    self._file_metrics(file).status = "cancelled"
+                return [(file, False) for file in m4a_files]
+            logging.warning(f"Shared conversion of {len(m4a_files)} files failed ({e}), "
+                            f"converting them one by one")
+            return [(file, await self.convert_single_file(Path(file), output_folder))
+                    for file in m4a_files]
+
+    async def convert_duplicate(self, m4a_file: Path, original: Path, original_converted: bool,
+                                output_folder: Path) -> bool:
+        """Give m4a_file, a byte-identical copy of original, original's MP3s
+
+        They are hard-linked or copied as Config.CACHE_MODE says.
+        """
+        if self._cancel_flag:
+            return False
+
+        outputs = []
+        record = self._file_metrics(m4a_file)
+        try:
+            outputs = self._output_paths(m4a_file, output_folder)
+            if not original_converted:
+                raise RuntimeError(f"Conversion of identical file {original} failed")
+            converted = self._output_paths(original, output_folder)
+            self._emit('file_started', file=str(m4a_file))
+
+            def reuse():
+                record.status = "running"
+                record.bytes_in = os.path.getsize(m4a_file)
+                with record.stage("write"):
+                    for (_, source), (_, output_path) in zip(converted, outputs):
+                        ConversionCache.restore(source, output_path, self.config.CACHE_MODE)
+                        self._record_done(m4a_file, output_path)
+                logging.info(f"{m4a_file} is identical to {original}; reused its output")
+                record.status = "duplicate"
+                record.bytes_out = sum(os.path.getsize(output_path) for _, output_path in outputs)
                 return True
 
-            return await asyncio.get_event_loop().run_in_executor(None, convert)
+            return await asyncio.get_event_loop().run_in_executor(self._executor, reuse)
 
         except Exception as e:
-            logging.error(f"Conversion failed for {m4a_file}: {e}")
-            if not self._cancel_flag:
-                messagebox.showerror(
-                    self.tr.get("error"),
-                    self.tr.get("conversion_error").format(str(e))
-                )
+            self._conversion_failed(m4a_file, outputs, record, e)
             return False
 
     async def convert_files(self, files_to_convert, output_folder,
-                            progress_callback=None, status_callback=None):
-        """Convert multiple files with efficient resource management"""
+                            progress_callback=None, status_callback=None,
+                            concurrency=None, event_callback=None,
+                            mirror_tree=False, input_root=None, resume=False):
+        """Convert multiple files with efficient resource management
+
+        concurrency is a worker count or "auto"; it defaults to
+        Config.MAX_CONCURRENT_CONVERSIONS. event_callback receives one dict
+        per batch/file event (see _emit) and must not block. With mirror_tree
+        the folder structure below input_root (default: the inputs' common
+        folder) is recreated in output_folder; otherwise outputs whose names
+        collide get a numbered suffix. With resume, files the output folder's
+        job journal records as done (and whose MP3 is intact) are skipped.
+        Byte-identical sources are converted once and the copies reuse the
+        MP3s (Config.DEDUPLICATE_SOURCES).
+        """
+        # A file selected twice is converted once
+        unique = {}
+        for file in files_to_convert:
+            unique.setdefault(path_key(file), file)
+        files_to_convert = list(unique.values())
         logging.info(f"Starting batch conversion of {len(files_to_convert)} files")
 
         self._cancel_flag = False
+        self.processes.reset()
+        for backend in self.backends.values():
+            backend.reset()
+        self._event_callback = event_callback
+        check_profiles(self._profiles(), self.config)
+        self._open_cache()
+        self.metrics = BatchMetrics()
+        started = time.monotonic()
         output_folder = Path(output_folder)
         output_folder.mkdir(parents=True, exist_ok=True)
+        self._created_dirs = {output_folder}
+        self._mirror_root = None
+        if mirror_tree and files_to_convert:
+            try:
+                self._mirror_root = os.path.abspath(input_root) if input_root else os.path.commonpath(
+                    [os.path.dirname(os.path.abspath(file)) for file in files_to_convert])
+            except ValueError:
+                logging.warning("Inputs share no common folder; writing a flat output folder")
+
+        skipped = 0
+        journal = self._open_journal(output_folder)
+        self._plan_outputs(files_to_convert, output_folder, journal)
+        if journal is not None:
+            outputs = {file: [output for _, output in self._output_paths(Path(file), output_folder)]
+                       for file in files_to_convert}
+            if resume:
+                unfinished = [file for file in files_to_convert
+                              if not all(journal.is_done(file, output) for output in outputs[file])]
+                skipped = len(files_to_convert) - len(unfinished)
+                files_to_convert = unfinished
+                logging.info(f"Resuming batch: skipping {skipped} completed files")
+            journal.enqueue([(file, output) for file in files_to_convert for output in outputs[file]])
+        elif resume:
+            logging.warning("Resume requested but the job journal is disabled; converting everything")
 
         total_files = len(files_to_convert)
         completed = 0
         tasks = []
 
-        # Create semaphore for limiting concurrent conversions
-        sem = asyncio.Semaphore(self.config.MAX_CONCURRENT_CONVERSIONS)
+        # The controller limits concurrent conversions and, in auto mode, tunes the limit
+        if concurrency is None:
+            concurrency = self.config.MAX_CONCURRENT_CONVERSIONS
+        budget = memory_budget(self.config)
+        controller = ConcurrencyController(concurrency, memory_budget=budget)
+        self._executor = ThreadPoolExecutor(max_workers=controller.max_workers,
+                                            thread_name_prefix="converter")
+        logging.info(f"Concurrency: {concurrency} (starting with {controller.limit} workers)")
+        if budget is not None:
+            logging.info(f"Memory budget: {budget / 1024 ** 2:.0f} MB")
+        self.metrics.baseline_rss = self.memory_monitor.sample()
+        self.memory_monitor.start()
+        loop = asyncio.get_event_loop()
+        self._loop = loop
+
+        durations = await loop.run_in_executor(self._executor, self._probe_durations,
+                                               files_to_convert)
+        copies = set()
+        if self.config.DEDUPLICATE_SOURCES:
+            self._duplicates = await loop.run_in_executor(self._executor, self._find_duplicates,
+                                                          files_to_convert)
+            copies = {copy for group in self._duplicates.values() for copy in group}
+            if copies:
+                logging.info(f"{len(copies)} files are copies of others and reuse their MP3s")
+        files_to_convert = order_jobs([file for file in files_to_convert if str(Path(file)) not in copies],
+                                      durations, self.config.JOB_ORDER)
+        # Short clips share ffmpeg processes so process startup does not dominate
+        jobs = group_small_files(
+            files_to_convert, durations,
+            max_seconds=self.config.SMALL_FILE_SECONDS,
+            max_bytes=self.config.SMALL_FILE_BYTES,
+            batch_size=self.config.SMALL_FILE_BATCH_SIZE if self._shares_processes() else 1,
+            workers=controller.limit
+        )
+        self._start_analysis(jobs)
+        self._progress = ProgressTracker(durations)
+        last_published = 0.0
+
+        def publish_progress(force=False):
+            nonlocal last_published
+            now = time.monotonic()
+            if not force and now - last_published < self.config.PROGRESS_INTERVAL:
+                return
+            last_published = now
+            snapshot = self._progress.snapshot()
+            self._emit('progress', completed=completed, total=total_files, **snapshot)
+            if progress_callback:
+                progress_callback(snapshot['progress'])
+            if status_callback:
+                status_callback(self.tr.get("converting_progress").format(
+                    completed, total_files, snapshot['progress'],
+                    format_eta(snapshot['eta']), snapshot['speed']
+                ))
+
+        self._progress_listener = publish_progress
+        self._emit('batch_started', total=total_files, concurrency=concurrency,
+                   output_folder=str(output_folder), skipped=skipped, duplicates=len(copies),
+                   total_duration=sum(d for d in durations.values() if d))
 
-        async def bounded_convert(file):
-            async with sem:
+        async def bounded_convert(files):
+            # Files take a conversion slot only once they are measured, so others encode meanwhile
+            await self._analyzed(files)
+            memory = self._memory_estimate(files)
+            queued_at = time.perf_counter()
+            await controller.acquire(memory)
+            for file in files:
+                self._file_metrics(file).add("queue", time.perf_counter() - queued_at)
+            try:
                 if self._cancel_flag:
-                    return False
-                return await self.convert_single_file(Path(file), output_folder)
+                    return [(file, False) for file in files]
+                for file in files:
+                    self._emit('file_started', file=str(file))
+                if len(files) == 1:
+                    results = [(files[0], await self.convert_single_file(Path(files[0]), output_folder))]
+                else:
+                    results = await self.convert_small_files(files, output_folder)
+            finally:
+                await controller.release(memory)
+            if controller.auto:
+                audio_seconds = sum(durations.get(str(Path(file))) or 0
+                                    for file, success in results if success)
+                if audio_seconds:
+                    await controller.record(audio_seconds)
+            # Copies need no conversion slot: their MP3s are links to (or copies of) the original's
+            for file, success in list(results):
+                for copy in self._duplicates.get(str(Path(file)), ()):
+                    results.append((copy, await self.convert_duplicate(Path(copy), Path(file), success,
+                                                                       output_folder)))
+            return results
 
-        # Create tasks for all files
-        for file in files_to_convert:
-            tasks.append(bounded_convert(file))
+        # One task per job; a job is a single file or a group of short ones
+        for files in jobs:
+            tasks.append(asyncio.ensure_future(bounded_convert(files)))
+        self._tasks = tasks
 
         try:
             # Process files with controlled concurrency
@@ -104,20 +732,48 @@ class AudioConverter:
                 if self._cancel_flag:
                     if status_callback:
                         status_callback(self.tr.get("conversion_cancelled"))
+                    self._emit('batch_cancelled', completed=completed, total=total_files)
                     return False
 
-                if await task:
-                    completed += 1
-                    if progress_callback:
-                        progress_callback((completed / total_files) * 100)
-                    if status_callback:
-                        status_callback(self.tr.get("converting").format(completed, total_files))
+                for file, success in await task:
+                    if success:
+                        completed += 1
+                        self._progress.complete(str(Path(file)))
+                        self._emit('file_completed', file=str(file), completed=completed,
+                                   total=total_files, progress=self._progress.snapshot()['progress'],
+                                   stages=self._file_metrics(file).stages,
+                                   peak_rss=self._file_metrics(file).peak_rss)
+                    else:
+                        self._progress.discard(str(Path(file)))
+                publish_progress(force=True)
 
         except asyncio.CancelledError:
             self._cancel_flag = True
             if status_callback:
                 status_callback(self.tr.get("conversion_cancelled"))
+            self._emit('batch_cancelled', completed=completed, total=total_files)
             return False
 
+        finally:
+            for task in tasks:
+                task.cancel()
+            self._tasks = []
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            if self._analysis_executor is not None:
+                self._analysis_executor.shutdown(wait=False, cancel_futures=True)
+                self._analysis_executor = None
+            self._loudness = {}
+            self._media_info = {}
+            self._planned = {}
+            self._duplicates = {}
+            self.memory_monitor.stop()
+            self.metrics.peak_rss = self.memory_monitor.peak
+            self._progress_listener = None
+            self._export_metrics()
+
         logging.info(f"Batch conversion completed: {completed}/{total_files} files")
+        self._emit('batch_completed', completed=completed, failed=total_files - completed,
+                   total=total_files, elapsed=time.monotonic() - started,
+                   stage_seconds=self.metrics.stage_totals())
         return completed == total_files
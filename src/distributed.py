@@ -0,0 +1,622 @@
+# distributed.py
+"""
+Distributed conversion: a coordinator that holds the job queue and workers
+on other machines (or other processes on this one) that pull jobs over HTTP.
+
+The coordinator is an AudioConverter whose per-file step hands the file to
+a remote worker instead of encoding it, so ordering, the job journal,
+resume, progress events and metrics work exactly as in a local batch.
+
+Protocol (JSON bodies, optional "Authorization: Bearer <token>"):
+
+    POST /lease                     {"worker"} -> job, or 204 when the queue is empty
+    POST /heartbeat                 {"worker", "jobs": {id: {"token", "seconds", "speed"}}}
+                                    -> {"revoked": [ids]}
+    GET  /jobs/<id>/source          source bytes, for workers without shared storage
+    PUT  /jobs/<id>/outputs/<n>     MP3 bytes of target n, likewise
+    POST /jobs/<id>/complete        {"worker", "token", "stages"}
+    POST /jobs/<id>/fail            {"worker", "token", "error"}
+    GET  /status                    job counts and workers
+
+A job is leased to one worker at a time. Workers send heartbeats while they
+convert; a lease that is not renewed within Config.DISTRIBUTED_LEASE_SECONDS
+expires and the job goes back to the front of the queue for another worker.
+Outputs are written under a per-lease name ("<output>.<token>.part"), so a
+worker that lost its lease can never overwrite the files of its successor.
+"""
+
+import asyncio
+import collections
+import hmac
+import json
+import logging
+import os
+import re
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from .backends import ConversionJob, backend_order, create_backends, select_backend
+from .converter import AudioConverter
+from .metrics import FileMetrics
+from .process_registry import ProcessRegistry
+from .profiles import OutputProfile
+
+QUEUED = "queued"
+LEASED = "leased"
+COPY_CHUNK = 1024 * 1024
+
+
+def parse_address(address, default_port=8765):
+    """(host, port) from "host:port", ":port" or "host" """
+    host, _, port = str(address).rpartition(':')
+    if not host and not port.isdigit():
+        return port, default_port
+    return host or '0.0.0.0', int(port) if port else default_port
+
+
+def lease_partial_path(output_path, token):
+    return Path(f"{output_path}.{token}.part")
+
+
+class RemoteJob:
+    """One source file and its outputs, as handed to workers"""
+
+    def __init__(self, job_id, source, outputs, duration, loop, audio_filter=None):
+        self.id = job_id
+        self.source = Path(source)
+        # (profile, output path) as planned by the coordinator
+        self.outputs = outputs
+        self.duration = duration
+        # ffmpeg filter chain such as the loudness normalization the coordinator measured
+        self.audio_filter = audio_filter
+        self.loop = loop
+        self.future = loop.create_future()
+        self.state = QUEUED
+        self.worker = None
+        self.token = None
+        self.lease_expires = None
+        self.attempts = 0
+        # Tokens of expired leases, whose workers may have left partial outputs behind
+        self.stale_tokens = []
+
+    def as_dict(self, config):
+        return {
+            'id': self.id,
+            'token': self.token,
+            'source': str(self.source),
+            'duration': self.duration,
+            'audio_filter': self.audio_filter,
+            'targets': [{
+                'bitrate': profile.resolved_bitrate(config),
+                'channels': profile.channels,
+                'sample_rate': profile.sample_rate,
+                'output': str(output_path),
+            } for profile, output_path in self.outputs],
+        }
+
+    def resolve(self, result=None, error=None):
+        """Complete the coordinator's future from any thread"""
+        def settle():
+            if self.future.done():
+                return
+            if error is not None:
+                self.future.set_exception(error)
+            else:
+                self.future.set_result(result)
+        try:
+            self.loop.call_soon_threadsafe(settle)
+        except RuntimeError:
+            pass  # The batch's loop is already closed
+
+
+class JobBoard:
+    """Thread-safe queue of RemoteJobs with leases that expire without heartbeats"""
+
+    def __init__(self, lease_seconds, max_attempts):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._queue = collections.deque()
+        self._workers = {}  # name -> last time it was heard from
+        self.progress_callback = None  # (job, seconds, speed) from heartbeats
+
+    def submit(self, source, outputs, duration, loop, audio_filter=None):
+        # Workers sharing the storage resolve these paths, and their working directory differs
+        source = os.path.abspath(source)
+        outputs = [(profile, Path(os.path.abspath(path))) for profile, path in outputs]
+        with self._lock:
+            job = RemoteJob(uuid.uuid4().hex, source, outputs, duration, loop, audio_filter)
+            self._jobs[job.id] = job
+            self._queue.append(job.id)
+            return job
+
+    def lease(self, worker):
+        """The next queued job, now leased to worker, or None"""
+        now = time.monotonic()
+        with self._lock:
+            self._workers[worker] = now
+            self._expire(now)
+            while self._queue:
+                job = self._jobs.get(self._queue.popleft())
+                if job is None or job.state != QUEUED:
+                    continue
+                job.state = LEASED
+                job.worker = worker
+                job.token = uuid.uuid4().hex
+                job.lease_expires = now + self.lease_seconds
+                job.attempts += 1
+                logging.info(f"Leased {job.source} to {worker} (attempt {job.attempts})")
+                return job
+        return None
+
+    def heartbeat(self, worker, reports):
+        """Renew worker's leases; returns the ids it no longer holds"""
+        now = time.monotonic()
+        revoked = []
+        renewed = []
+        with self._lock:
+            self._workers[worker] = now
+            self._expire(now)
+            for job_id, report in reports.items():
+                job = self._jobs.get(job_id)
+                if job is None or job.state != LEASED or job.token != report.get('token'):
+                    revoked.append(job_id)
+                    continue
+                job.lease_expires = now + self.lease_seconds
+                renewed.append((job, report))
+        if self.progress_callback:
+            for job, report in renewed:
+                if report.get('seconds') is not None:
+                    self.progress_callback(job, report['seconds'], report.get('speed'))
+        return revoked
+
+    def holder(self, job_id, token):
+        """The job if token is its current lease, else None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.state != LEASED or not token or job.token != token:
+                return None
+            return job
+
+    def finish(self, job_id, token, result=None, error=None):
+        """End token's lease on job_id successfully or with error; False if it was not held"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.state != LEASED or job.token != token:
+                return False
+            del self._jobs[job_id]
+        job.resolve(result, error)
+        return True
+
+    def withdraw(self, job):
+        """Drop a job the coordinator no longer waits for (e.g. its batch was cancelled)"""
+        with self._lock:
+            self._jobs.pop(job.id, None)
+
+    def _expire(self, now):
+        for job in self._jobs.values():
+            if job.state != LEASED or job.lease_expires > now:
+                continue
+            logging.warning(f"Lease of {job.source} by {job.worker} expired")
+            job.stale_tokens.append(job.token)
+            if job.attempts >= self.max_attempts:
+                job.state = None
+                job.resolve(error=RuntimeError(
+                    f"Lost {job.attempts} workers while converting {job.source}"))
+            else:
+                job.state = QUEUED
+                job.worker = job.token = None
+                # Retried jobs go first, they have waited longest
+                self._queue.appendleft(job.id)
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.state is None]:
+            del self._jobs[job_id]
+
+    def status(self):
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            states = collections.Counter(job.state for job in self._jobs.values())
+            return {
+                'queued': states[QUEUED],
+                'leased': states[LEASED],
+                'workers': {name: round(now - seen, 1) for name, seen in self._workers.items()},
+            }
+
+
+class _CoordinatorHandler(BaseHTTPRequestHandler):
+    server_version = "m4a-to-mp3-coordinator"
+    protocol_version = "HTTP/1.1"
+    coordinator = None  # Set on the per-server subclass
+
+    def log_message(self, format, *args):
+        logging.debug(f"Coordinator {self.address_string()}: {format % args}")
+
+    def log_request(self, code='-', size='-'):
+        # Idle workers poll constantly; only log the requests that went wrong
+        if isinstance(code, int) and code >= 400:
+            super().log_request(code, size)
+
+    def _authorized(self):
+        token = self.coordinator.config.DISTRIBUTED_TOKEN
+        if not token:
+            return True
+        offered = self.headers.get('Authorization', '')
+        if hmac.compare_digest(offered, f"Bearer {token}"):
+            return True
+        self._reply(401, {'error': 'unauthorized'})
+        return False
+
+    def _reply(self, status, body=None):
+        data = json.dumps(body).encode() if body is not None else b''
+        self.send_response(status)
+        if body is not None:
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _json_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        board = self.coordinator.board
+        if self.path == '/status':
+            self._reply(200, board.status())
+            return
+        match = re.fullmatch(r'/jobs/(\w+)/source', self.path)
+        job = match and board.holder(match.group(1), self.headers.get('X-Lease-Token'))
+        if not job:
+            self._reply(404, {'error': 'no such lease'})
+            return
+        size = os.path.getsize(job.source)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(size))
+        self.end_headers()
+        with open(job.source, 'rb') as f:
+            shutil.copyfileobj(f, self.wfile, COPY_CHUNK)
+
+    def do_PUT(self):
+        if not self._authorized():
+            return
+        match = re.fullmatch(r'/jobs/(\w+)/outputs/(\d+)', self.path)
+        token = self.headers.get('X-Lease-Token')
+        job = match and self.coordinator.board.holder(match.group(1), token)
+        index = int(match.group(2)) if match else -1
+        if not job or index >= len(job.outputs):
+            self._reply(404, {'error': 'no such lease'})
+            return
+        remaining = int(self.headers.get('Content-Length') or 0)
+        with open(lease_partial_path(job.outputs[index][1], token), 'wb') as f:
+            while remaining:
+                chunk = self.rfile.read(min(COPY_CHUNK, remaining))
+                if not chunk:
+                    break
+                f.write(chunk)
+                remaining -= len(chunk)
+        self._reply(200 if not remaining else 400, {})
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        board = self.coordinator.board
+        try:
+            body = self._json_body()
+        except ValueError:
+            self._reply(400, {'error': 'invalid JSON'})
+            return
+        worker = str(body.get('worker') or self.client_address[0])
+
+        if self.path == '/lease':
+            job = board.lease(worker)
+            if job is None:
+                self._reply(204)
+            else:
+                self._reply(200, job.as_dict(self.coordinator.config))
+        elif self.path == '/heartbeat':
+            self._reply(200, {'revoked': board.heartbeat(worker, body.get('jobs') or {})})
+        else:
+            match = re.fullmatch(r'/jobs/(\w+)/(complete|fail)', self.path)
+            if not match:
+                self._reply(404, {'error': 'unknown endpoint'})
+                return
+            job_id, action = match.groups()
+            token = body.get('token')
+            if action == 'complete':
+                accepted = self.coordinator.accept_result(job_id, token, worker, body.get('stages') or {})
+            else:
+                accepted = board.finish(job_id, token, error=RuntimeError(
+                    f"{worker}: {body.get('error') or 'conversion failed'}"))
+            self._reply(200 if accepted else 409, {'accepted': accepted})
+
+
+class Coordinator(AudioConverter):
+    """AudioConverter that hands each file to a remote worker instead of encoding it"""
+
+    def __init__(self, config, ffmpeg_handler, translations, profiles=None, address=None):
+        super().__init__(config, ffmpeg_handler, translations, profiles=profiles)
+        self.address = parse_address(address or config.DISTRIBUTED_LISTEN)
+        self.board = JobBoard(config.DISTRIBUTED_LEASE_SECONDS, config.DISTRIBUTED_MAX_ATTEMPTS)
+        self.board.progress_callback = lambda job, seconds, speed: self._report_progress(
+            str(job.source), seconds, speed)
+        self._server = None
+
+    def start(self):
+        """Start serving workers in a background thread; returns the bound (host, port)"""
+        if self._server is None:
+            handler = type('Handler', (_CoordinatorHandler,), {'coordinator': self})
+            self._server = ThreadingHTTPServer(self.address, handler)
+            self._server.daemon_threads = True
+            threading.Thread(target=self._server.serve_forever, name="coordinator", daemon=True).start()
+            self.address = self._server.server_address[:2]
+            logging.info(f"Coordinator listening on {self.address[0]}:{self.address[1]}")
+        return self.address
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def _shares_processes(self):
+        return False
+
+    def _cache_for_batch(self):
+        # Workers encode on their own machines; only their results are journaled here
+        return None
+
+    def _memory_estimate(self, files):
+        # The memory is used on the workers, which take only as many jobs as they have slots
+        return 0
+
+    async def convert_files(self, files_to_convert, output_folder, progress_callback=None,
+                            status_callback=None, concurrency=None, **options):
+        """Queue files for the workers and wait until they are all converted
+
+        concurrency is ignored: every file is offered to the workers at once
+        (up to Config.DISTRIBUTED_MAX_IN_FLIGHT), and workers decide how
+        many they convert in parallel.
+        """
+        host, port = self.start()
+        if status_callback:
+            status_callback(self.tr.get("coordinator_listening").format(f"{host}:{port}"))
+        return await super().convert_files(
+            files_to_convert, output_folder, progress_callback, status_callback,
+            concurrency=self.config.DISTRIBUTED_MAX_IN_FLIGHT, **options)
+
+    def accept_result(self, job_id, token, worker, stages):
+        """Take a worker's finished outputs; False if its lease is no longer valid"""
+        job = self.board.holder(job_id, token)
+        if job is None:
+            return False
+        for _, output_path in job.outputs:
+            if not lease_partial_path(output_path, token).exists():
+                return self.board.finish(job_id, token, error=RuntimeError(
+                    f"{worker} reported success but sent no {output_path}"))
+        return self.board.finish(job_id, token, result=(worker, token, stages))
+
+    async def convert_single_file(self, m4a_file: Path, output_folder: Path) -> bool:
+        """Wait for a worker to convert m4a_file into its planned outputs"""
+        if self._cancel_flag:
+            return False
+
+        outputs = []
+        record = self._file_metrics(m4a_file)
+        loop = asyncio.get_event_loop()
+        job = None
+        try:
+            outputs = self._output_paths(m4a_file, output_folder)
+            _, pending = await loop.run_in_executor(
+                self._executor, self._start_file, m4a_file, outputs, record, None, None)
+            job = self.board.submit(m4a_file, outputs, record.duration, loop, self._audio_filter(m4a_file))
+            worker, token, stages = await job.future
+
+            record.worker = worker
+            for name, seconds in stages.items():
+                record.add(name, seconds)
+            for _, output_path in outputs:
+                os.replace(lease_partial_path(output_path, token), self._partial_path(output_path))
+            await loop.run_in_executor(
+                self._executor, self._finish_file, m4a_file, outputs, pending, None, record, None)
+            return True
+
+        except Exception as e:
+            self._conversion_failed(m4a_file, outputs, record, e)
+            return False
+
+        finally:
+            if job is not None:
+                # Workers still holding the job learn from their next heartbeat that it is gone
+                self.board.withdraw(job)
+                stale = job.stale_tokens + ([job.token] if job.token and not job.future.done() else [])
+                for token in stale:
+                    for _, output_path in outputs:
+                        lease_partial_path(output_path, token).unlink(missing_ok=True)
+
+
+class Worker:
+    """Pulls jobs from a coordinator and converts them with the local backends"""
+
+    def __init__(self, config, ffmpeg_handler, url, name=None, slots=1, token=None, stream=False):
+        self.config = config
+        self.url = url.rstrip('/')
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.slots = max(1, int(slots))
+        self.token = token if token is not None else config.DISTRIBUTED_TOKEN
+        # Always transfer files over HTTP, even if the paths exist locally
+        self.stream = stream
+        self.ffmpeg_handler = ffmpeg_handler
+        self._active = {}  # job id -> {"token", "seconds", "speed"}
+        # job id -> (ProcessRegistry, backends) of each job being converted, so a
+        # revoked job's processes can be stopped without touching the other slots
+        self._running = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _request(self, method, path, body=None, data=None, headers=None, timeout=60):
+        headers = dict(headers or {})
+        if self.token:
+            headers['Authorization'] = f"Bearer {self.token}"
+        if body is not None:
+            data = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        request = urllib.request.Request(self.url + path, data=data, method=method, headers=headers)
+        return urllib.request.urlopen(request, timeout=timeout)
+
+    def _call(self, path, body):
+        with self._request('POST', path, dict(body, worker=self.name)) as response:
+            if response.status == 204:
+                return None
+            return json.loads(response.read() or b'null')
+
+    def run(self):
+        """Convert jobs on every slot until stop() is called"""
+        logging.info(f"Worker {self.name} serving {self.url} with {self.slots} slot(s)")
+        threads = [threading.Thread(target=self._heartbeats, name="heartbeat", daemon=True)]
+        threads += [threading.Thread(target=self._slot, name=f"slot-{index}", daemon=True)
+                    for index in range(self.slots)]
+        for thread in threads:
+            thread.start()
+        try:
+            while any(thread.is_alive() for thread in threads[1:]):
+                self._stop.wait(0.5)
+        finally:
+            self.stop()
+
+    def stop(self):
+        self._stop.set()
+        with self._lock:
+            running = list(self._running.values())
+        for processes, backends in running:
+            self._abandon(processes, backends)
+
+    def _abandon(self, processes, backends):
+        """Stop converting a job: cancel its backends and terminate its processes"""
+        for backend in backends.values():
+            backend.cancel()
+        processes.terminate_all(self.config.CANCEL_GRACE_SECONDS)
+
+    def _heartbeats(self):
+        while not self._stop.wait(self.config.DISTRIBUTED_HEARTBEAT_SECONDS):
+            with self._lock:
+                jobs = {job_id: dict(report) for job_id, report in self._active.items()}
+            if not jobs:
+                continue
+            try:
+                revoked = (self._call('/heartbeat', {'jobs': jobs}) or {}).get('revoked', [])
+            except (OSError, ValueError) as e:
+                logging.warning(f"Heartbeat to {self.url} failed: {e}")
+                continue
+            if revoked:
+                # Cancelled batch or expired lease: the coordinator will refuse the results and
+                # may have leased the jobs to another worker, so stop encoding them
+                logging.info(f"Coordinator revoked job(s) {', '.join(revoked)}")
+                with self._lock:
+                    abandoned = [self._running[job_id] for job_id in revoked if job_id in self._running]
+                for processes, backends in abandoned:
+                    threading.Thread(target=self._abandon, args=(processes, backends), daemon=True).start()
+
+    def _slot(self):
+        delay = self.config.DISTRIBUTED_POLL_SECONDS
+        while not self._stop.is_set():
+            try:
+                job = self._call('/lease', {})
+            except (OSError, ValueError) as e:
+                logging.debug(f"Lease request to {self.url} failed: {e}")
+                job = None
+            if job is None:
+                self._stop.wait(delay)
+                continue
+            processes = ProcessRegistry()
+            backends = create_backends(self.config, self.ffmpeg_handler, processes)
+            with self._lock:
+                self._active[job['id']] = {'token': job['token'], 'seconds': 0.0, 'speed': None}
+                self._running[job['id']] = (processes, backends)
+            leftovers = []
+            try:
+                stages, leftovers = self._convert(job, backends)
+            except Exception as e:
+                logging.error(f"Job {job['source']} failed: {e}")
+                try:
+                    self._call(f"/jobs/{job['id']}/fail", {'token': job['token'], 'error': str(e)})
+                except (OSError, ValueError):
+                    pass  # The lease expires and the coordinator hands the job to someone else
+            else:
+                try:
+                    self._call(f"/jobs/{job['id']}/complete", {'token': job['token'], 'stages': stages})
+                except (OSError, ValueError) as e:
+                    # 409 means the lease was lost while converting; either way nobody will move
+                    # these files into place
+                    logging.warning(f"Coordinator did not take the result of {job['source']}: {e}")
+                    for path in leftovers:
+                        Path(path).unlink(missing_ok=True)
+            finally:
+                with self._lock:
+                    self._active.pop(job['id'], None)
+                    self._running.pop(job['id'], None)
+
+    def _uses_shared_storage(self, job):
+        if self.stream or not os.path.isfile(job['source']):
+            return False
+        return all(os.access(os.path.dirname(target['output']) or '.', os.W_OK)
+                   for target in job['targets'])
+
+    def _convert(self, job, backends):
+        """Convert one leased job with backends
+
+        Returns its stage timings and the files to delete if the coordinator
+        refuses the result.
+        """
+        record = FileMetrics(job['source'])
+        token = job['token']
+        profiles = [OutputProfile(target['bitrate'], target['channels'], target['sample_rate'])
+                    for target in job['targets']]
+
+        def report(seconds, speed):
+            with self._lock:
+                if job['id'] in self._active:
+                    self._active[job['id']].update(seconds=seconds, speed=speed)
+
+        if self._uses_shared_storage(job):
+            targets = [(profile, lease_partial_path(target['output'], token))
+                       for profile, target in zip(profiles, job['targets'])]
+            self._encode(Path(job['source']), targets, job, record, report, backends)
+            return record.stages, [path for _, path in targets]
+
+        with tempfile.TemporaryDirectory(prefix="m4a_worker_") as folder:
+            source = Path(folder) / f"source{Path(job['source']).suffix}"
+            with record.stage("transfer"), self._request(
+                    'GET', f"/jobs/{job['id']}/source", headers={'X-Lease-Token': token},
+                    timeout=300) as response, open(source, 'wb') as f:
+                shutil.copyfileobj(response, f, COPY_CHUNK)
+            targets = [(profile, Path(folder) / f"{index}.mp3") for index, profile in enumerate(profiles)]
+            self._encode(source, targets, job, record, report, backends)
+            with record.stage("transfer"):
+                for index, (_, path) in enumerate(targets):
+                    with open(path, 'rb') as f:
+                        self._request('PUT', f"/jobs/{job['id']}/outputs/{index}", data=f,
+                                      headers={'X-Lease-Token': token,
+                                               'Content-Length': str(os.path.getsize(path))},
+                                      timeout=300).close()
+        return record.stages, []
+
+    def _encode(self, source, targets, leased, record, progress_callback, backends):
+        job = ConversionJob(source, targets, leased['duration'], None, leased.get('audio_filter'))
+        backend = select_backend(backends, job, backend_order(self.config))
+        try:
+            backend.convert(job, record, progress_callback)
+        except Exception:
+            for _, path in targets:
+                Path(path).unlink(missing_ok=True)
+            raise
@@ -0,0 +1,89 @@
+# event_pump.py
+import logging
+import queue
+
+
+class EventPump:
+    """Moves updates from worker threads onto the Tk main loop.
+
+    Workers only put items on a queue; the Tk thread drains it with after()
+    at a bounded rate. Progress and status updates are coalesced so a burst
+    of completions costs one redraw instead of one per file.
+    """
+
+    def __init__(self, root, refresh_hz=20, on_progress=None, on_status=None, on_event=None):
+        self.root = root
+        self.interval_ms = max(1, int(1000 / refresh_hz))
+        self.on_progress = on_progress
+        self.on_status = on_status
+        self.on_event = on_event
+        self._queue = queue.Queue()
+        self._running = False
+
+    # Thread-safe producers
+
+    def progress(self, value):
+        self._queue.put(('progress', value))
+
+    def status(self, text):
+        self._queue.put(('status', text))
+
+    def event(self, event):
+        """Converter event dict; progress events are coalesced like progress()"""
+        self._queue.put(('event', event))
+
+    def call(self, func, *args):
+        """Run func(*args) on the Tk thread"""
+        self._queue.put(('call', (func, args)))
+
+    # Tk thread
+
+    def start(self):
+        if not self._running:
+            self._running = True
+            self.root.after(self.interval_ms, self._drain)
+
+    def stop(self):
+        self._running = False
+
+    def _drain(self):
+        if not self._running:
+            return
+        pending = {}  # Coalesced progress, status and progress event, applied in that order
+        while True:
+            try:
+                kind, payload = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind in ('progress', 'status'):
+                pending[kind] = payload
+            elif kind == 'event' and payload.get('event') == 'progress':
+                pending['progress_event'] = payload
+            else:
+                # Earlier updates go first, so a call (e.g. a reset) is never overwritten by them
+                self._flush(pending)
+                self._dispatch(kind, payload)
+        self._flush(pending)
+        self.root.after(self.interval_ms, self._drain)
+
+    def _flush(self, pending):
+        try:
+            if 'progress_event' in pending and self.on_event:
+                self.on_event(pending['progress_event'])
+            if 'progress' in pending and self.on_progress:
+                self.on_progress(pending['progress'])
+            if 'status' in pending and self.on_status:
+                self.on_status(pending['status'])
+        except Exception as e:
+            logging.error(f"UI update failed: {e}")
+        pending.clear()
+
+    def _dispatch(self, kind, payload):
+        try:
+            if kind == 'event' and self.on_event:
+                self.on_event(payload)
+            elif kind == 'call':
+                func, args = payload
+                func(*args)
+        except Exception as e:
+            logging.error(f"UI event handler failed: {e}")
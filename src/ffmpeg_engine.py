@@ -0,0 +1,217 @@
+# ffmpeg_engine.py
+import logging
+import subprocess
+import tempfile
+from pathlib import Path
+
+
+def parse_speed(value):
+    """Parse ffmpeg's speed field ("1.5x" or "N/A") into a float or None"""
+    try:
+        return float(value.rstrip('x'))
+    except ValueError:
+        return None
+
+
+class FFmpegEngine:
+    """Single-pass M4A to MP3 transcoding through one ffmpeg process per file.
+
+    Unlike the pydub path, the audio is never decoded into Python memory and
+    no temporary WAV files are written: ffmpeg reads the M4A and writes the
+    MP3 directly.
+    """
+
+    def __init__(self, config, ffmpeg_handler, processes=None):
+        self.config = config
+        self.ffmpeg_handler = ffmpeg_handler
+        # ProcessRegistry used to terminate running encodes on cancellation
+        self.processes = processes
+
+    def output_options(self, bitrate=None, output_args=(), input_index=0):
+        """ffmpeg options for one MP3 output, bitrate defaulting to Config.MP3_BITRATE"""
+        return [
+            '-vn',
+            '-map', f'{input_index}:a:0',
+            '-c:a', self.config.MP3_ENCODER,
+            '-b:a', bitrate or self.config.MP3_BITRATE,
+            *output_args,
+            '-f', 'mp3',
+        ]
+
+    def build_command(self, input_path: Path, output_path: Path, input_args=(), output_args=(),
+                      bitrate=None):
+        """Build the ffmpeg command line for a single conversion
+
+        input_args go before -i (e.g. -ss/-t), output_args before the output.
+        """
+        return self.build_multi_command(input_path, [(output_path, bitrate, output_args)], input_args)
+
+    def build_multi_command(self, input_path: Path, outputs, input_args=()):
+        """Command line decoding input_path once into every (path, bitrate, output_args) output"""
+        return self.build_batch_command([(input_path, outputs)], input_args)
+
+    def build_batch_command(self, jobs, input_args=()):
+        """Command line converting several inputs in one process
+
+        jobs is a list of (input_path, outputs) with outputs as for
+        build_multi_command; every output maps the audio of its own input.
+        """
+        command = [
+            self.ffmpeg_handler.get_executable(),
+            *self.config.FFMPEG_PARAMS,
+            '-nostdin',
+            '-y',
+        ]
+        for input_path, _ in jobs:
+            command += [*input_args, '-i', str(input_path)]
+        for index, (_, outputs) in enumerate(jobs):
+            for output_path, bitrate, output_args in outputs:
+                command += [*self.output_options(bitrate, output_args, index), str(output_path)]
+        return command
+
+    def convert(self, input_path: Path, output_path: Path, progress_callback=None,
+                input_args=(), output_args=(), bitrate=None):
+        """Transcode input_path to output_path, raising RuntimeError on failure
+
+        progress_callback, if given, is called from this thread with
+        (encoded_seconds, speed) as ffmpeg reports its -progress output.
+        """
+        command = self.build_command(input_path, output_path, input_args, output_args, bitrate)
+        self.run(command, progress_callback)
+
+    def convert_multi(self, input_path: Path, outputs, progress_callback=None):
+        """Decode input_path once and encode it into every (path, bitrate, output_args) output"""
+        self.run(self.build_multi_command(input_path, outputs), progress_callback)
+
+    def convert_batch(self, jobs, progress_callback=None):
+        """Convert every (input_path, outputs) job with a single ffmpeg process
+
+        Saves the process startup and codec initialisation per file, which
+        dominates the cost of very short clips. A failure is not attributed
+        to a particular input; callers retry the inputs one by one for that.
+        """
+        self.run(self.build_batch_command(jobs), progress_callback)
+
+    def open_stream(self, input_path, bitrate=None, output_args=()):
+        """Start ffmpeg writing MP3 to a pipe as it encodes; see FFmpegStream
+
+        input_path "pipe:0" makes ffmpeg read the source from the stream's stdin.
+        """
+        command = self.build_command(input_path, 'pipe:1', bitrate=bitrate,
+                                     output_args=[*output_args, '-flush_packets', '1'])
+        return FFmpegStream(command, self.ffmpeg_handler, self.processes,
+                            self.config.CANCEL_GRACE_SECONDS)
+
+    def run(self, command, progress_callback=None):
+        """Run an ffmpeg command line with progress reporting and cancellation support
+
+        Returns ffmpeg's log output (stderr).
+        """
+        # -progress writes key=value blocks to stdout; the regular stats line is noise
+        command = [command[0], '-progress', 'pipe:1', '-nostats', *command[1:]]
+        logging.debug(f"Running: {' '.join(command)}")
+
+        # stderr goes to a file so a chatty ffmpeg can never block on a full pipe
+        with tempfile.TemporaryFile() as stderr_file:
+            process = subprocess.Popen(
+                command,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=stderr_file,
+                **self.ffmpeg_handler.popen_kwargs()
+            )
+            if self.processes is not None:
+                self.processes.register(process)
+            try:
+                self._read_progress(process.stdout, progress_callback)
+                returncode = process.wait()
+            except BaseException:
+                # A failing progress callback must not leave ffmpeg running without an owner
+                process.kill()
+                process.wait()
+                raise
+            finally:
+                if self.processes is not None:
+                    self.processes.unregister(process)
+            stderr_file.seek(0)
+            stderr = stderr_file.read().decode(errors='replace').strip()
+            if returncode != 0:
+                raise RuntimeError(
+                    f"ffmpeg exited with code {returncode}" + (f": {stderr}" if stderr else "")
+                )
+            return stderr
+
+    @staticmethod
+    def _read_progress(stream, progress_callback):
+        position = 0.0
+        speed = None
+        with stream:
+            for raw_line in stream:
+                key, _, value = raw_line.decode(errors='replace').strip().partition('=')
+                if key == 'out_time_us' and value.isdigit():
+                    position = int(value) / 1_000_000
+                elif key == 'speed':
+                    speed = parse_speed(value)
+                elif key == 'progress' and progress_callback:
+                    # "progress" closes each block of key=value pairs
+                    progress_callback(position, speed)
+
+
+class FFmpegStream:
+    """A running ffmpeg whose MP3 output is read incrementally from stdout
+
+    Use as a context manager; leaving the block early (e.g. because the
+    reader went away) terminates the process.
+    """
+
+    def __init__(self, command, ffmpeg_handler, processes=None, grace_seconds=3.0):
+        logging.debug(f"Streaming: {' '.join(command)}")
+        self.processes = processes
+        self.grace_seconds = grace_seconds
+        self._stderr = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE if 'pipe:0' in command else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=self._stderr,
+            **ffmpeg_handler.popen_kwargs()
+        )
+        if processes is not None:
+            processes.register(self.process)
+
+    @property
+    def stdin(self):
+        return self.process.stdin
+
+    def read(self, size=65536):
+        """Up to size bytes of MP3 as soon as any are available; b'' at the end"""
+        return self.process.stdout.read1(size)
+
+    def wait(self):
+        """Wait for ffmpeg to exit, raising RuntimeError if it failed"""
+        returncode = self.process.wait()
+        if returncode != 0:
+            self._stderr.seek(0)
+            stderr = self._stderr.read().decode(errors='replace').strip()
+            raise RuntimeError(f"ffmpeg exited with code {returncode}" + (f": {stderr}" if stderr else ""))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(self.grace_seconds)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        for pipe in (self.process.stdin, self.process.stdout):
+            if pipe is not None:
+                try:
+                    pipe.close()
+                except OSError:
+                    pass
+        if self.processes is not None:
+            self.processes.unregister(self.process)
+        self._stderr.close()
@@ -1,17 +1,38 @@
+import json
 import logging
 import os
+import re
 import subprocess
 import sys
-import urllib.request
-import zipfile
+import threading
 import shutil
+from collections import namedtuple
+from concurrent.futures import Future
 from pathlib import Path
 
+# What an ffmpeg binary offers: its version banner, the --enable-*/--disable-* flags
+# it was configured with, and the names of its encoders and filters
+FFmpegCapabilities = namedtuple('FFmpegCapabilities',
+                                ['path', 'version', 'configuration', 'encoders', 'filters'])
+
+# Capabilities cached on disk are only trusted for the exact same binary
+_PROBE_KEY_FIELDS = ('path', 'size', 'mtime_ns')
+# Lines of `ffmpeg -encoders`/`-filters` listings: flags column, then the name
+_LISTING_RE = re.compile(r'^\s*[A-Z.|]{3,6}\s+(\w\S*)\s', re.MULTILINE)
+
+
+def _parse_listing(output):
+    """Names from an `ffmpeg -encoders` or `-filters` listing, skipping its legend"""
+    _, separator, body = output.partition(' ------')
+    return sorted(set(_LISTING_RE.findall(body if separator else output)))
+
 
 class FFmpegHandler:
     def __init__(self, config, translations):
         self.config = config
         self.tr = translations
+        self._probe = None  # Future of the FFmpegCapabilities probe
+        self._probe_lock = threading.Lock()
         self._setup_subprocess_info()
 
     def _setup_subprocess_info(self):
@@ -21,50 +42,145 @@ class FFmpegHandler:
             self._startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
             self._startupinfo.wShowWindow = subprocess.SW_HIDE
 
+    def popen_kwargs(self):
+        """Keyword arguments that keep FFmpeg child processes windowless."""
+        return {
+            'startupinfo': self._startupinfo,
+            'creationflags': subprocess.CREATE_NO_WINDOW if sys.platform == 'win32' else 0
+        }
+
+    def get_executable(self):
+        """Return the FFmpeg binary used for conversions."""
+        ffmpeg_path = self.config.ffmpeg_path
+        if ffmpeg_path.exists():
+            return str(ffmpeg_path)
+        return shutil.which('ffmpeg') or 'ffmpeg'
+
+    def get_version(self):
+        """Return FFmpeg's version banner line ("unknown" without a working FFmpeg)"""
+        capabilities = self.capabilities()
+        return capabilities.version if capabilities else "unknown"
+
+    def has_encoder(self, name):
+        capabilities = self.capabilities()
+        return capabilities is not None and name in capabilities.encoders
+
     def check_installation(self):
         """Check if FFmpeg is installed and available."""
+        capabilities = self.capabilities()
+        if capabilities is None:
+            return False
+        if Path(capabilities.path) == self.config.ffmpeg_path:
+            os.environ["FFMPEG_BINARY"] = capabilities.path
+        return True
+
+    def start_probe(self):
+        """Probe the FFmpeg binary in a background thread, once
+
+        Returns a concurrent.futures.Future of its FFmpegCapabilities (None
+        if there is no working FFmpeg). Callers that need the answer right
+        away use capabilities(), which waits for the same probe.
+        """
+        with self._probe_lock:
+            if self._probe is None:
+                self._probe = Future()
+                threading.Thread(target=self._run_probe, args=(self._probe,),
+                                 name="ffmpeg-probe", daemon=True).start()
+            return self._probe
+
+    def capabilities(self):
+        """FFmpegCapabilities of the binary in use, or None if FFmpeg is missing or broken"""
+        return self.start_probe().result()
+
+    def reset_probe(self):
+        """Forget the probe result, e.g. after installing FFmpeg"""
+        with self._probe_lock:
+            self._probe = None
+
+    def _run_probe(self, future):
         try:
-            ffmpeg_path = self.config.ffmpeg_path
-            if ffmpeg_path.exists():
-                self._run_ffmpeg_check(ffmpeg_path)
-                os.environ["FFMPEG_BINARY"] = str(ffmpeg_path)
-                return True
-            return self._check_system_ffmpeg()
+            future.set_result(self._probe_capabilities())
         except Exception as e:
             logging.error(f"FFmpeg check failed: {e}")
-            return False
+            future.set_result(None)
+
+    def _probe_capabilities(self):
+        """Capabilities from the on-disk cache, or by running the binary if it changed"""
+        executable = self.get_executable()
+        path = shutil.which(executable)
+        if path is None:
+            return None
+        stat = os.stat(path)
+        key = {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+        cache_path = Path(self.config.FFMPEG_PROBE_CACHE)
+        try:
+            cached = json.loads(cache_path.read_text())
+            if all(cached.get(field) == key[field] for field in _PROBE_KEY_FIELDS):
+                return FFmpegCapabilities(*(cached[field] for field in FFmpegCapabilities._fields))
+        except (OSError, ValueError, KeyError):
+            pass
 
-    def _run_ffmpeg_check(self, ffmpeg_path):
-        logging.debug(f"Using FFmpeg at: {ffmpeg_path}")
-        subprocess.run(
-            [str(ffmpeg_path), '-version'],
+        logging.debug(f"Probing FFmpeg at: {path}")
+        version_output = self._run_info(path, '-version')
+        lines = version_output.splitlines()
+        configuration = re.search(r'^configuration:(.*)$', version_output, re.MULTILINE)
+        capabilities = FFmpegCapabilities(
+            key['path'],
+            lines[0].strip() if lines else "unknown",
+            configuration.group(1).split() if configuration else [],
+            _parse_listing(self._run_info(path, '-hide_banner', '-encoders')),
+            _parse_listing(self._run_info(path, '-hide_banner', '-filters')),
+        )
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            partial_path = cache_path.with_name(cache_path.name + '.part')
+            partial_path.write_text(json.dumps({**key, **capabilities._asdict()}))
+            os.replace(partial_path, cache_path)
+        except OSError as e:
+            logging.debug(f"Could not cache FFmpeg capabilities: {e}")
+        return capabilities
+
+    def _run_info(self, path, *args):
+        """stdout of an informational ffmpeg command; raises OSError if it does not run"""
+        result = subprocess.run(
+            [path, *args],
+            stdin=subprocess.DEVNULL,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
-            startupinfo=self._startupinfo,
-            creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == 'win32' else 0
+            **self.popen_kwargs()
         )
+        if result.returncode != 0:
+            raise OSError(f"{path} {' '.join(args)} exited with code {result.returncode}")
+        return result.stdout.decode(errors='replace')
 
-    def _check_system_ffmpeg(self):
-        try:
-            subprocess.run(
-                ['ffmpeg', '-version'],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                startupinfo=self._startupinfo,
-                creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == 'win32' else 0
-            )
-            return True
-        except FileNotFoundError:
-            return False
+    def start_install(self, status_callback=None, progress_callback=None):
+        """Install FFmpeg in a background thread; returns a Future of install()'s result"""
+        future = Future()
 
-    async def install(self, status_callback=None):
-        """Download and install FFmpeg asynchronously."""
-        try:
-            if status_callback:
-                status_callback(self.tr.get("downloading_ffmpeg"))
+        def run():
+            future.set_result(self.install(status_callback, progress_callback))
+
+        threading.Thread(target=run, name="ffmpeg-install", daemon=True).start()
+        return future
 
-            await self._download_ffmpeg()
-            await self._extract_and_setup_ffmpeg(status_callback)
+    def install(self, status_callback=None, progress_callback=None):
+        """Download, verify and install FFmpeg (blocking); True on success
+
+        status_callback gets translated stage messages, progress_callback
+        (downloaded_bytes, total_bytes or None) follows the download.
+        """
+        from .ffmpeg_installer import FFmpegInstaller
+        installer = FFmpegInstaller(
+            self.config,
+            progress_callback=progress_callback,
+            status_callback=status_callback and (lambda key: status_callback(self.tr.get(key)))
+        )
+        try:
+            installer.install()
+            self.reset_probe()
+            if self.capabilities() is None:
+                raise RuntimeError("the installed FFmpeg does not run")
 
             if status_callback:
                 status_callback(self.tr.get("ffmpeg_success"))
@@ -75,24 +191,3 @@ class FFmpegHandler:
             if status_callback:
                 status_callback(self.tr.get("ffmpeg_failed").format(str(e)))
             return False
-
-    async def _download_ffmpeg(self):
-        download_path = Path.cwd() / "ffmpeg.zip"
-        urllib.request.urlretrieve(self.config.FFMPEG_URL, download_path)
-        return download_path
-
-    async def _extract_and_setup_ffmpeg(self, status_callback):
-        if status_callback:
-            status_callback(self.tr.get("installing_ffmpeg"))
-
-        download_path = Path.cwd() / "ffmpeg.zip"
-        with zipfile.ZipFile(download_path, 'r') as zip_ref:
-            zip_ref.extractall(Path.cwd())
-
-        ffmpeg_dir = next(Path.cwd().rglob("ffmpeg.exe")).parent
-        for file in ffmpeg_dir.glob("*.exe"):
-            shutil.copy(file, Path.cwd())
-
-        # Cleanup
-        download_path.unlink()
-        shutil.rmtree(next(Path.cwd().glob("ffmpeg-*")))
\ No newline at end of file
@@ -0,0 +1,250 @@
+# ffmpeg_installer.py
+"""
+Downloads and installs an FFmpeg build when none is available.
+
+The archive for the current platform (Config.FFMPEG_BUILDS) is streamed to
+a ".part" file in a downloads folder beside Config.FFMPEG_INSTALL_DIR,
+with progress reported as it arrives. If the connection drops, the
+download continues from where it stopped with an HTTP Range request;
+If-Range makes the server send the whole file again instead if the build
+behind the URL changed in the meantime. A ".part" left over from an
+earlier, interrupted install is resumed the same way.
+
+Nothing is installed before the archive's SHA-256 matches
+Config.FFMPEG_SHA256 or, if that is not set, the archive's line in the
+release's checksum file. Only ffmpeg and ffprobe are then extracted: from
+a tar.xz by reading it sequentially until both have passed, from a zip
+through its central directory. Each binary is written under a temporary
+name and renamed into place, so an interrupted install never leaves a
+truncated ffmpeg behind.
+"""
+
+import hashlib
+import http.client
+import json
+import logging
+import os
+import platform
+import shutil
+import sys
+import time
+import urllib.error
+import urllib.request
+from collections import namedtuple
+from pathlib import Path
+
+CHUNK_SIZE = 256 * 1024
+
+# Archive to download for one platform; archive is also its name in the checksum file
+FFmpegBuild = namedtuple('FFmpegBuild', ['url', 'archive', 'checksums_url'])
+
+
+class InstallError(Exception):
+    pass
+
+
+def platform_key():
+    """Key of Config.FFMPEG_BUILDS for this system, e.g. "win64" or "linux64" """
+    machine = platform.machine().lower()
+    if sys.platform == 'win32':
+        return 'win64' if machine in ('amd64', 'x86_64') else f"win-{machine}"
+    if sys.platform.startswith('linux'):
+        if machine in ('x86_64', 'amd64'):
+            return 'linux64'
+        if machine in ('aarch64', 'arm64'):
+            return 'linuxarm64'
+    return f"{sys.platform}-{machine}"
+
+
+def build_for_platform(config, key=None):
+    """The FFmpegBuild to install here; raises InstallError if there is none"""
+    key = key or platform_key()
+    archive = config.FFMPEG_BUILDS.get(key)
+    if archive is None:
+        raise InstallError(f"No FFmpeg build is configured for {key}; install FFmpeg manually")
+    base = config.FFMPEG_DOWNLOAD_URL.rstrip('/') + '/'
+    checksums = config.FFMPEG_CHECKSUMS and base + config.FFMPEG_CHECKSUMS
+    return FFmpegBuild(base + archive, archive, checksums)
+
+
+def binary_names():
+    suffix = '.exe' if sys.platform == 'win32' else ''
+    return ['ffmpeg' + suffix, 'ffprobe' + suffix]
+
+
+class FFmpegInstaller:
+    """Blocking installer; run it off the UI thread (FFmpegHandler.start_install does)
+
+    progress_callback(downloaded, total) is called as the archive arrives
+    (total is None if the server does not say); status_callback(key) gets
+    the translation key of each stage.
+    """
+
+    def __init__(self, config, progress_callback=None, status_callback=None):
+        self.config = config
+        self.progress_callback = progress_callback
+        self.status_callback = status_callback
+        self.install_dir = Path(config.FFMPEG_INSTALL_DIR)
+        self.download_dir = self.install_dir.parent / 'downloads'
+
+    def _status(self, key):
+        if self.status_callback:
+            self.status_callback(key)
+
+    def _open(self, url, headers=None):
+        request = urllib.request.Request(url, headers={'User-Agent': 'm4a-to-mp3', **(headers or {})})
+        return urllib.request.urlopen(request, timeout=self.config.FFMPEG_DOWNLOAD_TIMEOUT)
+
+    def install(self, build=None):
+        """Download, verify and install; returns the path of the installed ffmpeg"""
+        build = build or build_for_platform(self.config)
+        self._status("downloading_ffmpeg")
+        expected = self.expected_checksum(build)
+        archive_path = self.download(build.url, self.download_dir / build.archive)
+
+        self._status("verifying_ffmpeg")
+        actual = self._sha256(archive_path)
+        if actual != expected:
+            archive_path.unlink()
+            raise InstallError(f"Checksum mismatch for {build.archive}: expected {expected}, got {actual}")
+
+        self._status("installing_ffmpeg")
+        installed = self.extract(archive_path, binary_names())
+        shutil.rmtree(self.download_dir, ignore_errors=True)
+        logging.info(f"Installed {', '.join(installed)} from {build.url} into {self.install_dir}")
+        return self.install_dir / binary_names()[0]
+
+    def expected_checksum(self, build):
+        """SHA-256 the archive must have, from the config or the release's checksum file"""
+        if self.config.FFMPEG_SHA256:
+            return self.config.FFMPEG_SHA256.lower()
+        if not build.checksums_url:
+            raise InstallError("No checksum configured for the FFmpeg download")
+        with self._open(build.checksums_url) as response:
+            listing = response.read().decode('utf-8', errors='replace')
+        for line in listing.splitlines():
+            parts = line.split()
+            # sha256sum format: "<hex>  <name>", binary-mode names start with '*'
+            if len(parts) == 2 and parts[1].lstrip('*') == build.archive:
+                return parts[0].lower()
+        raise InstallError(f"{build.archive} is not listed in {build.checksums_url}")
+
+    def download(self, url, target):
+        """Stream url to target, resuming a partial download; returns target"""
+        target.parent.mkdir(parents=True, exist_ok=True)
+        partial = target.with_name(target.name + '.part')
+        state_path = target.with_name(target.name + '.state')
+        attempts = self.config.FFMPEG_DOWNLOAD_RETRIES + 1
+        for attempt in range(1, attempts + 1):
+            try:
+                self._download_once(url, partial, state_path)
+                break
+            except (OSError, http.client.HTTPException) as e:
+                if isinstance(e, urllib.error.HTTPError) and e.code < 500:
+                    raise
+                if attempt == attempts:
+                    raise
+                logging.warning(f"FFmpeg download interrupted ({e}); resuming, attempt {attempt + 1}")
+                time.sleep(min(2 ** attempt, 10))
+        os.replace(partial, target)
+        state_path.unlink(missing_ok=True)
+        return target
+
+    def _download_once(self, url, partial, state_path):
+        offset = partial.stat().st_size if partial.exists() else 0
+        validator = None
+        if offset:
+            try:
+                validator = json.loads(state_path.read_text()).get('validator')
+            except (OSError, ValueError):
+                pass
+        headers = {}
+        if offset and validator:
+            # Without a validator there is no way to tell whether the bytes on disk are from this build
+            headers = {'Range': f"bytes={offset}-", 'If-Range': validator}
+
+        try:
+            response = self._open(url, headers)
+        except urllib.error.HTTPError as e:
+            if e.code != 416:
+                raise
+            # Range not satisfiable: the part file already holds the whole archive, or is junk
+            total = e.headers.get('Content-Range', '').rpartition('/')[2]
+            if total.isdigit() and int(total) == offset:
+                return
+            partial.unlink()
+            raise OSError("Partial download does not match the server's file; starting over")
+
+        with response:
+            if response.status == 206:
+                mode = 'ab'
+                total = response.headers.get('Content-Range', '').rpartition('/')[2]
+                total = int(total) if total.isdigit() else None
+                logging.info(f"Resuming FFmpeg download at {offset} bytes")
+            else:
+                mode, offset = 'wb', 0
+                length = response.headers.get('Content-Length')
+                total = int(length) if length and length.isdigit() else None
+            validator = response.headers.get('ETag') or response.headers.get('Last-Modified')
+            state_path.write_text(json.dumps({'url': url, 'validator': validator}))
+
+            done = offset
+            with open(partial, mode) as f:
+                while True:
+                    data = response.read(CHUNK_SIZE)
+                    if not data:
+                        break
+                    f.write(data)
+                    done += len(data)
+                    if self.progress_callback:
+                        self.progress_callback(done, total)
+            if total is not None and done < total:
+                raise ConnectionError(f"Download ended after {done} of {total} bytes")
+
+    @staticmethod
+    def _sha256(path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def extract(self, archive_path, names):
+        """Copy the named binaries out of the archive into the install folder"""
+        self.install_dir.mkdir(parents=True, exist_ok=True)
+        wanted = set(names)
+        found = []
+        if archive_path.name.endswith('.zip'):
+            import zipfile
+            with zipfile.ZipFile(archive_path) as archive:
+                for member in archive.infolist():
+                    name = member.filename.rsplit('/', 1)[-1]
+                    if name in wanted and not member.is_dir():
+                        with archive.open(member) as source:
+                            self._install_binary(source, name)
+                        wanted.discard(name)
+                        found.append(name)
+        else:
+            import tarfile
+            # Stream mode reads the archive front to back and stops once every binary has passed
+            with tarfile.open(archive_path, mode='r|*') as archive:
+                for member in archive:
+                    name = member.name.rsplit('/', 1)[-1]
+                    if name in wanted and member.isfile():
+                        self._install_binary(archive.extractfile(member), name)
+                        wanted.discard(name)
+                        found.append(name)
+                        if not wanted:
+                            break
+        if names[0] not in found:
+            raise InstallError(f"{names[0]} not found in {archive_path.name}")
+        return found
+
+    def _install_binary(self, source, name):
+        target = self.install_dir / name
+        partial = target.with_name(name + '.part')
+        with open(partial, 'wb') as f:
+            shutil.copyfileobj(source, f, CHUNK_SIZE)
+        if sys.platform != 'win32':
+            os.chmod(partial, 0o755)
+        os.replace(partial, target)
@@ -1,5 +1,6 @@
 # src/gui.py
 import asyncio
+import threading
 import tkinter as tk
 from tkinter import ttk, messagebox
 
@@ -9,7 +10,7 @@ from .components.language_selector import LanguageSelectorComponent
 from .translations import Translations
 from .config import Config
 from .ffmpeg_handler import FFmpegHandler
-from .converter import AudioConverter
+from .event_pump import EventPump
 
 
 class ConverterGUI:
@@ -21,13 +22,28 @@ class ConverterGUI:
         self.translations = Translations()
         self.config = Config()
         self.ffmpeg_handler = FFmpegHandler(self.config, self.translations)
-        self.converter = AudioConverter(self.config, self.ffmpeg_handler, self.translations)
+        # The conversion engine is imported and created on the first batch, off the Tk thread
+        self._converter = None
+        self._converter_lock = threading.Lock()
+        # Created on the first distributed batch; keeps serving workers until the app exits
+        self.coordinator = None
+        self.active_converter = None
 
         self.main_frame = ttk.Frame(self.root, padding="10")
         self.main_frame.grid(row=0, column=0, sticky="nsew")
         self.main_frame.grid_columnconfigure(1, weight=1)
 
         self.setup_components()
+
+        # Worker threads never touch Tk directly; they post here instead
+        self.events = EventPump(
+            self.root,
+            refresh_hz=self.config.UI_REFRESH_HZ,
+            on_progress=self.controls.update_progress,
+            on_status=self.controls.update_status,
+            on_event=self.handle_converter_event
+        )
+        self.events.start()
         self.check_ffmpeg()
 
     def setup_window(self):
@@ -46,7 +62,7 @@ class ConverterGUI:
         self.lang_selector.frame.grid(row=0, column=2, sticky="e", padx=5, pady=5)
 
         # File list
-        self.file_list = FileListComponent(self.main_frame, self.translations)
+        self.file_list = FileListComponent(self.main_frame, self.translations, self.config)
         self.file_list.file_frame.grid(row=2, column=0, columnspan=3, sticky="nsew")
 
         # Controls
@@ -55,22 +71,105 @@ class ConverterGUI:
 
         # Set up conversion handlers
         self.controls.start_conversion = self.start_conversion
+        self.controls.resume_conversion = self.resume_conversion
         self.controls.stop_conversion = self.stop_conversion
 
     def check_ffmpeg(self):
-        if not self.ffmpeg_handler.check_installation():
-            if messagebox.askyesno(
-                    self.translations.get("error"),
-                    self.translations.get("ffmpeg_required")
-            ):
-                asyncio.run(self.ffmpeg_handler.install(self.controls.update_status))
-
-    async def convert_files(self):
-        if not self.controls.get_output_path():
+        """Probe FFmpeg in the background; the window stays usable meanwhile"""
+        probe = self.ffmpeg_handler.start_probe()
+        probe.add_done_callback(lambda future: self.events.call(self.ffmpeg_checked, future.result()))
+
+    def ffmpeg_checked(self, capabilities):
+        if capabilities is not None:
+            return
+        if messagebox.askyesno(
+                self.translations.get("error"),
+                self.translations.get("ffmpeg_required")
+        ):
+            self.controls.update_progress(0)
+            install = self.ffmpeg_handler.start_install(self.events.status, self.ffmpeg_download_progress)
+            install.add_done_callback(lambda future: self.events.call(self.controls.update_progress, 0))
+
+    def ffmpeg_download_progress(self, downloaded, total):
+        """Runs on the installer thread"""
+        megabytes = downloaded / 1024 ** 2
+        if total:
+            self.events.progress(downloaded / total * 100)
+            self.events.status(self.translations.get("downloading_ffmpeg_progress", megabytes, total / 1024 ** 2))
+        else:
+            self.events.status(self.translations.get("downloading_ffmpeg_bytes", megabytes))
+
+    @property
+    def converter(self):
+        with self._converter_lock:
+            if self._converter is None:
+                from .converter import AudioConverter
+                self._converter = AudioConverter(self.config, self.ffmpeg_handler, self.translations)
+            return self._converter
+
+    def converter_for(self, distribute):
+        """The local converter, or the coordinator that hands files to remote workers"""
+        if not distribute:
+            return self.converter
+        with self._converter_lock:
+            if self.coordinator is None:
+                from .distributed import Coordinator
+                self.coordinator = Coordinator(self.config, self.ffmpeg_handler, self.translations)
+            return self.coordinator
+
+    async def convert_files(self, files_to_convert, output_path, options):
+        """Runs on the worker thread; all UI work is posted to the event pump"""
+        success = False
+        options = dict(options)
+        self.active_converter = self.converter_for(options.pop('distribute', False))
+        try:
+            success = await self.active_converter.convert_files(
+                files_to_convert,
+                output_path,
+                progress_callback=self.events.progress,
+                status_callback=self.events.status,
+                event_callback=self.events.event,
+                **options
+            )
+        finally:
+            self.events.call(self.finish_conversion, success)
+
+    async def resume_files(self, output_path, options):
+        """Runs on the worker thread; re-converts the journal's unfinished files"""
+        from .journal import unfinished_sources
+        files_to_convert = unfinished_sources(output_path)
+        if not files_to_convert:
+            self.events.call(self.finish_conversion, False)
+            self.events.call(messagebox.showinfo, self.translations.get("resume"),
+                             self.translations.get("nothing_to_resume"))
+            return
+        await self.convert_files(files_to_convert, output_path, dict(options, resume=True))
+
+    def finish_conversion(self, success):
+        self.controls.reset_progress()
+        self.controls.set_converting_state(False)
+        if success:
+            messagebox.showinfo(
+                self.translations.get("success"),
+                self.translations.get("all_completed")
+            )
+
+    def handle_converter_event(self, event):
+        if event['event'] == 'file_failed':
+            messagebox.showerror(
+                self.translations.get("error"),
+                self.translations.get("conversion_error").format(event['error'])
+            )
+
+    def start_conversion(self):
+        # Read every Tk variable here, on the main thread, before the worker starts
+        output_path = self.controls.get_output_path()
+        if not output_path:
             messagebox.showerror(
                 self.translations.get("error"),
                 self.translations.get("select_folders")
             )
+            self.controls.set_converting_state(False)
             return
 
         files_to_convert = self.file_list.get_selected_files()
@@ -79,34 +178,45 @@ class ConverterGUI:
                 self.translations.get("error"),
                 self.translations.get("no_files")
             )
+            self.controls.set_converting_state(False)
             return
 
+        options = {
+            'concurrency': self.controls.get_concurrent_value(),
+            'mirror_tree': self.controls.get_mirror_tree(),
+            'input_root': self.controls.get_input_path(),
+            'distribute': self.controls.get_distribute(),
+        }
         self.controls.set_converting_state(True)
-        try:
-            success = await self.converter.convert_files(
-                files_to_convert,
-                self.controls.get_output_path(),
-                progress_callback=self.controls.update_progress,
-                status_callback=self.controls.update_status
-            )
+        thread = threading.Thread(
+            target=lambda: asyncio.run(self.convert_files(files_to_convert, output_path, options)))
+        thread.daemon = True
+        thread.start()
 
-            if success:
-                messagebox.showinfo(
-                    self.translations.get("success"),
-                    self.translations.get("all_completed")
-                )
-        finally:
-            self.controls.reset_progress()
+    def resume_conversion(self):
+        output_path = self.controls.get_output_path()
+        if not output_path:
+            messagebox.showerror(
+                self.translations.get("error"),
+                self.translations.get("select_folders")
+            )
             self.controls.set_converting_state(False)
+            return
 
-    def start_conversion(self):
-        import threading
-        thread = threading.Thread(target=lambda: asyncio.run(self.convert_files()))
+        options = {
+            'concurrency': self.controls.get_concurrent_value(),
+            'mirror_tree': self.controls.get_mirror_tree(),
+            'input_root': self.controls.get_input_path(),
+            'distribute': self.controls.get_distribute(),
+        }
+        thread = threading.Thread(
+            target=lambda: asyncio.run(self.resume_files(output_path, options)))
         thread.daemon = True
         thread.start()
 
     def stop_conversion(self):
-        self.converter.cancel_conversion()
+        if self.active_converter is not None:
+            self.active_converter.cancel_conversion()
         self.controls.update_status(self.translations.get("conversion_cancelled"))
 
     def update_translations(self):
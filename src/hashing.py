@@ -0,0 +1,49 @@
+# hashing.py
+import hashlib
+import os
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path, chunk_size=CHUNK_SIZE):
+    """Return the BLAKE2b hex digest of a file's contents"""
+    digest = hashlib.blake2b(digest_size=32)
+    with open(path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def find_duplicates(files, digest=file_digest, map=map):
+    """Group byte-identical files: {first copy: [later copies]} for every file that has copies
+
+    Only files sharing their size with another are hashed, with digest(path)
+    mapped over them by map (e.g. an executor's). Files keep their given
+    order, so the first copy is always the same one. Unreadable files are
+    left out.
+    """
+    by_size = {}
+    for file in files:
+        try:
+            by_size.setdefault(os.path.getsize(file), []).append(file)
+        except OSError:
+            pass
+    candidates = [file for group in by_size.values() if len(group) > 1 for file in group]
+
+    def safe_digest(file):
+        try:
+            return digest(file)
+        except OSError:
+            return None
+
+    copies = {}
+    for file, file_hash in zip(candidates, map(safe_digest, candidates)):
+        if file_hash is not None:
+            copies.setdefault(file_hash, []).append(file)
+    order = {file: index for index, file in enumerate(files)}
+    duplicates = {}
+    for group in copies.values():
+        if len(group) > 1:
+            group.sort(key=order.get)
+            duplicates[group[0]] = group[1:]
+    return duplicates
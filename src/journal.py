@@ -0,0 +1,139 @@
+# journal.py
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobJournal:
+    """Persistent record of every file in a batch and how far it got.
+
+    The journal lives in the output folder, so a batch interrupted by a crash
+    or reboot can be resumed later: entries marked done whose output still has
+    the recorded size are skipped, everything else (queued, running, failed)
+    is converted again.
+    """
+
+    FILENAME = ".m4a_to_mp3_journal.sqlite"
+
+    def __init__(self, output_folder):
+        self.db_path = Path(output_folder) / self.FILENAME
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # WAL with NORMAL sync survives application crashes; a power loss may
+            # only drop the latest state changes, which resume simply redoes
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " source TEXT, output TEXT, state TEXT, output_size INTEGER,"
+                " checksum TEXT, error TEXT, updated REAL, PRIMARY KEY (source, output))"
+            )
+
+    @staticmethod
+    def _key(source, output):
+        return os.path.abspath(source), os.path.abspath(output)
+
+    def is_done(self, source, output):
+        """Whether source was converted to output and the output is still intact"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT state, output_size FROM jobs WHERE source = ? AND output = ?",
+                self._key(source, output)
+            ).fetchone()
+        if not row or row[0] != DONE:
+            return False
+        try:
+            return os.path.getsize(output) == row[1]
+        except OSError:
+            return False
+
+    def enqueue(self, jobs):
+        """Record (source, output) pairs as queued, in a single transaction"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO jobs (source, output, state, updated)"
+                " VALUES (?, ?, ?, ?)",
+                [(*self._key(source, output), QUEUED, now) for source, output in jobs]
+            )
+
+    def _set_state(self, source, output, state, output_size=None, checksum=None, error=None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, output_size = ?, checksum = ?, error = ?, updated = ?"
+                " WHERE source = ? AND output = ?",
+                (state, output_size, checksum, error, time.time(), *self._key(source, output))
+            )
+
+    def mark_running(self, source, output):
+        self._set_state(source, output, RUNNING)
+
+    def mark_done(self, source, output, checksum=None):
+        self._set_state(source, output, DONE, output_size=os.path.getsize(output),
+                        checksum=checksum)
+
+    def mark_failed(self, source, output, error):
+        self._set_state(source, output, FAILED, error=str(error))
+
+    def unfinished(self):
+        """Sources whose entry is not done or whose output went missing, e.g. after a crash"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT source, output, state, output_size FROM jobs ORDER BY source"
+            ).fetchall()
+        sources = []
+        for source, output, state, size in rows:
+            try:
+                intact = state == DONE and os.path.getsize(output) == size
+            except OSError:
+                intact = False
+            if not intact:
+                sources.append(source)
+        return sources
+
+    def owners(self):
+        """Sources recorded for each output, as {output: [sources]}"""
+        with self._lock:
+            rows = self._conn.execute("SELECT output, source FROM jobs").fetchall()
+        owners = {}
+        for output, source in rows:
+            owners.setdefault(output, []).append(source)
+        return owners
+
+    def counts(self):
+        """Number of entries per state"""
+        with self._lock:
+            return dict(self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state"))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def open_journal(output_folder):
+    """Open the journal in output_folder, or return None if it cannot be written"""
+    try:
+        return JobJournal(output_folder)
+    except Exception as e:
+        logging.error(f"Job journal unavailable in {output_folder}: {e}")
+        return None
+
+
+def unfinished_sources(output_folder):
+    """Existing sources an earlier batch into output_folder left unfinished"""
+    if not (Path(output_folder) / JobJournal.FILENAME).exists():
+        return []
+    journal = JobJournal(output_folder)
+    try:
+        return [source for source in journal.unfinished() if os.path.isfile(source)]
+    finally:
+        journal.close()
@@ -0,0 +1,137 @@
+# loudness.py
+"""
+EBU R128 loudness normalization with ffmpeg's loudnorm filter, in two passes.
+
+The first pass decodes the source and only measures it: integrated
+loudness, true peak, loudness range and gating threshold. The second pass
+is the regular encode with loudnorm given those measurements and
+linear=true, so the whole file gets one constant gain instead of the
+dynamic compression a single pass falls back to. loudnorm works at 192 kHz
+internally, so the filter chain resamples back to the source rate.
+
+Measurements describe the source audio only, not the target, so they are
+kept in a LoudnessIndex keyed by the source's content digest: converting a
+file again at another bitrate or loudness target skips the first pass.
+"""
+
+import json
+import math
+import re
+import sqlite3
+import threading
+from collections import namedtuple
+from pathlib import Path
+
+from .media_info import parse_ffmpeg_output
+
+# loudnorm settings: integrated loudness (LUFS), maximum true peak (dBTP), loudness range (LU)
+LoudnessTarget = namedtuple('LoudnessTarget', ['integrated', 'true_peak', 'lra'])
+
+# First-pass results for one source; sample_rate is the rate its audio decodes to
+LoudnessMeasurement = namedtuple('LoudnessMeasurement',
+                                 ['integrated', 'true_peak', 'lra', 'threshold', 'sample_rate'])
+
+# loudnorm rejects measured_I/measured_thresh below this; such sources are effectively silent
+MIN_LOUDNESS = -99.0
+
+_JSON_RE = re.compile(r'\[Parsed_loudnorm[^\]]*\]\s*(\{.*?\})', re.DOTALL)
+
+
+def loudness_target(config):
+    """The configured LoudnessTarget, or None if normalization is off"""
+    if config.LOUDNESS_TARGET is None:
+        return None
+    return LoudnessTarget(float(config.LOUDNESS_TARGET), float(config.LOUDNESS_TRUE_PEAK),
+                          float(config.LOUDNESS_RANGE))
+
+
+def analysis_command(ffmpeg_handler, input_path):
+    """First-pass command line: decode, measure, discard the audio"""
+    return [
+        ffmpeg_handler.get_executable(),
+        # loudnorm prints its measurements at info level
+        '-hide_banner', '-loglevel', 'info',
+        '-nostdin',
+        '-i', str(input_path),
+        '-map', '0:a:0',
+        '-af', 'loudnorm=print_format=json',
+        '-f', 'null', '-',
+    ]
+
+
+def parse_measurement(output):
+    """LoudnessMeasurement from the log output of analysis_command"""
+    match = _JSON_RE.search(output)
+    if not match:
+        raise RuntimeError("ffmpeg printed no loudnorm measurements")
+    values = json.loads(match.group(1))
+    info = parse_ffmpeg_output(output)
+    return LoudnessMeasurement(
+        float(values['input_i']),
+        float(values['input_tp']),
+        float(values['input_lra']),
+        float(values['input_thresh']),
+        info.sample_rate if info else None,
+    )
+
+
+def measure_loudness(engine, input_path, progress_callback=None):
+    """Run the first pass on input_path with an FFmpegEngine"""
+    output = engine.run(analysis_command(engine.ffmpeg_handler, input_path), progress_callback)
+    return parse_measurement(output)
+
+
+def normalization_filter(target, measurement):
+    """Second-pass audio filter chain, or None for a silent source"""
+    if not math.isfinite(measurement.integrated) or measurement.integrated < MIN_LOUDNESS:
+        return None
+    chain = (
+        f"loudnorm=I={target.integrated}:TP={target.true_peak}:LRA={target.lra}"
+        f":measured_I={measurement.integrated:.2f}"
+        f":measured_TP={min(max(measurement.true_peak, -99.0), 99.0):.2f}"
+        f":measured_LRA={min(max(measurement.lra, 0.0), 99.0):.2f}"
+        f":measured_thresh={max(measurement.threshold, MIN_LOUDNESS):.2f}"
+        f":linear=true"
+    )
+    if measurement.sample_rate:
+        chain += f",aresample={measurement.sample_rate}"
+    return chain
+
+
+class LoudnessIndex:
+    """Persistent first-pass measurements keyed by source content digest"""
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS measurements ("
+                " digest TEXT PRIMARY KEY, integrated REAL, true_peak REAL, lra REAL,"
+                " threshold REAL, sample_rate INTEGER)"
+            )
+
+    def lookup(self, digest):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT integrated, true_peak, lra, threshold, sample_rate FROM measurements"
+                " WHERE digest = ?", (digest,)
+            ).fetchone()
+        return LoudnessMeasurement(*row) if row else None
+
+    def store(self, digest, measurement):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO measurements"
+                " (digest, integrated, true_peak, lra, threshold, sample_rate)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (digest, *measurement)
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
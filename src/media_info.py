@@ -0,0 +1,180 @@
+# media_info.py
+import io
+import logging
+import re
+import struct
+import subprocess
+from collections import namedtuple
+from pathlib import Path
+
+MediaInfo = namedtuple('MediaInfo', ['duration', 'sample_rate', 'channels'])
+
+# Boxes we descend into while looking for the movie/track headers
+_CONTAINER_BOXES = {b'moov', b'trak', b'mdia', b'minf', b'stbl'}
+_AUDIO_SAMPLE_ENTRIES = {b'mp4a', b'alac', b'ac-3', b'ec-3', b'Opus', b'fLaC'}
+
+
+def _iter_boxes(f, start, end):
+    """Yield (type, payload_offset, payload_size) for the boxes in [start, end)"""
+    offset = start
+    while offset + 8 <= end:
+        f.seek(offset)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack('>I4s', header)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+        if size < header_size:
+            return
+        yield box_type, offset + header_size, size - header_size
+        offset += size
+
+
+def moov_before_mdat(head: bytes):
+    """Whether an MP4 starting with head can be demuxed from a pipe
+
+    The demuxer needs the movie box (moov) before it can read any sample, so
+    a file with moov after the media data (mdat) has to be seekable. Returns
+    True or False once either box is seen in head, or None if head is too
+    short to tell.
+    """
+    f = io.BytesIO(head)
+    for box_type, _, _ in _iter_boxes(f, 0, len(head)):
+        if box_type == b'moov':
+            return True
+        if box_type == b'mdat':
+            return False
+    return None
+
+
+def _read_header_times(f, offset):
+    """Read (timescale, duration) from an mvhd/mdhd payload"""
+    f.seek(offset)
+    version = f.read(1)[0]
+    if version == 1:
+        f.seek(offset + 20)
+        timescale, duration = struct.unpack('>IQ', f.read(12))
+    else:
+        f.seek(offset + 12)
+        timescale, duration = struct.unpack('>II', f.read(8))
+    return timescale, duration
+
+
+def _parse_mp4(path: Path):
+    """Read duration, sample rate and channels straight from MP4 box headers.
+
+    Only the box headers are touched, so this costs a handful of small reads
+    no matter how long the recording is.
+    """
+    info = {'duration': None, 'sample_rate': None, 'channels': None}
+    with open(path, 'rb') as f:
+        f.seek(0, 2)
+        file_size = f.tell()
+
+        def walk(start, end, in_sound_track=False):
+            boxes = list(_iter_boxes(f, start, end))
+            if not in_sound_track:
+                for box_type, offset, size in boxes:
+                    if box_type == b'hdlr':
+                        f.seek(offset + 8)
+                        in_sound_track = f.read(4) == b'soun'
+            for box_type, offset, size in boxes:
+                if box_type == b'mvhd' and info['duration'] is None:
+                    timescale, duration = _read_header_times(f, offset)
+                    if timescale:
+                        info['duration'] = duration / timescale
+                elif box_type == b'mdhd' and in_sound_track:
+                    timescale, duration = _read_header_times(f, offset)
+                    if timescale and duration:
+                        info['duration'] = duration / timescale
+                elif box_type == b'stsd' and in_sound_track:
+                    # Skip version/flags and entry count, then the sample entry header
+                    f.seek(offset + 8)
+                    entry_size, entry_type = struct.unpack('>I4s', f.read(8))
+                    if entry_type in _AUDIO_SAMPLE_ENTRIES:
+                        f.seek(offset + 8 + 8 + 16)
+                        channels, _, _, _, sample_rate = struct.unpack('>HHHHI', f.read(12))
+                        info['channels'] = channels
+                        info['sample_rate'] = sample_rate >> 16
+                elif box_type in _CONTAINER_BOXES:
+                    walk(offset, offset + size, in_sound_track and box_type != b'trak')
+
+        walk(0, file_size)
+
+    if not info['duration']:
+        return None
+    return MediaInfo(info['duration'], info['sample_rate'], info['channels'])
+
+
+_DURATION_RE = re.compile(r'Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)')
+_AUDIO_RE = re.compile(r'Audio:.*?(\d+) Hz,\s*([^,]+)')
+_CHANNEL_LAYOUTS = {'mono': 1, 'stereo': 2, '2.1': 3, 'quad': 4, '5.0': 5, '5.1': 6, '7.1': 8}
+
+
+def _probe_with_ffmpeg(path: Path, ffmpeg_handler):
+    """Fall back to parsing `ffmpeg -i` output for containers we cannot read"""
+    result = subprocess.run(
+        [ffmpeg_handler.get_executable(), '-hide_banner', '-nostdin', '-i', str(path)],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        **ffmpeg_handler.popen_kwargs()
+    )
+    return parse_ffmpeg_output(result.stderr.decode(errors='replace'))
+
+
+def parse_ffmpeg_output(output):
+    """MediaInfo of the first input described in ffmpeg's log output, or None"""
+    match = _DURATION_RE.search(output)
+    if not match:
+        return None
+    hours, minutes, seconds = match.groups()
+    duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+    sample_rate = channels = None
+    audio = _AUDIO_RE.search(output)
+    if audio:
+        sample_rate = int(audio.group(1))
+        layout = audio.group(2).split('(')[0].strip()
+        channels = _CHANNEL_LAYOUTS.get(layout)
+        if channels is None:
+            count = re.match(r'(\d+) channels', layout)
+            channels = int(count.group(1)) if count else None
+    return MediaInfo(duration, sample_rate, channels)
+
+
+def probe_media(path, ffmpeg_handler=None):
+    """Return MediaInfo for an audio file, or None if it cannot be determined"""
+    path = Path(path)
+    try:
+        info = _parse_mp4(path)
+        if info is not None:
+            return info
+    except (OSError, struct.error, IndexError) as e:
+        logging.debug(f"MP4 header parse failed for {path}: {e}")
+
+    if ffmpeg_handler is None:
+        return None
+    try:
+        return _probe_with_ffmpeg(path, ffmpeg_handler)
+    except OSError as e:
+        logging.debug(f"FFmpeg probe failed for {path}: {e}")
+        return None
+
+
+def probe_decoded(path, ffmpeg_handler):
+    """MediaInfo as the decoder will output it, at the cost of running ffmpeg
+
+    Unlike the container headers, this reports e.g. the doubled sample rate
+    HE-AAC decodes to. Returns None if ffmpeg cannot read the file.
+    """
+    try:
+        return _probe_with_ffmpeg(Path(path), ffmpeg_handler)
+    except OSError as e:
+        logging.debug(f"FFmpeg probe failed for {path}: {e}")
+        return None
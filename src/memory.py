@@ -0,0 +1,181 @@
+# memory.py
+"""
+Memory accounting for the conversion scheduler.
+
+Each job's peak memory is estimated before it starts (see
+Backend.memory_estimate) and AudioConverter only admits jobs while the
+estimates of everything running fit in Config.MEMORY_BUDGET_BYTES.
+
+MemoryMonitor records what the jobs actually used, for calibrating the
+estimates. A job whose work runs in child processes (ffmpeg) registers them
+in a ProcessRegistry of its own; the sum of their peak resident memory is
+sampled while the file converts and the highest value is kept as the file's
+peak_rss, with peak_rss_scope "job". Jobs converting inside this process
+(in-process and pydub backends) share its memory with every other running
+job, so they get the whole process's resident memory plus its children's,
+with peak_rss_scope "batch"; calibration has to skip those. The batch
+report's baseline_rss is the process's own memory before the first job
+started and its peak_rss the highest total seen during the batch.
+Sampling reads /proc and is only available on Linux.
+"""
+
+import logging
+import os
+import sys
+import threading
+from contextlib import contextmanager
+
+SAMPLE_SECONDS = 0.1
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def physical_memory():
+    """Total physical memory in bytes, or None if it cannot be determined"""
+    if sys.platform == 'win32':
+        import ctypes
+
+        class MemoryStatus(ctypes.Structure):
+            _fields_ = [('dwLength', ctypes.c_ulong), ('dwMemoryLoad', ctypes.c_ulong),
+                        ('ullTotalPhys', ctypes.c_ulonglong), ('ullAvailPhys', ctypes.c_ulonglong),
+                        ('ullTotalPageFile', ctypes.c_ulonglong), ('ullAvailPageFile', ctypes.c_ulonglong),
+                        ('ullTotalVirtual', ctypes.c_ulonglong), ('ullAvailVirtual', ctypes.c_ulonglong),
+                        ('ullAvailExtendedVirtual', ctypes.c_ulonglong)]
+
+        status = MemoryStatus(dwLength=ctypes.sizeof(MemoryStatus))
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullTotalPhys
+        return None
+    try:
+        return os.sysconf('SC_PHYS_PAGES') * _PAGE_SIZE
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def memory_budget(config):
+    """Config.MEMORY_BUDGET_BYTES in bytes; "auto" is half the physical memory. None means unlimited"""
+    budget = config.MEMORY_BUDGET_BYTES
+    if budget is None:
+        return None
+    if str(budget).lower() == "auto":
+        total = physical_memory()
+        return total // 2 if total else None
+    return int(budget)
+
+
+def process_rss(pid="self"):
+    """Current resident memory of a process in bytes, or None"""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def process_peak_rss(pid):
+    """Highest resident memory a process has had so far (VmHWM) in bytes, or None"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def children_rss(processes):
+    """Sum of the peak resident memory of processes's running children in bytes"""
+    return sum(process_peak_rss(pid) or process_rss(pid) or 0 for pid in processes.live_pids())
+
+
+class MemoryMonitor:
+    """Records the peak resident memory seen while each file converts
+
+    processes is the batch's ProcessRegistry, whose live children count
+    towards the batch-wide total.
+    """
+
+    def __init__(self, processes, interval=SAMPLE_SECONDS):
+        self.processes = processes
+        self.interval = interval
+        self.available = process_rss() is not None
+        self.peak = None  # Highest batch-wide sample since start()
+        # id(records) -> (records, the job's ProcessRegistry or None) of each converting job
+        self._active = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.peak = None
+        if self.available and self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="memory-monitor", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stopped.set()
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+
+    def sample(self):
+        """Resident memory of this process and its running children in bytes, or None"""
+        total = process_rss()
+        if total is None:
+            return None
+        total += children_rss(self.processes)
+        if self.peak is None or total > self.peak:
+            self.peak = total
+        return total
+
+    @contextmanager
+    def track(self, *records, processes=None):
+        """Record the peak memory during the with-block in each FileMetrics's peak_rss
+
+        processes is the job's own ProcessRegistry when its work runs in
+        child processes; their memory is split evenly across records (files
+        sharing one ffmpeg process). Without it the batch-wide total is kept.
+        """
+        if not self.available:
+            yield
+            return
+        for record in records:
+            record.peak_rss_scope = "batch" if processes is None else "job"
+        with self._lock:
+            self._active[id(records)] = (records, processes)
+        self._wake.set()
+        try:
+            yield
+        finally:
+            # Sample once more so jobs shorter than the interval are measured too
+            self._update([(records, processes)], self.sample())
+            with self._lock:
+                self._active.pop(id(records), None)
+
+    @staticmethod
+    def _update(jobs, total):
+        for records, processes in jobs:
+            rss = total if processes is None else children_rss(processes) // len(records)
+            if not rss:
+                continue  # Not sampled, or the job's processes have not started or already exited
+            for record in records:
+                if record.peak_rss is None or rss > record.peak_rss:
+                    record.peak_rss = rss
+
+    def _run(self):
+        while not self._stopped.is_set():
+            with self._lock:
+                jobs = list(self._active.values())
+            if not jobs:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            try:
+                self._update(jobs, self.sample())
+            except Exception as e:
+                logging.debug(f"Memory sampling failed: {e}")
+            self._stopped.wait(self.interval)
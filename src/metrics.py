@@ -0,0 +1,201 @@
+# metrics.py
+import csv
+import json
+import math
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+# Stages in pipeline order. The direct engine decodes and encodes in one
+# FFmpeg process, so its whole transcode is reported under "encode".
+# "analyze" is the first loudness normalization pass, which runs on its own
+# pool; "transfer" is the time distributed workers spend moving files over HTTP.
+STAGES = ("queue", "probe", "analyze", "cache", "decode", "encode", "write", "transfer")
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+class FileMetrics:
+    """Stage timings and sizes for one file of a batch"""
+
+    def __init__(self, file):
+        self.file = file
+        self.queued_at = time.perf_counter()
+        self.status = "queued"
+        self.worker = None
+        self.stages = {}
+        self.bytes_in = None
+        self.bytes_out = None
+        self.duration = None
+        # Estimated and measured peak memory in bytes (see memory.py); the scope
+        # is "job" when peak_rss is this file's own, "batch" when it is shared
+        self.memory_estimate = None
+        self.peak_rss = None
+        self.peak_rss_scope = None
+
+    @contextmanager
+    def stage(self, name):
+        """Add the wall time spent inside the with-block to stage name"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    @property
+    def realtime_factor(self):
+        """Seconds of audio converted per second spent decoding and encoding"""
+        busy = self.stages.get("decode", 0.0) + self.stages.get("encode", 0.0)
+        if not self.duration or not busy:
+            return None
+        return self.duration / busy
+
+    def as_dict(self):
+        row = {
+            'file': self.file,
+            'status': self.status,
+            'worker': self.worker,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'duration': self.duration,
+            'realtime_factor': self.realtime_factor,
+            'memory_estimate': self.memory_estimate,
+            'peak_rss': self.peak_rss,
+            'peak_rss_scope': self.peak_rss_scope,
+        }
+        for name in STAGES:
+            row[f'{name}_seconds'] = self.stages.get(name)
+        return row
+
+
+class BatchMetrics:
+    """Collects FileMetrics for a batch and exports them as reports"""
+
+    def __init__(self):
+        self.started = time.time()
+        self._started_monotonic = time.perf_counter()
+        self.elapsed = None
+        self.files = {}
+        self.baseline_rss = None  # Resident memory before the first job started, if measured
+        self.peak_rss = None  # Highest resident memory of the process and its children, if measured
+
+    def file(self, file):
+        """The metrics record for file, created on first use"""
+        key = str(file)
+        if key not in self.files:
+            self.files[key] = FileMetrics(key)
+        return self.files[key]
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self._started_monotonic
+
+    def stage_totals(self):
+        totals = dict.fromkeys(STAGES, 0.0)
+        for record in self.files.values():
+            for name, seconds in record.stages.items():
+                totals[name] = totals.get(name, 0.0) + seconds
+        return totals
+
+    def summary(self):
+        """Batch totals plus per-stage sum, share and p50/p95 across files"""
+        records = list(self.files.values())
+        totals = self.stage_totals()
+        busy = sum(seconds for name, seconds in totals.items() if name != "queue")
+        stages = {}
+        for name, total in totals.items():
+            values = [record.stages[name] for record in records if name in record.stages]
+            stages[name] = {
+                'total_seconds': total,
+                'share': total / busy if busy and name != "queue" else None,
+                'p50_seconds': percentile(values, 0.50),
+                'p95_seconds': percentile(values, 0.95),
+            }
+        statuses = {}
+        for record in records:
+            statuses[record.status] = statuses.get(record.status, 0) + 1
+        audio_seconds = sum(record.duration or 0 for record in records if record.status == "completed")
+        elapsed = self.elapsed if self.elapsed is not None else time.perf_counter() - self._started_monotonic
+        return {
+            'started': self.started,
+            'elapsed_seconds': elapsed,
+            'files': len(records),
+            'statuses': statuses,
+            'bytes_in': sum(record.bytes_in or 0 for record in records),
+            'bytes_out': sum(record.bytes_out or 0 for record in records),
+            'audio_seconds': audio_seconds,
+            'realtime_factor': audio_seconds / elapsed if elapsed else None,
+            'baseline_rss': self.baseline_rss,
+            'peak_rss': self.peak_rss,
+            'stages': stages,
+        }
+
+    def write_json(self, path):
+        report = {'summary': self.summary(),
+                  'files': [record.as_dict() for record in self.files.values()]}
+        _write_atomic(path, json.dumps(report, indent=2))
+
+    def write_csv(self, path):
+        rows = [record.as_dict() for record in self.files.values()]
+        fields = list(FileMetrics("").as_dict())
+        partial_path = Path(str(path) + '.part')
+        with open(partial_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(rows)
+        os.replace(partial_path, path)
+
+    def write_prometheus(self, path):
+        """Write gauges for the node_exporter textfile collector"""
+        summary = self.summary()
+        lines = [
+            "# HELP m4a_to_mp3_stage_seconds Time spent per conversion stage in the last batch",
+            "# TYPE m4a_to_mp3_stage_seconds gauge",
+        ]
+        for name, stage in summary['stages'].items():
+            lines.append(f'm4a_to_mp3_stage_seconds{{stage="{name}"}} {stage["total_seconds"]:.6f}')
+        lines += [
+            "# HELP m4a_to_mp3_files Files in the last batch by final status",
+            "# TYPE m4a_to_mp3_files gauge",
+        ]
+        for status, count in sorted(summary['statuses'].items()):
+            lines.append(f'm4a_to_mp3_files{{status="{status}"}} {count}')
+        for name, help_text, value in (
+                ("bytes_in", "Source bytes in the last batch", summary['bytes_in']),
+                ("bytes_out", "MP3 bytes written in the last batch", summary['bytes_out']),
+                ("audio_seconds", "Seconds of audio converted in the last batch", summary['audio_seconds']),
+                ("batch_seconds", "Wall time of the last batch", summary['elapsed_seconds']),
+                ("realtime_factor", "Audio seconds converted per wall second in the last batch",
+                 summary['realtime_factor'] or 0),
+                ("last_batch_timestamp_seconds", "Start time of the last batch", summary['started'])):
+            lines += [f"# HELP m4a_to_mp3_{name} {help_text}",
+                      f"# TYPE m4a_to_mp3_{name} gauge",
+                      f"m4a_to_mp3_{name} {value}"]
+        _write_atomic(path, "\n".join(lines) + "\n")
+
+    def export(self, report_paths=(), prometheus_path=None):
+        """Write each report path as JSON or CSV (by extension), plus the Prometheus textfile"""
+        for path in report_paths:
+            if str(path).lower().endswith('.csv'):
+                self.write_csv(path)
+            else:
+                self.write_json(path)
+        if prometheus_path:
+            self.write_prometheus(prometheus_path)
+
+
+def _write_atomic(path, text):
+    """Replace path in one step so readers (e.g. node_exporter) never see a partial file"""
+    partial_path = Path(str(path) + '.part')
+    partial_path.write_text(text)
+    os.replace(partial_path, path)
@@ -0,0 +1,100 @@
+# process_registry.py
+import contextlib
+import logging
+import subprocess
+import threading
+
+_local = threading.local()
+
+
+class ProcessRegistry:
+    """Keeps track of the child processes launched for a conversion batch.
+
+    Closing the registry terminates every tracked process (politely first,
+    then forcefully after a grace period) and makes any process registered
+    afterwards get terminated straight away.
+
+    A registry with a parent also registers every process there, so one
+    part of a batch can be stopped on its own while cancelling the batch
+    still reaches it.
+    """
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self._processes = set()
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def reset(self):
+        with self._lock:
+            self._closed = False
+
+    def register(self, process):
+        if self.parent is not None:
+            self.parent.register(process)
+        with self._lock:
+            if not self._closed:
+                if len(self._processes) >= 64:
+                    # Processes registered by third-party code are never unregistered
+                    self._processes = {p for p in self._processes if p.poll() is None}
+                self._processes.add(process)
+                return
+        # Launched after the batch was cancelled
+        self._terminate(process)
+
+    def live_pids(self):
+        """Process ids of the tracked processes that are still running"""
+        with self._lock:
+            processes = list(self._processes)
+        return [process.pid for process in processes if process.poll() is None]
+
+    def unregister(self, process):
+        if self.parent is not None:
+            self.parent.unregister(process)
+        with self._lock:
+            self._processes.discard(process)
+
+    @staticmethod
+    def _terminate(process):
+        try:
+            process.terminate()
+        except OSError:
+            pass
+
+    def terminate_all(self, timeout=3.0):
+        """Terminate all tracked processes, killing those still alive after timeout"""
+        with self._lock:
+            self._closed = True
+            processes = list(self._processes)
+            self._processes.clear()
+        if not processes:
+            return
+
+        logging.info(f"Terminating {len(processes)} running process(es)")
+        for process in processes:
+            self._terminate(process)
+        for process in processes:
+            try:
+                process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                logging.warning(f"Process {process.pid} ignored terminate, killing it")
+                try:
+                    process.kill()
+                except OSError:
+                    pass
+
+
+@contextlib.contextmanager
+def bind(registry):
+    """Track processes started by third-party code (e.g. pydub) on this thread"""
+    previous = getattr(_local, 'registry', None)
+    _local.registry = registry
+    try:
+        yield registry
+    finally:
+        _local.registry = previous
+
+
+def current():
+    """Registry bound to the calling thread, if any"""
+    return getattr(_local, 'registry', None)
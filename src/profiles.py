@@ -0,0 +1,133 @@
+# profiles.py
+import os
+import re
+import string
+import sys
+from pathlib import Path
+
+CHANNEL_NAMES = {1: "mono", 2: "stereo"}
+TEMPLATE_FIELDS = {"stem", "name", "bitrate", "channels", "sample_rate"}
+
+
+class OutputProfile:
+    """One MP3 rendition of every source: encoder settings plus a file name template.
+
+    Templates are str.format strings with the fields {stem} (source name
+    without extension), {name} (source name), {bitrate}, {channels} and
+    {sample_rate}; they may contain subfolders, e.g. "{bitrate}/{stem}.mp3".
+    Unset settings fall back to Config.MP3_BITRATE and the source's own
+    channel layout and sample rate.
+    """
+
+    def __init__(self, bitrate=None, channels=None, sample_rate=None, template="{stem}.mp3"):
+        self.bitrate = bitrate
+        self.channels = int(channels) if channels else None
+        self.sample_rate = int(sample_rate) if sample_rate else None
+        self.template = template
+        unknown = {field for _, field, _, _ in string.Formatter().parse(template)
+                   if field is not None} - TEMPLATE_FIELDS
+        if unknown:
+            raise ValueError(f"Unknown field(s) {', '.join(sorted(unknown))} in template {template!r}")
+
+    def __repr__(self):
+        return (f"OutputProfile(bitrate={self.bitrate!r}, channels={self.channels!r}, "
+                f"sample_rate={self.sample_rate!r}, template={self.template!r})")
+
+    @classmethod
+    def parse(cls, spec):
+        """Build a profile from "bitrate=64k,channels=mono,template={stem}_64k.mp3"
+
+        A bare bitrate such as "128k" is accepted as well.
+        """
+        if '=' not in spec:
+            return cls(bitrate=spec, template="{stem}_{bitrate}.mp3")
+        fields = {}
+        for part in re.split(r',(?=\s*\w+=)', spec):
+            key, _, value = part.partition('=')
+            fields[key.strip()] = value.strip()
+        if fields.get('channels') in ('mono', 'stereo'):
+            fields['channels'] = 1 if fields['channels'] == 'mono' else 2
+        unknown = set(fields) - {'bitrate', 'channels', 'sample_rate', 'template'}
+        if unknown:
+            raise ValueError(f"Unknown profile setting(s): {', '.join(sorted(unknown))}")
+        return cls(**fields)
+
+    def resolved_bitrate(self, config):
+        return self.bitrate or config.MP3_BITRATE
+
+    def encoder_args(self):
+        """ffmpeg output options besides codec and bitrate"""
+        args = []
+        if self.channels:
+            args += ['-ac', str(self.channels)]
+        if self.sample_rate:
+            args += ['-ar', str(self.sample_rate)]
+        return args
+
+    def filename(self, source: Path, config):
+        """Output path of source relative to its output folder"""
+        name = self.template.format(
+            stem=source.stem,
+            name=source.name,
+            bitrate=self.resolved_bitrate(config),
+            channels=CHANNEL_NAMES.get(self.channels, f"{self.channels}ch") if self.channels else "source",
+            sample_rate=self.sample_rate or "source",
+        )
+        name = os.path.normpath(name)
+        if os.path.isabs(name) or name.split(os.sep)[0] == '..':
+            raise ValueError(f"Template {self.template!r} points outside the output folder")
+        return name
+
+    def cache_fields(self, config):
+        """The settings that affect the encoded bytes, for the conversion cache key"""
+        return {
+            'bitrate': self.resolved_bitrate(config),
+            'channels': self.channels,
+            'sample_rate': self.sample_rate,
+        }
+
+
+def check_profiles(profiles, config):
+    """Raise ValueError if two profiles would write the same file for a source"""
+    names = [profile.filename(Path("source.m4a"), config) for profile in profiles]
+    if len(set(names)) != len(names):
+        raise ValueError("Output profiles need distinct file name templates")
+
+
+def path_key(path):
+    """Compare output paths the way the file system does (case-insensitively on Windows and macOS)"""
+    key = os.path.normcase(os.path.abspath(path))
+    return key.casefold() if sys.platform == 'darwin' else key
+
+
+def resolve_collisions(planned, owners=None, suffix=" ({n})"):
+    """Rename planned outputs so no two sources write the same file
+
+    planned maps each source to its list of output paths; owners maps
+    path_key(output) to the sources an earlier batch wrote it for (from the
+    job journal). Sources are visited in sorted order, and an output already
+    taken by an earlier source, or owned by another source, gets suffix
+    inserted before its extension, counting n up from 2. A rerun with the
+    same sources, or any subset of them, therefore picks the same names.
+    Returns planned with the renamed paths.
+    """
+    owners = owners or {}
+    taken = set()
+    resolved = {}
+    for source in sorted(planned, key=path_key):
+        own = path_key(source)
+
+        def free(path):
+            key = path_key(path)
+            return key not in taken and own in owners.get(key, {own})
+
+        paths = []
+        for path in map(Path, planned[source]):
+            candidate, n = path, 2
+            while not free(candidate):
+                candidate = path.with_name(f"{path.stem}{suffix.format(n=n)}{path.suffix}")
+                n += 1
+            taken.add(path_key(candidate))
+            paths.append(candidate)
+        resolved[source] = paths
+    return resolved
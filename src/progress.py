@@ -0,0 +1,74 @@
+# progress.py
+import threading
+import time
+
+
+def format_eta(seconds):
+    """Format a number of seconds as H:MM:SS"""
+    if seconds is None:
+        return "--:--:--"
+    seconds = int(round(seconds))
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+class ProgressTracker:
+    """Aggregates per-file encode positions into duration-weighted batch progress.
+
+    Each file contributes in proportion to its probed duration; files whose
+    duration is unknown are weighted with the average of the known ones.
+    """
+
+    def __init__(self, durations):
+        known = [d for d in durations.values() if d]
+        fallback = sum(known) / len(known) if known else 1.0
+        self._durations = {file: (d or fallback) for file, d in durations.items()}
+        self._total = sum(self._durations.values()) or 1.0
+        self._done = {}
+        self._active = {}
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+
+    def update(self, file, seconds, speed=None):
+        """Record that file has been encoded up to `seconds` of audio"""
+        with self._lock:
+            duration = self._durations.get(file, 0)
+            self._done[file] = min(seconds, duration)
+            self._active[file] = (self._done[file], speed, time.monotonic())
+
+    def complete(self, file):
+        with self._lock:
+            self._done[file] = self._durations.get(file, 0)
+            self._active.pop(file, None)
+
+    def discard(self, file):
+        """Forget a file that failed, so it no longer counts towards the batch"""
+        with self._lock:
+            self._total -= self._durations.pop(file, 0)
+            self._total = max(self._total, 1.0)
+            self._done.pop(file, None)
+            self._active.pop(file, None)
+
+    def snapshot(self):
+        """Return percent, ETA, aggregate realtime speed and per-file state"""
+        with self._lock:
+            done = sum(self._done.values())
+            elapsed = time.monotonic() - self._started
+            speed = done / elapsed if elapsed > 0 else 0.0
+            remaining = max(self._total - done, 0.0)
+            now = time.monotonic()
+            active = [
+                {
+                    'file': str(file),
+                    'position': position,
+                    'duration': self._durations.get(file),
+                    'speed': file_speed,
+                    'idle': now - updated,
+                }
+                for file, (position, file_speed, updated) in self._active.items()
+            ]
+        return {
+            'progress': min(done / self._total * 100, 100.0),
+            'eta': remaining / speed if speed > 0 else None,
+            'speed': speed,
+            'active': active,
+        }
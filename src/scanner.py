@@ -0,0 +1,142 @@
+# scanner.py
+import fnmatch
+import logging
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class DirectoryScanner:
+    """Finds input files below one or more directories using a pool of threads.
+
+    Every directory is listed with os.scandir on a worker thread, so slow
+    network shares are listed many directories at a time. Matches are handed
+    out in batches while the scan is still running.
+    """
+
+    def __init__(self, include=("*.m4a",), exclude=(), recursive=True,
+                 max_workers=None, batch_size=500):
+        self.include = [pattern.lower() for pattern in include]
+        self.exclude = [pattern.lower() for pattern in exclude]
+        self.recursive = recursive
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) * 4)
+        self.batch_size = batch_size
+        self._stopped = False
+
+    def stop(self):
+        """Abandon a running scan; the current batch is still delivered"""
+        self._stopped = True
+
+    def _excluded(self, name, relative):
+        return any(fnmatch.fnmatchcase(name, pattern) or fnmatch.fnmatchcase(relative, pattern)
+                   for pattern in self.exclude)
+
+    def _included(self, name, relative):
+        return any(fnmatch.fnmatchcase(name, pattern) or fnmatch.fnmatchcase(relative, pattern)
+                   for pattern in self.include)
+
+    def matches(self, path, root=None):
+        """Whether a file named directly (not found by a scan) passes the filters
+
+        Like scanned files, it is matched by name and by its path relative
+        to root (default: its own folder), and skipped if a folder between
+        root and the file is excluded.
+        """
+        name = os.path.basename(path).lower()
+        relative = os.path.relpath(path, root).replace(os.sep, '/').lower() if root else name
+        if self._folder_excluded(relative.split('/')[:-1]):
+            return False
+        return not self._excluded(name, relative) and self._included(name, relative)
+
+    def _folder_excluded(self, folders):
+        """Whether the folder reached through the relative path components folders is skipped"""
+        return any(self._excluded(folder, '/'.join(folders[:depth + 1]))
+                   for depth, folder in enumerate(folders))
+
+    def descends_into(self, path, root):
+        """Whether a scan of root lists the folder at path"""
+        relative = os.path.relpath(path, root).replace(os.sep, '/').lower()
+        if relative == '.':
+            return True
+        return self.recursive and not self._folder_excluded(relative.split('/'))
+
+    def directories(self, directory, root=None):
+        """directory and, if recursive, every folder below it a scan would descend into
+
+        Exclusions are matched relative to root (default: directory).
+        """
+        root = root or directory
+        pending = [directory]
+        while pending:
+            current = pending.pop()
+            yield current
+            if not self.recursive:
+                continue
+            try:
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        relative = os.path.relpath(entry.path, root).replace(os.sep, '/').lower()
+                        if (entry.is_dir(follow_symlinks=False)
+                                and not self._excluded(entry.name.lower(), relative)):
+                            pending.append(entry.path)
+            except OSError as e:
+                logging.warning(f"Cannot list {current}: {e}")
+
+    def _scan_directory(self, root, directory):
+        """List one directory; returns (matching files, subdirectories to descend into)"""
+        files, subdirectories = [], []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    name = entry.name.lower()
+                    relative = os.path.relpath(entry.path, root).replace(os.sep, '/').lower()
+                    if self._excluded(name, relative):
+                        continue
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if self.recursive:
+                                subdirectories.append(entry.path)
+                        elif entry.is_file() and self._included(name, relative):
+                            files.append(entry.path)
+                    except OSError:
+                        continue
+        except OSError as e:
+            logging.warning(f"Cannot list {directory}: {e}")
+        return files, subdirectories
+
+    def iter_batches(self, roots):
+        """Yield lists of matching file paths as directories finish listing"""
+        self._stopped = False
+        batch = []
+        with ThreadPoolExecutor(max_workers=self.max_workers,
+                                thread_name_prefix="scanner") as executor:
+            roots_by_future = {}
+            for root in roots:
+                root = os.path.abspath(root)
+                roots_by_future[executor.submit(self._scan_directory, root, root)] = root
+            pending = set(roots_by_future)
+
+            while pending and not self._stopped:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    root = roots_by_future.pop(future)
+                    files, subdirectories = future.result()
+                    batch.extend(files)
+                    for subdirectory in subdirectories:
+                        child = executor.submit(self._scan_directory, root, subdirectory)
+                        roots_by_future[child] = root
+                        pending.add(child)
+                if len(batch) >= self.batch_size:
+                    yield batch
+                    batch = []
+
+            for future in pending:
+                future.cancel()
+        if batch:
+            yield batch
+
+    def scan(self, roots):
+        """Return every matching file below roots"""
+        files = []
+        for batch in self.iter_batches(roots):
+            files.extend(batch)
+        return files
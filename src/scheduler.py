@@ -0,0 +1,201 @@
+# scheduler.py
+import asyncio
+import logging
+import math
+import os
+import time
+from pathlib import Path
+
+JOB_ORDERS = ("longest_first", "input")
+# Rough AAC byte rate (128 kb/s) used to estimate files whose duration is unknown
+ESTIMATED_BYTES_PER_SECOND = 16000
+
+
+def order_jobs(files, durations, policy="longest_first"):
+    """Order files for dispatch to the worker pool
+
+    "longest_first" starts the longest files first (LPT scheduling), so a
+    long file never begins after the short ones are done and leaves the
+    other workers idle while it finishes. durations maps str(Path(file)) to
+    seconds or None; unknown durations are estimated from the file size.
+    "input" keeps the caller's order.
+    """
+    if policy == "input":
+        return list(files)
+    if policy != "longest_first":
+        raise ValueError(f"Unknown job order {policy!r}, expected one of {JOB_ORDERS}")
+
+    def estimated_seconds(file):
+        duration = durations.get(str(Path(file)))
+        if duration:
+            return duration
+        try:
+            return os.path.getsize(file) / ESTIMATED_BYTES_PER_SECOND
+        except OSError:
+            return 0.0
+
+    # sorted() is stable, so equally long files keep their input order
+    return sorted(files, key=estimated_seconds, reverse=True)
+
+
+def group_small_files(files, durations, max_seconds, max_bytes, batch_size, workers=1):
+    """Split files into jobs, combining short ones so they share an ffmpeg process
+
+    A file is short if its duration is at most max_seconds or, when the
+    duration is unknown, its size is at most max_bytes. Short files are
+    grouped in their given order into jobs of up to batch_size files, but
+    never so few jobs that fewer than workers of them could run at once.
+    Every other file is a job of its own. Returns a list of file lists,
+    long files first as they appeared in files.
+    """
+    if not batch_size or batch_size < 2:
+        return [[file] for file in files]
+
+    def is_small(file):
+        duration = durations.get(str(Path(file)))
+        if duration is not None:
+            return max_seconds is not None and duration <= max_seconds
+        try:
+            return max_bytes is not None and os.path.getsize(file) <= max_bytes
+        except OSError:
+            return False
+
+    large, small = [], []
+    for file in files:
+        (small if is_small(file) else large).append(file)
+    size = max(1, min(batch_size, math.ceil(len(small) / max(1, workers))))
+    return [[file] for file in large] + [small[i:i + size] for i in range(0, len(small), size)]
+
+
+class ConcurrencyController:
+    """Decides how many conversions may run at the same time.
+
+    With a fixed value the controller behaves like a plain semaphore. In
+    "auto" mode it starts from the CPU count, measures throughput as audio
+    seconds encoded per wall-clock second, and hill-climbs the limit up or
+    down until throughput stops improving.
+
+    With a memory_budget (bytes), a job is also only admitted while its
+    estimated memory fits next to that of the running jobs. Jobs queued
+    behind one that does not fit go ahead if they do, until the waiting job
+    has been overtaken MAX_OVERTAKES times; from then on nothing behind it
+    starts before it. A job larger than the whole budget runs on its own.
+    """
+
+    AUTO = "auto"
+    # Relative gain a new limit has to show before we keep moving that way
+    IMPROVEMENT_THRESHOLD = 0.05
+    # Minimum wall time a measurement window has to cover
+    MIN_WINDOW_SECONDS = 2.0
+    # Later jobs that may start ahead of one waiting for memory before it blocks them
+    MAX_OVERTAKES = 16
+
+    def __init__(self, requested, memory_budget=None):
+        cpu_count = os.cpu_count() or 1
+        self.auto = requested is None or str(requested).lower() == self.AUTO
+        if self.auto:
+            self.min_limit = 1
+            self.max_limit = cpu_count * 2
+            self.limit = cpu_count
+            self._step = max(1, cpu_count // 8)
+        else:
+            self.limit = self.min_limit = self.max_limit = max(1, int(requested))
+            self._step = 0
+
+        self.memory_budget = memory_budget
+        self.memory_in_use = 0
+        self._running = 0
+        # [memory, times overtaken] of each job waiting in acquire(), in arrival order
+        self._waiting = []
+        self._condition = None
+        self._direction = 1
+        self._failed_moves = 0
+        self._converged = not self.auto
+        self._best_throughput = 0.0
+        self._best_limit = self.limit
+        self._reset_window()
+
+    @property
+    def max_workers(self):
+        """Upper bound on the worker threads the controller may ever use"""
+        return self.max_limit
+
+    def _reset_window(self):
+        self._window_start = time.monotonic()
+        self._window_audio = 0.0
+        self._window_done = 0
+
+    def _admissible(self, waiter):
+        if self._running >= self.limit:
+            return False
+        position = self._waiting.index(waiter)
+        if any(overtaken >= self.MAX_OVERTAKES for _, overtaken in self._waiting[:position]):
+            return False
+        if self.memory_budget is None or not self.memory_in_use:
+            return True
+        return self.memory_in_use + waiter[0] <= self.memory_budget
+
+    async def acquire(self, memory=0):
+        """Wait for a slot, and for memory bytes of the budget if there is one"""
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        async with self._condition:
+            waiter = [memory, 0]
+            self._waiting.append(waiter)
+            try:
+                await self._condition.wait_for(lambda: self._admissible(waiter))
+                for earlier in self._waiting[:self._waiting.index(waiter)]:
+                    earlier[1] += 1
+            finally:
+                self._waiting.remove(waiter)
+                # Jobs held back behind this one may be admissible now
+                self._condition.notify_all()
+            self._running += 1
+            self.memory_in_use += memory
+
+    async def release(self, memory=0):
+        async with self._condition:
+            self._running -= 1
+            self.memory_in_use -= memory
+            self._condition.notify_all()
+
+    async def record(self, audio_seconds):
+        """Account for a finished job and adapt the limit in auto mode"""
+        if self._converged or not audio_seconds:
+            return
+        self._window_audio += audio_seconds
+        self._window_done += 1
+
+        elapsed = time.monotonic() - self._window_start
+        if self._window_done < self.limit or elapsed < self.MIN_WINDOW_SECONDS:
+            return
+
+        throughput = self._window_audio / elapsed
+        self._adapt(throughput)
+        self._reset_window()
+        async with self._condition:
+            self._condition.notify_all()
+
+    def _adapt(self, throughput):
+        logging.debug(f"Concurrency {self.limit}: {throughput:.1f} audio sec/sec")
+        if throughput > self._best_throughput * (1 + self.IMPROVEMENT_THRESHOLD):
+            self._best_throughput = throughput
+            self._best_limit = self.limit
+            self._failed_moves = 0
+        else:
+            self._failed_moves += 1
+            if self._failed_moves >= 2:
+                # Neither direction helps any more; settle on the best limit seen
+                self.limit = self._best_limit
+                self._converged = True
+                logging.info(f"Concurrency settled at {self.limit}")
+                return
+            self._direction = -self._direction
+            self.limit = self._best_limit
+
+        new_limit = min(self.max_limit, max(self.min_limit, self.limit + self._direction * self._step))
+        if new_limit == self.limit:
+            self._direction = -self._direction
+            new_limit = min(self.max_limit, max(self.min_limit, self.limit + self._direction * self._step))
+        self.limit = new_limit
+        logging.info(f"Concurrency adjusted to {self.limit}")
@@ -0,0 +1,294 @@
+# segmented.py
+"""
+Parallel encoding of one long file as several time segments.
+
+Every segment is encoded by its own ffmpeg process, starting a few MP3
+frames early (pre-roll) and ending a few frames late (post-roll) so the
+encoder sees the same surrounding audio it would in a single pass. Segment
+boundaries lie on the MP3 frame grid, so frame k of every segment lines up
+with a frame of the single-pass stream; the overlapping frames are dropped
+and the rest are concatenated. The bit reservoir is disabled so no frame
+borrows bits from a frame of another segment.
+
+The joined stream starts with the first segment's Xing/LAME header, patched
+with the total frame count and the last segment's end padding, and is then
+remuxed by ffmpeg, which rewrites the header (seek table, sizes, CRCs) and
+copies the source's metadata.
+"""
+
+import logging
+import math
+import os
+import tempfile
+from collections import namedtuple
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from .ffmpeg_engine import FFmpegEngine
+from .media_info import probe_decoded
+from .process_registry import ProcessRegistry
+
+# Layer III bitrates in kbit/s by index, per MPEG version bits
+_BITRATES = {
+    3: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),  # MPEG-1
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),  # MPEG-2
+    0: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),  # MPEG-2.5
+}
+_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+MP3_SAMPLE_RATES = frozenset(rate for rates in _SAMPLE_RATES.values() for rate in rates)
+
+# start/encode_start are sample offsets; frames is None for the last segment (keep to the end)
+Segment = namedtuple('Segment', ['index', 'start', 'frames', 'encode_start', 'encode_samples',
+                                 'skip_frames'])
+
+
+def samples_per_frame(sample_rate):
+    return 1152 if sample_rate >= 32000 else 576
+
+
+def frame_length(header):
+    """Size in bytes of the MPEG Layer III frame starting with header, or None"""
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    version = (header[1] >> 3) & 3
+    layer = (header[1] >> 1) & 3
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 3
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    bitrate = _BITRATES[version][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    padding = (header[2] >> 1) & 1
+    return (144 if version == 3 else 72) * bitrate // sample_rate + padding
+
+
+def frame_offsets(data):
+    """Offsets of the consecutive MP3 frames in data, plus the offset where they end"""
+    offset = 0
+    if data[:3] == b'ID3':
+        # Tag size is stored as a 28-bit "syncsafe" integer, plus an optional footer
+        size = (data[6] & 0x7F) << 21 | (data[7] & 0x7F) << 14 | (data[8] & 0x7F) << 7 | data[9] & 0x7F
+        offset = 10 + size + (10 if data[5] & 0x10 else 0)
+    offsets = []
+    while offset + 4 <= len(data):
+        length = frame_length(data[offset:offset + 4])
+        if length is None:
+            break
+        offsets.append(offset)
+        offset += length
+    return offsets, offset
+
+
+def _info_tag(frame):
+    """Offset of the Xing/Info tag in frame, or None for an audio frame"""
+    for tag in (b'Xing', b'Info'):
+        # The tag follows the side information, which is at most 32 bytes plus CRC
+        position = frame.find(tag, 4, 4 + 2 + 32 + 4)
+        if position != -1:
+            return position
+    return None
+
+
+class _InfoFrame:
+    """Field offsets inside a Xing/Info frame and its LAME extension"""
+
+    def __init__(self, frame, tag):
+        self.frame = bytearray(frame)
+        flags = int.from_bytes(frame[tag + 4:tag + 8], 'big')
+        position = tag + 8
+        self.frames_at = self.bytes_at = None
+        if flags & 1:
+            self.frames_at = position
+            position += 4
+        if flags & 2:
+            self.bytes_at = position
+            position += 4
+        if flags & 4:
+            position += 100  # Seek table
+        if flags & 8:
+            position += 4  # Quality indicator
+        # Encoder delay and end padding, 12 bits each, inside the LAME extension
+        self.padding_at = position + 21 if len(frame) >= position + 24 else None
+
+    @property
+    def delay_and_padding(self):
+        if self.padding_at is None:
+            return None, None
+        value = int.from_bytes(self.frame[self.padding_at:self.padding_at + 3], 'big')
+        return value >> 12, value & 0xFFF
+
+    def patch(self, frames, size, padding):
+        if self.frames_at is not None:
+            self.frame[self.frames_at:self.frames_at + 4] = frames.to_bytes(4, 'big')
+        if self.bytes_at is not None:
+            self.frame[self.bytes_at:self.bytes_at + 4] = size.to_bytes(4, 'big')
+        delay, _ = self.delay_and_padding
+        if delay is not None and padding is not None:
+            self.frame[self.padding_at:self.padding_at + 3] = (delay << 12 | padding).to_bytes(3, 'big')
+
+
+class SegmentedEncoder:
+    """Splits long inputs into frame-aligned segments encoded in parallel"""
+
+    # Frames encoded before/after each segment and then dropped
+    PREROLL_FRAMES = 8
+    POSTROLL_FRAMES = 8
+
+    def __init__(self, config, engine, ffmpeg_handler):
+        self.config = config
+        self.engine = engine
+        self.ffmpeg_handler = ffmpeg_handler
+
+    def applies(self, duration):
+        """Whether a file of duration seconds is long enough to be split"""
+        threshold = self.config.SEGMENT_THRESHOLD_SECONDS
+        return (threshold is not None and duration is not None and duration >= threshold
+                and self.config.MP3_ENCODER == "libmp3lame")
+
+    def plan(self, input_path):
+        """(segments, sample_rate) for input_path, or (None, None) for a single pass"""
+        info = probe_decoded(input_path, self.ffmpeg_handler)
+        if info is None or not info.duration or info.sample_rate not in MP3_SAMPLE_RATES:
+            # Other rates are resampled by ffmpeg, which would move the frame grid
+            return None, None
+        sample_rate = info.sample_rate
+        frame = samples_per_frame(sample_rate)
+        total = int(info.duration * sample_rate)
+        segment_frames = max(1, round(self.config.SEGMENT_SECONDS * sample_rate / frame))
+        count = math.ceil(total / (segment_frames * frame))
+        if count < 2:
+            return None, None
+
+        segments = []
+        for index in range(count):
+            start = index * segment_frames * frame
+            encode_start = max(0, start - self.PREROLL_FRAMES * frame)
+            last = index == count - 1
+            segments.append(Segment(
+                index=index,
+                start=start,
+                frames=None if last else segment_frames,
+                encode_start=encode_start,
+                encode_samples=None if last else (
+                    start + (segment_frames + self.POSTROLL_FRAMES) * frame - encode_start),
+                skip_frames=(start - encode_start) // frame,
+            ))
+        return segments, sample_rate
+
+    def convert(self, input_path: Path, output_path: Path, segments, sample_rate,
+                progress_callback=None, bitrate=None, output_args=()):
+        """Encode input_path segment by segment in parallel and join the result at output_path
+
+        bitrate and output_args are the output profile's settings; they must
+        not change the sample rate.
+        """
+        workers = min(len(segments), self.config.SEGMENT_WORKERS or os.cpu_count() or 1)
+        frame = samples_per_frame(sample_rate)
+        positions = {}
+        speeds = {}
+        # The segments' own registry, so a failed encode can stop its siblings
+        processes = ProcessRegistry(parent=self.engine.processes)
+        engine = FFmpegEngine(self.config, self.ffmpeg_handler, processes)
+
+        def encode(segment, path):
+            skip_seconds = segment.skip_frames * frame / sample_rate
+            keep_seconds = segment.frames * frame / sample_rate if segment.frames else math.inf
+
+            def report(seconds, speed):
+                positions[segment.index] = min(keep_seconds, max(0.0, seconds - skip_seconds))
+                speeds[segment.index] = speed or 0.0
+                if progress_callback:
+                    progress_callback(sum(positions.values()), sum(speeds.values()))
+
+            input_args = []
+            if segment.encode_start:
+                input_args += ['-ss', f"{segment.encode_start / sample_rate:.9f}"]
+            if segment.encode_samples is not None:
+                input_args += ['-t', f"{segment.encode_samples / sample_rate:.9f}"]
+            engine.convert(
+                input_path, path, progress_callback=report,
+                input_args=input_args,
+                bitrate=bitrate,
+                # Self-contained frames at a fixed rate, with a Xing/LAME header but no tags
+                output_args=[*output_args, '-ar', str(sample_rate), '-reservoir', '0',
+                             '-map_metadata', '-1', '-id3v2_version', '0']
+            )
+            speeds[segment.index] = 0.0
+
+        logging.info(f"Encoding {input_path} as {len(segments)} segments on {workers} workers")
+        with tempfile.TemporaryDirectory(prefix=".segments_", dir=output_path.parent) as folder:
+            paths = [Path(folder) / f"{segment.index:04d}.mp3" for segment in segments]
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="segment") as executor:
+                futures = [executor.submit(encode, segment, path)
+                           for segment, path in zip(segments, paths)]
+                done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+                failed = next((future for future in futures
+                               if future in done and future.exception() is not None), None)
+                if failed is not None:
+                    # The caller falls back to a single pass, so don't leave the other
+                    # segments' ffmpeg processes running; report the segment that failed
+                    for future in futures:
+                        future.cancel()
+                    processes.terminate_all(self.config.CANCEL_GRACE_SECONDS)
+                    raise failed.exception()
+
+            joined = Path(folder) / "joined.mp3"
+            self._join(segments, paths, joined)
+            self._finalize(joined, input_path, output_path)
+
+    @staticmethod
+    def _join(segments, paths, joined_path):
+        """Concatenate the kept frames of every segment behind a patched Info frame"""
+        header = None
+        padding = None
+        total_frames = 0
+        with open(joined_path, 'wb') as out:
+            for segment, path in zip(segments, paths):
+                data = Path(path).read_bytes()
+                offsets, end = frame_offsets(data)
+                if offsets:
+                    first_frame = data[offsets[0]:offsets[1] if len(offsets) > 1 else end]
+                    tag = _info_tag(first_frame)
+                    if tag is not None:
+                        info = _InfoFrame(first_frame, tag)
+                        if header is None:
+                            header = info
+                            out.write(header.frame)  # Placeholder, rewritten below
+                        padding = info.delay_and_padding[1]
+                        offsets = offsets[1:]
+                if header is None:
+                    raise RuntimeError("Segment encoder wrote no Xing/LAME header")
+
+                keep = offsets[segment.skip_frames:]
+                if segment.frames is not None:
+                    if len(keep) < segment.frames:
+                        raise RuntimeError(f"Segment {segment.index} is {len(keep)} frames short "
+                                           f"of {segment.frames}")
+                    keep = keep[:segment.frames]
+                    stop = offsets[segment.skip_frames + segment.frames] if (
+                        len(offsets) > segment.skip_frames + segment.frames) else end
+                else:
+                    stop = end
+                if keep:
+                    out.write(data[keep[0]:stop])
+                total_frames += len(keep)
+
+            header.patch(total_frames, out.tell(), padding)
+            out.seek(0)
+            out.write(header.frame)
+
+    def _finalize(self, joined_path, input_path, output_path):
+        """Remux the joined stream so ffmpeg writes a complete header and the source's tags"""
+        self.engine.run([
+            self.ffmpeg_handler.get_executable(),
+            *self.config.FFMPEG_PARAMS,
+            '-nostdin',
+            '-y',
+            '-i', str(joined_path),
+            '-i', str(input_path),
+            '-map', '0:a:0',
+            '-map_metadata', '1',
+            '-c:a', 'copy',
+            '-f', 'mp3',
+            str(output_path),
+        ])
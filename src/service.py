@@ -0,0 +1,412 @@
+# service.py
+"""
+HTTP transcoding service: POST an M4A to /convert and read the MP3 back
+from the same response while it is being encoded.
+
+    curl --data-binary @talk.m4a "http://localhost:8080/convert?bitrate=128k" -o talk.mp3
+
+Query parameters are those of an output profile: bitrate, channels
+(1/2/mono/stereo) and sample_rate. The MP3 is sent with chunked transfer
+encoding as ffmpeg produces it. An MP4 whose movie header (moov) precedes
+its media data is piped straight into ffmpeg, so the first MP3 bytes come
+back after the first few kilobytes of upload and memory per request is a
+few fixed-size buffers, however long the recording. Other MP4s cannot be
+demuxed from a pipe; they are spooled to a temporary file first.
+
+At most Config.SERVICE_MAX_CONCURRENT requests are transcoded at once.
+Up to Config.SERVICE_QUEUE_SIZE more wait (for SERVICE_QUEUE_TIMEOUT
+seconds) for a slot; anything beyond that gets 503 with Retry-After.
+Slow clients are throttled by TCP itself: while the response cannot be
+written, ffmpeg's output pipe fills up, ffmpeg stops reading its input and
+the upload stalls. Clients therefore have to read the response while still
+uploading (curl does); one that sends the whole body first stalls and is
+disconnected after Config.SERVICE_IO_TIMEOUT seconds without progress.
+
+A request without a body gets 400 and one ffmpeg cannot decode 422.
+
+    GET /health  -> {"active", "queued", "max_concurrent", "queue_size"}
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from .distributed import parse_address
+from .ffmpeg_engine import FFmpegEngine
+from .media_info import moov_before_mdat
+from .process_registry import ProcessRegistry
+from .profiles import OutputProfile
+
+CHUNK_SIZE = 64 * 1024
+# Upload bytes inspected for the moov/mdat order before falling back to spooling
+SNIFF_BYTES = 64 * 1024
+
+# Error replies: 400 for a request without a body, 422 when ffmpeg cannot decode it
+EMPTY_UPLOAD = "empty upload: POST the M4A as the request body"
+UNDECODABLE_UPLOAD = "the upload could not be decoded as audio"
+
+
+class AdmissionControl:
+    """Bounded concurrency plus a bounded, time-limited waiting queue"""
+
+    def __init__(self, max_concurrent, queue_size, queue_timeout):
+        self.max_concurrent = max_concurrent
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.queued = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """Take a slot, waiting in the queue if there is room; False if rejected"""
+        with self._condition:
+            if self.active < self.max_concurrent and not self.queued:
+                self.active += 1
+                return True
+            if self.queued >= self.queue_size:
+                return False
+            self.queued += 1
+            try:
+                admitted = self._condition.wait_for(lambda: self.active < self.max_concurrent,
+                                                    self.queue_timeout)
+                if admitted:
+                    self.active += 1
+                return admitted
+            finally:
+                self.queued -= 1
+
+    def release(self):
+        with self._condition:
+            self.active -= 1
+            self._condition.notify()
+
+    def snapshot(self):
+        with self._condition:
+            return {'active': self.active, 'queued': self.queued,
+                    'max_concurrent': self.max_concurrent, 'queue_size': self.queue_size}
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class MalformedUpload(Exception):
+    pass
+
+
+def _content_length(headers):
+    """The request's Content-Length, or None without one; ValueError if it is not a number"""
+    value = headers.get('Content-Length')
+    if value is None:
+        return None
+    if not value.strip().isdecimal():
+        raise ValueError(f"Invalid Content-Length {value!r}")
+    return int(value)
+
+
+def _chunked(headers):
+    return 'chunked' in headers.get('Transfer-Encoding', '').lower()
+
+
+class _RequestBody:
+    """Reads a request body sent with Content-Length or chunked transfer encoding
+
+    Raises UploadTooLarge once more than limit bytes have been read and
+    MalformedUpload on a broken chunk header.
+    """
+
+    def __init__(self, handler, limit):
+        self.rfile = handler.rfile
+        self.limit = limit
+        self.too_large = False
+        self.malformed = False
+        self.chunked = _chunked(handler.headers)
+        self.remaining = None if self.chunked else _content_length(handler.headers) or 0
+        self._chunk_left = 0
+        self._done = False
+        self.total = 0
+
+    def read(self, size=CHUNK_SIZE):
+        data = self._read(size)
+        self.total += len(data)
+        if self.total > self.limit:
+            self.too_large = True
+            raise UploadTooLarge(f"Upload exceeds {self.limit} bytes")
+        return data
+
+    def _read(self, size):
+        if self._done:
+            return b''
+        if not self.chunked:
+            if not self.remaining:
+                self._done = True
+                return b''
+            data = self.rfile.read1(min(size, self.remaining))
+            if not data:
+                raise ConnectionError("Client closed the connection before the end of the upload")
+            self.remaining -= len(data)
+            return data
+        if not self._chunk_left:
+            line = self.rfile.readline(1024)
+            if not line:
+                raise ConnectionError("Client closed the connection before the end of the upload")
+            try:
+                self._chunk_left = int(line.split(b';')[0].strip() or b'0', 16)
+            except ValueError:
+                self._chunk_left = -1
+            if self._chunk_left < 0:
+                self.malformed = True
+                raise MalformedUpload(f"Invalid chunk size line {line[:32]!r}")
+            if not self._chunk_left:
+                # Last chunk: skip optional trailers up to the closing empty line
+                while self.rfile.readline(1024).strip():
+                    pass
+                self._done = True
+                return b''
+        data = self.rfile.read1(min(size, self._chunk_left))
+        if not data:
+            raise ConnectionError("Client closed the connection before the end of the upload")
+        self._chunk_left -= len(data)
+        if not self._chunk_left:
+            self.rfile.readline(1024)  # CRLF after the chunk data
+        return data
+
+
+class _ServiceHandler(BaseHTTPRequestHandler):
+    server_version = "m4a-to-mp3-service"
+    protocol_version = "HTTP/1.1"
+    service = None  # Set on the per-server subclass, along with timeout
+
+    def log_message(self, format, *args):
+        logging.info(f"Service {self.address_string()}: {format % args}")
+
+    def _reply(self, status, body, headers=()):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if urlsplit(self.path).path == '/health':
+            self._reply(200, self.service.admission.snapshot())
+        else:
+            self._reply(404, {'error': 'not found'})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != '/convert':
+            self._reply(404, {'error': 'not found'})
+            return
+        try:
+            profile = self.service.profile_from_query(parse_qs(url.query))
+        except (TypeError, ValueError) as e:
+            self._reply(400, {'error': str(e)})
+            return
+        try:
+            length = _content_length(self.headers)
+        except ValueError as e:
+            # Without a usable length the body cannot be skipped, so the connection is dropped
+            self.close_connection = True
+            self._reply(400, {'error': str(e)})
+            return
+        if length is not None and length > self.service.config.SERVICE_MAX_UPLOAD_BYTES:
+            self.close_connection = True
+            self._reply(413, {'error': 'upload too large'})
+            return
+        if not length and not _chunked(self.headers):
+            self._reply(400, {'error': EMPTY_UPLOAD})
+            return
+
+        if not self.service.admission.acquire():
+            # The unread upload would be taken for the next request, so drop the connection
+            self.close_connection = True
+            self._reply(503, {'error': 'too many requests'},
+                        [('Retry-After', str(int(self.service.config.SERVICE_QUEUE_TIMEOUT)))])
+            return
+        try:
+            body = _RequestBody(self, self.service.config.SERVICE_MAX_UPLOAD_BYTES)
+            self.service.transcode(self, body, profile)
+        finally:
+            self.service.admission.release()
+
+    def start_stream(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'audio/mpeg')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+    def write_chunk(self, data):
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+        self.wfile.flush()
+
+    def end_stream(self):
+        self.wfile.write(b'0\r\n\r\n')
+        self.wfile.flush()
+
+
+class TranscodeService:
+    """Serves streaming M4A to MP3 conversions over HTTP"""
+
+    def __init__(self, config, ffmpeg_handler, address=None):
+        self.config = config
+        self.address = parse_address(address or config.SERVICE_LISTEN, default_port=8080)
+        self.processes = ProcessRegistry()
+        self.engine = FFmpegEngine(config, ffmpeg_handler, self.processes)
+        self.admission = AdmissionControl(
+            config.SERVICE_MAX_CONCURRENT or os.cpu_count() or 1,
+            config.SERVICE_QUEUE_SIZE,
+            config.SERVICE_QUEUE_TIMEOUT
+        )
+        self._server = None
+
+    def start(self):
+        """Start serving in a background thread; returns the bound (host, port)"""
+        if self._server is None:
+            handler = type('Handler', (_ServiceHandler,),
+                           {'service': self, 'timeout': self.config.SERVICE_IO_TIMEOUT})
+            self._server = ThreadingHTTPServer(self.address, handler)
+            self._server.daemon_threads = True
+            threading.Thread(target=self._server.serve_forever, name="service", daemon=True).start()
+            self.address = self._server.server_address[:2]
+            logging.info(f"Transcoding service listening on {self.address[0]}:{self.address[1]}")
+        return self.address
+
+    def serve_forever(self):
+        self.start()
+        try:
+            threading.Event().wait()
+        finally:
+            self.close()
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        self.processes.terminate_all(self.config.CANCEL_GRACE_SECONDS)
+
+    @staticmethod
+    def profile_from_query(query):
+        fields = {key: values[-1] for key, values in query.items()}
+        if fields.get('channels') in ('mono', 'stereo'):
+            fields['channels'] = 1 if fields['channels'] == 'mono' else 2
+        unknown = set(fields) - {'bitrate', 'channels', 'sample_rate'}
+        if unknown:
+            raise ValueError(f"Unknown parameter(s): {', '.join(sorted(unknown))}")
+        return OutputProfile(**fields)
+
+    def transcode(self, handler, body, profile):
+        """Convert the request body and stream the MP3 into handler's response"""
+        spool = None
+        try:
+            head = b''
+            streamable = None
+            while streamable is None and len(head) < SNIFF_BYTES:
+                data = body.read(SNIFF_BYTES - len(head))
+                if not data:
+                    break
+                head += data
+                streamable = moov_before_mdat(head)
+            if not head:
+                # A chunked upload without any data; nothing for ffmpeg to do
+                handler._reply(400, {'error': EMPTY_UPLOAD})
+                return
+
+            if streamable:
+                input_path = 'pipe:0'
+            else:
+                spool = tempfile.NamedTemporaryFile(prefix="m4a_upload_", suffix=".m4a",
+                                                    dir=self.config.SERVICE_SPOOL_DIR, delete=False)
+                with spool:
+                    spool.write(head)
+                    for data in iter(body.read, b''):
+                        spool.write(data)
+                input_path = spool.name
+
+            args = profile.encoder_args()
+            with self.engine.open_stream(input_path, profile.resolved_bitrate(self.config), args) as stream:
+                if streamable:
+                    feeder = threading.Thread(target=self._feed, args=(stream, head, body),
+                                              name="upload", daemon=True)
+                    feeder.start()
+                self._relay(handler, stream, body)
+        except UploadTooLarge:
+            handler.close_connection = True
+            handler._reply(413, {'error': 'upload too large'})
+        except MalformedUpload as e:
+            handler.close_connection = True
+            handler._reply(400, {'error': str(e)})
+        except (ConnectionError, TimeoutError) as e:
+            logging.info(f"Upload aborted: {e}")
+            handler.close_connection = True
+        finally:
+            if spool is not None:
+                os.unlink(spool.name)
+
+    @staticmethod
+    def _feed(stream, head, body):
+        """Copy the upload into ffmpeg; blocks (and so stops reading the socket) while ffmpeg is busy"""
+        try:
+            stream.stdin.write(head)
+            while True:
+                try:
+                    data = body.read()
+                except (UploadTooLarge, MalformedUpload, OSError) as e:
+                    # Kill ffmpeg so a cut-off upload never ends in what looks like a complete MP3
+                    logging.warning(f"Upload aborted: {e}")
+                    stream.process.kill()
+                    return
+                if not data:
+                    break
+                stream.stdin.write(data)
+        except (OSError, ValueError):
+            pass  # ffmpeg exited early; the relay reports it
+        finally:
+            try:
+                stream.stdin.close()
+            except OSError:
+                pass
+
+    @staticmethod
+    def _relay(handler, stream, body):
+        first = stream.read(CHUNK_SIZE)
+        if not first:
+            if body.too_large:
+                raise UploadTooLarge()
+            if body.malformed:
+                raise MalformedUpload("Invalid chunked upload")
+            # ffmpeg's own message is for the log; clients get to know what was wrong with the upload
+            try:
+                stream.wait()
+                logging.warning("Upload could not be decoded: ffmpeg produced no output")
+            except RuntimeError as e:
+                logging.warning(f"Upload could not be decoded: {e}")
+            handler.close_connection = True
+            handler._reply(422, {'error': UNDECODABLE_UPLOAD})
+            return
+
+        handler.start_stream()
+        try:
+            data = first
+            while data:
+                handler.write_chunk(data)
+                data = stream.read(CHUNK_SIZE)
+            stream.wait()
+        except OSError as e:
+            logging.info(f"Client disconnected during transcoding: {e}")
+            handler.close_connection = True
+            return
+        except RuntimeError as e:
+            # Too late for an error status: end without the last chunk so the client sees truncation
+            logging.error(f"Streaming transcode failed: {e}")
+            handler.close_connection = True
+            return
+        handler.end_stream()
@@ -0,0 +1,172 @@
+# startup_benchmark.py
+"""
+Startup benchmark: how long the application takes to become usable.
+
+Every measurement runs in a fresh child process, repeated --runs times,
+and is reported as min/median/max seconds:
+
+- import time of src.cli, src.converter and src.gui (interpreter start excluded)
+- wall time of `python -m src --help`
+- the FFmpeg capability probe, cold (no cache file) and from the disk cache
+- GUI time to interactive: main.py, or the frozen PyInstaller build given
+  with --exe, is started with M4A_TO_MP3_STARTUP_REPORT set; it records
+  the time until Tk is idle with the window built, then exits
+
+    python -m src.startup_benchmark --output startup.json
+    python -m src.startup_benchmark --exe dist/m4a_to_mp3.exe --runs 10
+
+The GUI measurements need a display; without one they are skipped.
+For a per-module breakdown use `python -X importtime -c "import src.gui"`.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+IMPORT_MODULES = ["src.cli", "src.converter", "src.gui"]
+STARTUP_REPORT_ENV = "M4A_TO_MP3_STARTUP_REPORT"
+GUI_TIMEOUT = 60
+
+_IMPORT_SNIPPET = """
+import sys, time
+start = time.perf_counter()
+__import__(sys.argv[1])
+print(time.perf_counter() - start)
+"""
+
+_PROBE_SNIPPET = """
+import json, sys, time
+from pathlib import Path
+from src.config import Config
+from src.ffmpeg_handler import FFmpegHandler
+from src.translations import Translations
+config = Config()
+config.FFMPEG_PROBE_CACHE = Path(sys.argv[1])
+start = time.perf_counter()
+capabilities = FFmpegHandler(config, Translations()).capabilities()
+print(json.dumps([time.perf_counter() - start, capabilities is not None]))
+"""
+
+
+def summarize(samples):
+    if not samples:
+        return None
+    return {'min': min(samples), 'median': statistics.median(samples), 'max': max(samples),
+            'runs': len(samples)}
+
+
+def run_child(command, env=None, timeout=GUI_TIMEOUT):
+    completed = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True,
+                               cwd=PROJECT_ROOT, env=env, timeout=timeout)
+    return completed.stdout.decode().strip().splitlines()[-1]
+
+
+def measure_imports(runs):
+    return {module: summarize([float(run_child([sys.executable, "-c", _IMPORT_SNIPPET, module]))
+                               for _ in range(runs)])
+            for module in IMPORT_MODULES}
+
+
+def measure_cli_help(runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-m", "src", "--help"], stdout=subprocess.DEVNULL,
+                       check=True, cwd=PROJECT_ROOT)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def measure_probe(runs):
+    """Probe time without a cache file, then with the file the first probe wrote"""
+    cold, cached = [], []
+    with tempfile.TemporaryDirectory() as directory:
+        cache_path = os.path.join(directory, "ffmpeg_probe.json")
+        for _ in range(runs):
+            if os.path.exists(cache_path):
+                os.unlink(cache_path)
+            for samples in (cold, cached):
+                seconds, found = json.loads(run_child([sys.executable, "-c", _PROBE_SNIPPET, cache_path]))
+                if not found:
+                    return None
+                samples.append(seconds)
+    return {'cold': summarize(cold), 'cached': summarize(cached)}
+
+
+def has_display():
+    return sys.platform in ("win32", "darwin") or bool(os.environ.get("DISPLAY")
+                                                         or os.environ.get("WAYLAND_DISPLAY"))
+
+
+def measure_gui(runs, exe=None):
+    """Time to interactive as reported by the app, plus the child's total wall time"""
+    command = [exe] if exe else [sys.executable, str(PROJECT_ROOT / "main.py")]
+    interactive, window, wall = [], [], []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as directory:
+            report_path = os.path.join(directory, "startup.json")
+            env = dict(os.environ, **{STARTUP_REPORT_ENV: report_path})
+            start = time.perf_counter()
+            subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                           check=True, cwd=PROJECT_ROOT, env=env, timeout=GUI_TIMEOUT)
+            wall.append(time.perf_counter() - start)
+            with open(report_path, encoding='utf-8') as f:
+                report = json.load(f)
+        interactive.append(report['interactive'])
+        window.append(report['window'])
+    return {'command': command, 'window_built': summarize(window),
+            'interactive': summarize(interactive), 'process_wall': summarize(wall)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.startup_benchmark",
+                                     description="Measure import times and GUI time to interactive")
+    parser.add_argument("--runs", type=int, default=5, help="Repetitions per measurement")
+    parser.add_argument("--exe", help="Frozen build to measure instead of main.py")
+    parser.add_argument("--no-gui", action="store_true", help="Skip the GUI measurements")
+    parser.add_argument("--output", help="Write results JSON here (default: stdout)")
+    args = parser.parse_args(argv)
+
+    results = {}
+    if not args.exe:
+        print("Measuring imports...", file=sys.stderr)
+        results['imports'] = measure_imports(args.runs)
+        print("Measuring CLI --help...", file=sys.stderr)
+        results['cli_help'] = measure_cli_help(args.runs)
+        print("Measuring FFmpeg probe...", file=sys.stderr)
+        results['ffmpeg_probe'] = measure_probe(args.runs)
+    if args.no_gui:
+        pass
+    elif not has_display():
+        print("Skipping GUI startup: no display", file=sys.stderr)
+    else:
+        print("Measuring GUI time to interactive...", file=sys.stderr)
+        results['gui'] = measure_gui(args.runs, args.exe)
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'frozen_build': args.exe,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+        },
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
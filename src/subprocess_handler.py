@@ -1,7 +1,11 @@
 import subprocess
 import sys
 
+from src import process_registry
+
 _original_popen = subprocess.Popen
+_original_call = subprocess.call
+_original_run = subprocess.run
 
 
 def _get_startupinfo():
@@ -13,7 +17,7 @@ def _get_startupinfo():
     return None
 
 
-class SuppressedPopen:
+class SuppressedPopen(_original_popen):
     def __init__(self, *args, **kwargs):
         if sys.platform == 'win32':
             kwargs['startupinfo'] = _get_startupinfo()
@@ -22,10 +26,12 @@ class SuppressedPopen:
             kwargs.setdefault('stdin', subprocess.PIPE)
             kwargs.setdefault('stdout', subprocess.PIPE)
             kwargs.setdefault('stderr', subprocess.PIPE)
-        self.process = _original_popen(*args, **kwargs)
+        super().__init__(*args, **kwargs)
 
-    def __getattr__(self, name):
-        return getattr(self.process, name)
+        # Let a cancelled batch terminate processes started by libraries such as pydub
+        registry = process_registry.current()
+        if registry is not None:
+            registry.register(self)
 
 
 def _suppressed_call(*args, **kwargs):
@@ -33,7 +39,7 @@ def _suppressed_call(*args, **kwargs):
         kwargs['startupinfo'] = _get_startupinfo()
         kwargs['creationflags'] = subprocess.CREATE_NO_WINDOW | subprocess.DETACHED_PROCESS
         kwargs['shell'] = False
-    return subprocess.call(*args, **kwargs)
+    return _original_call(*args, **kwargs)
 
 
 def _suppressed_run(*args, **kwargs):
@@ -41,7 +47,7 @@ def _suppressed_run(*args, **kwargs):
         kwargs['startupinfo'] = _get_startupinfo()
         kwargs['creationflags'] = subprocess.CREATE_NO_WINDOW | subprocess.DETACHED_PROCESS
         kwargs['shell'] = False
-    return subprocess.run(*args, **kwargs)
+    return _original_run(*args, **kwargs)
 
 
 # Replace subprocess methods
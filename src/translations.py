@@ -10,12 +10,16 @@ class Translations:
                 "convert": "Dönüştür",
                 "ready": "Hazır",
                 "converting": "Dönüştürülüyor: {}/{} dosya tamamlandı",
+                "converting_progress": "Dönüştürülüyor: {}/{} dosya tamamlandı - %{:.0f} - Kalan süre {} - {:.1f}x gerçek zamanlı",
                 "completed": "Dönüşüm tamamlandı!",
                 "files_to_convert": "Dönüştürülecek Dosyalar:",
                 "no_files": "Giriş klasöründe M4A dosyası bulunamadı",
                 "select_folders": "Lütfen giriş ve çıkış klasörlerini seçin",
                 "ffmpeg_required": "FFmpeg gerekli fakat bulunamadı. İndirip kurmak ister misiniz?",
                 "downloading_ffmpeg": "FFmpeg indiriliyor...",
+                "downloading_ffmpeg_progress": "FFmpeg indiriliyor... {:.1f} / {:.1f} MB",
+                "downloading_ffmpeg_bytes": "FFmpeg indiriliyor... {:.1f} MB",
+                "verifying_ffmpeg": "FFmpeg indirmesi doğrulanıyor...",
                 "installing_ffmpeg": "FFmpeg kuruluyor...",
                 "ffmpeg_success": "FFmpeg başarıyla kuruldu!",
                 "ffmpeg_failed": "FFmpeg kurulumu başarısız oldu: {}",
@@ -29,7 +33,12 @@ class Translations:
                 "select_all": "Tümünü Seç",
                 "remove_selected": "Seçilenleri Kaldır",
                 "stop": "Durdur",
-                "conversion_cancelled": "Dönüştürme iptal edildi"
+                "conversion_cancelled": "Dönüştürme iptal edildi",
+                "mirror_tree": "Klasör yapısını koru",
+                "resume": "Devam Et",
+                "nothing_to_resume": "Bu çıkış klasöründe yarım kalmış dönüşüm yok",
+                "distribute": "İşçilere dağıt",
+                "coordinator_listening": "İşçiler bekleniyor: {}"
             },
             "en": {
                 "title": "M4A to MP3 Converter",
@@ -40,12 +49,16 @@ class Translations:
                 "convert": "Convert",
                 "ready": "Ready",
                 "converting": "Converting: {}/{} files completed",
+                "converting_progress": "Converting: {}/{} files completed - {:.0f}% - ETA {} - {:.1f}x realtime",
                 "completed": "Conversion completed!",
                 "files_to_convert": "Files to Convert:",
                 "no_files": "No M4A files found in the input folder",
                 "select_folders": "Please select input and output folders",
                 "ffmpeg_required": "FFmpeg is required but not found. Would you like to download and install it?",
                 "downloading_ffmpeg": "Downloading FFmpeg...",
+                "downloading_ffmpeg_progress": "Downloading FFmpeg... {:.1f} / {:.1f} MB",
+                "downloading_ffmpeg_bytes": "Downloading FFmpeg... {:.1f} MB",
+                "verifying_ffmpeg": "Verifying the FFmpeg download...",
                 "installing_ffmpeg": "Installing FFmpeg...",
                 "ffmpeg_success": "FFmpeg has been installed successfully!",
                 "ffmpeg_failed": "Failed to install FFmpeg: {}",
@@ -59,7 +72,12 @@ class Translations:
                 "select_all": "Select All",
                 "remove_selected": "Remove Selected",
                 "stop": "Stop",
-                "conversion_cancelled": "Conversion cancelled"
+                "conversion_cancelled": "Conversion cancelled",
+                "mirror_tree": "Mirror folder structure",
+                "resume": "Resume",
+                "nothing_to_resume": "No unfinished conversions in this output folder",
+                "distribute": "Distribute to workers",
+                "coordinator_listening": "Waiting for workers on {}"
 
             }
         }
@@ -0,0 +1,212 @@
+# watcher.py
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import time
+
+from .scanner import DirectoryScanner
+
+# inotify event masks (see inotify(7))
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+_WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+def _scan(folder, scanner, root=None):
+    """Snapshot {path: (size, mtime_ns)} of the files scanner matches in folder
+
+    Subfolders are included if the scanner is recursive; root is the
+    watched folder the filters are relative to (default: folder).
+    """
+    root = root or folder
+    snapshot = {}
+    for directory in scanner.directories(folder, root):
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file() and scanner.matches(entry.path, root):
+                        stat = entry.stat()
+                        snapshot[entry.path] = (stat.st_size, stat.st_mtime_ns)
+        except OSError as e:
+            logging.error(f"Cannot scan watch folder {directory}: {e}")
+    return snapshot
+
+
+class InotifyBackend:
+    """Reports changed input paths using Linux inotify, without rescanning folders"""
+
+    def __init__(self, folders, scanner):
+        self._scanner = scanner
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._roots = list(folders)
+        self._folders = {}  # wd -> (directory, watched folder it is below)
+        for folder in folders:
+            if not self._add_watch(folder, folder):
+                error = ctypes.get_errno()
+                os.close(self._fd)
+                raise OSError(error, f"inotify_add_watch failed for {folder}")
+            self._add_tree(folder, folder)
+
+    def _add_watch(self, directory, root):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _WATCH_MASK)
+        if wd < 0:
+            return False
+        self._folders[wd] = (directory, root)
+        return True
+
+    def _add_tree(self, directory, root):
+        """Watch the folders below directory a recursive scan would descend into"""
+        for subdirectory in self._scanner.directories(directory, root):
+            if subdirectory != directory and not self._add_watch(subdirectory, root):
+                logging.warning(f"Cannot watch {subdirectory}: {os.strerror(ctypes.get_errno())}")
+
+    def changes(self, timeout):
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        changed = set()
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                # The kernel dropped events; fall back to one full rescan
+                logging.warning("inotify queue overflowed, rescanning watch folders")
+                for folder in self._roots:
+                    changed.update(_scan(folder, self._scanner))
+            elif wd in self._folders:
+                directory, root = self._folders[wd]
+                path = os.path.join(directory, name)
+                if not mask & IN_ISDIR:
+                    if self._scanner.matches(path, root):
+                        changed.add(path)
+                elif mask & (IN_CREATE | IN_MOVED_TO) and self._scanner.descends_into(path, root):
+                    # Files may have landed in the new folder before it was watched
+                    self._add_watch(path, root)
+                    self._add_tree(path, root)
+                    changed.update(_scan(path, self._scanner, root))
+        return changed
+
+    def close(self):
+        os.close(self._fd)
+
+
+class PollingBackend:
+    """Portable fallback that compares periodic directory snapshots"""
+
+    def __init__(self, folders, scanner):
+        self._folders = list(folders)
+        self._scanner = scanner
+        self._snapshot = {}
+        for folder in self._folders:
+            self._snapshot.update(_scan(folder, scanner))
+
+    def changes(self, timeout):
+        time.sleep(timeout)
+        current = {}
+        for folder in self._folders:
+            current.update(_scan(folder, self._scanner))
+        changed = {path for path, stat in current.items() if self._snapshot.get(path) != stat}
+        self._snapshot = current
+        return changed
+
+    def close(self):
+        pass
+
+
+class FolderWatcher:
+    """Yields batches of M4A files that appeared or changed in the watched folders.
+
+    A file is only handed out once its size and mtime have stayed the same
+    for settle_seconds, so recordings that are still being written are not
+    picked up half-finished. scanner is a DirectoryScanner whose include and
+    exclude patterns select the files and whose recursive flag decides
+    whether subfolders are watched too (default: *.m4a directly inside).
+    """
+
+    def __init__(self, folders, settle_seconds=2.0, poll_interval=1.0, include_existing=True,
+                 scanner=None):
+        self.folders = [os.path.abspath(folder) for folder in folders]
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.include_existing = include_existing
+        self.scanner = scanner or DirectoryScanner(recursive=False)
+        self._pending = {}
+        self._stopped = False
+        self._backend = self._create_backend()
+
+    def _create_backend(self):
+        if sys.platform.startswith('linux'):
+            try:
+                backend = InotifyBackend(self.folders, self.scanner)
+                logging.info(f"Watching {', '.join(self.folders)} with inotify")
+                return backend
+            except (OSError, AttributeError) as e:
+                logging.warning(f"inotify unavailable ({e}), falling back to polling")
+        logging.info(f"Polling {', '.join(self.folders)} every {self.poll_interval}s")
+        return PollingBackend(self.folders, self.scanner)
+
+    def _track(self, path, now):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self._pending.pop(path, None)
+            return
+        state = (stat.st_size, stat.st_mtime_ns)
+        previous = self._pending.get(path)
+        if previous is None or previous[0] != state:
+            self._pending[path] = (state, now)
+
+    def _collect_settled(self, now):
+        ready = []
+        for path in list(self._pending):
+            # Re-stat so writes that produced no event still reset the timer
+            self._track(path, now)
+            entry = self._pending.get(path)
+            if entry and now - entry[1] >= self.settle_seconds:
+                ready.append(path)
+                del self._pending[path]
+        return sorted(ready)
+
+    def stop(self):
+        self._stopped = True
+
+    def batches(self):
+        """Generator of lists of settled files; runs until stop() is called"""
+        if self.include_existing:
+            now = time.monotonic()
+            for folder in self.folders:
+                for path in _scan(folder, self.scanner):
+                    self._track(path, now - self.settle_seconds)
+        try:
+            while not self._stopped:
+                timeout = self.poll_interval
+                if self._pending:
+                    timeout = min(timeout, self.settle_seconds / 2)
+                now = time.monotonic()
+                for path in self._backend.changes(timeout):
+                    self._track(path, now)
+                ready = self._collect_settled(time.monotonic())
+                if ready:
+                    yield ready
+        finally:
+            self._backend.close()
@@ -0,0 +1,12 @@
+import pytest
+
+from src.config import Config
+
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    """A Config whose log file and per-user folders are inside tmp_path"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("USERPROFILE", str(tmp_path))
+    return Config()
@@ -0,0 +1,74 @@
+import json
+import math
+import subprocess
+
+import pytest
+
+from src import cli
+
+
+@pytest.fixture
+def no_ffmpeg(config, tmp_path, monkeypatch):
+    """No FFmpeg on PATH or in the install folder; records every attempt to start a process"""
+    empty = tmp_path / "empty-bin"
+    empty.mkdir()
+    monkeypatch.setenv("PATH", str(empty))
+    spawned = []
+
+    def popen(args, *rest, **kwargs):
+        spawned.append(args)
+        raise FileNotFoundError(args[0])
+
+    monkeypatch.setattr(subprocess, "Popen", popen)
+    return spawned
+
+
+@pytest.fixture
+def clips(tmp_path):
+    """Two second-long AAC clips in tmp_path/in, encoded with PyAV"""
+    av = pytest.importorskip("av")
+    folder = tmp_path / "in"
+    folder.mkdir()
+    for name, frequency in (("a.m4a", 440), ("b.m4a", 660)):
+        with av.open(str(folder / name), "w") as container:
+            stream = container.add_stream("aac", rate=44100)
+            stream.layout = "mono"
+            for start in range(0, 44100, 1024):
+                frame = av.AudioFrame(format="s16", layout="mono", samples=1024)
+                frame.sample_rate = 44100
+                frame.pts = start
+                samples = bytearray()
+                for i in range(start, start + 1024):
+                    value = int(8000 * math.sin(2 * math.pi * frequency * i / 44100))
+                    samples += value.to_bytes(2, "little", signed=True)
+                frame.planes[0].update(bytes(samples))
+                for packet in stream.encode(frame):
+                    container.mux(packet)
+            for packet in stream.encode(None):
+                container.mux(packet)
+    return folder
+
+
+def events(capsys):
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+def test_inprocess_engine_runs_without_ffmpeg(no_ffmpeg, clips, tmp_path, capsys):
+    pytest.importorskip("lameenc")
+    output = tmp_path / "out"
+
+    assert cli.main([str(clips), "-o", str(output), "--engine", "inprocess", "--no-cache"]) == 0
+
+    assert no_ffmpeg == []
+    assert sorted(path.name for path in output.glob("*.mp3")) == ["a.mp3", "b.mp3"]
+    assert all(path.stat().st_size > 1000 for path in output.glob("*.mp3"))
+    assert not any(event['event'] in ("error", "file_failed") for event in events(capsys))
+
+
+@pytest.mark.parametrize("options", [["--engine", "ffmpeg"], ["--engine", "inprocess", "--normalize"]])
+def test_missing_ffmpeg_is_reported_when_needed(no_ffmpeg, tmp_path, capsys, options):
+    (tmp_path / "in").mkdir()
+    (tmp_path / "in" / "a.m4a").write_bytes(b"")
+
+    assert cli.main([str(tmp_path / "in"), "-o", str(tmp_path / "out"), *options]) == 2
+    assert events(capsys) == [{'event': 'error', 'error': 'FFmpeg not found'}]
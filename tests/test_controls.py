@@ -0,0 +1,46 @@
+import tkinter as tk
+
+import pytest
+
+from src.components.controls import ControlsComponent
+from src.translations import Translations
+
+
+@pytest.fixture
+def controls(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # config.json is read from the working directory
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        pytest.skip("no display")
+    controls = ControlsComponent(root, Translations(), None)
+    controls.start_conversion = controls.resume_conversion = controls.stop_conversion = lambda: None
+    yield controls
+    root.destroy()
+
+
+def enabled(button):
+    return not button.instate(['disabled'])
+
+
+@pytest.mark.parametrize("click", ["_handle_convert_click", "_handle_resume_click"])
+def test_buttons_follow_batch_state(controls, click):
+    controls.update_progress(40)
+    getattr(controls, click)()
+    assert not enabled(controls.convert_btn)
+    assert not enabled(controls.resume_btn)
+    assert enabled(controls.stop_btn)
+
+    controls.set_converting_state(False)
+    assert enabled(controls.convert_btn)
+    assert enabled(controls.resume_btn)
+    assert not enabled(controls.stop_btn)
+    assert controls.progress_var.get() == 0
+
+
+def test_stop_reenables_convert_and_resume(controls):
+    controls._handle_convert_click()
+    controls._handle_stop_click()
+    assert enabled(controls.convert_btn)
+    assert enabled(controls.resume_btn)
+    assert not enabled(controls.stop_btn)
@@ -0,0 +1,127 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from src.distributed import JobBoard
+from src.profiles import OutputProfile
+
+LEASE_SECONDS = 0.05
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+def settle(loop):
+    """Run the callbacks RemoteJob.resolve scheduled on loop"""
+    loop.run_until_complete(asyncio.sleep(0))
+
+
+def submit(board, loop, name="talk"):
+    return board.submit(f"{name}.m4a", [(OutputProfile(), f"{name}.mp3")], 60.0, loop)
+
+
+def expire():
+    time.sleep(LEASE_SECONDS * 3)
+
+
+def test_submit_makes_paths_absolute(loop):
+    job = submit(JobBoard(LEASE_SECONDS, 3), loop)
+    assert job.source.is_absolute()
+    assert all(path.is_absolute() for _, path in job.outputs)
+    assert str(job.source) == os.path.abspath("talk.m4a")
+
+
+def test_lease_hands_out_each_job_once(loop):
+    board = JobBoard(LEASE_SECONDS, 3)
+    job = submit(board, loop)
+    assert board.lease("a") is job
+    assert board.lease("b") is None
+    assert job.worker == "a" and job.attempts == 1
+
+
+def test_expired_lease_is_leased_again(loop):
+    board = JobBoard(LEASE_SECONDS, 3)
+    job = submit(board, loop)
+    first = board.lease("a")
+    token = first.token
+    expire()
+
+    again = board.lease("b")
+    assert again is job
+    assert job.worker == "b"
+    assert job.attempts == 2
+    assert job.token != token
+    assert job.stale_tokens == [token]
+
+
+def test_retried_job_goes_before_queued_ones(loop):
+    board = JobBoard(LEASE_SECONDS, 3)
+    retried = submit(board, loop, "first")
+    queued = submit(board, loop, "second")
+    board.lease("a")
+    expire()
+    assert board.lease("b") is retried
+    assert board.lease("b") is queued
+
+
+def test_heartbeat_keeps_lease(loop):
+    board = JobBoard(LEASE_SECONDS, 3)
+    job = submit(board, loop)
+    board.lease("a")
+    for _ in range(5):
+        time.sleep(LEASE_SECONDS / 2)
+        assert board.heartbeat("a", {job.id: {'token': job.token}}) == []
+    assert board.lease("b") is None
+    assert job.attempts == 1
+
+
+def test_stale_token_is_rejected(loop):
+    board = JobBoard(LEASE_SECONDS, 3)
+    job = submit(board, loop)
+    stale = board.lease("a").token
+    expire()
+    current = board.lease("b").token
+
+    assert board.heartbeat("a", {job.id: {'token': stale}}) == [job.id]
+    assert board.holder(job.id, stale) is None
+    assert not board.finish(job.id, stale, result="from a")
+
+    assert board.holder(job.id, current) is job
+    assert board.finish(job.id, current, result="from b")
+    settle(loop)
+    assert job.future.result() == "from b"
+    # The job is gone once finished; a late report with the old token changes nothing
+    assert not board.finish(job.id, current, result="again")
+    assert board.heartbeat("b", {job.id: {'token': current}}) == [job.id]
+
+
+def test_failure_is_reported_to_coordinator(loop):
+    board = JobBoard(LEASE_SECONDS, 3)
+    job = submit(board, loop)
+    token = board.lease("a").token
+    assert board.finish(job.id, token, error=RuntimeError("ffmpeg exited with code 1"))
+    settle(loop)
+    with pytest.raises(RuntimeError, match="code 1"):
+        job.future.result()
+
+
+def test_job_fails_after_max_attempts(loop):
+    board = JobBoard(LEASE_SECONDS, 2)
+    job = submit(board, loop)
+    board.lease("a")
+    expire()
+    assert board.lease("b") is job
+    expire()
+
+    assert board.lease("c") is None
+    settle(loop)
+    with pytest.raises(RuntimeError, match="Lost 2 workers"):
+        job.future.result()
+    assert board.status()['queued'] == 0
+    assert board.status()['leased'] == 0
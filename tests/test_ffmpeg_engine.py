@@ -0,0 +1,47 @@
+import sys
+
+import pytest
+
+from src.ffmpeg_engine import FFmpegEngine
+from src.ffmpeg_handler import FFmpegHandler
+from src.process_registry import ProcessRegistry
+from src.translations import Translations
+
+pytestmark = pytest.mark.skipif(sys.platform == 'win32', reason="the stand-in ffmpeg is a shell script")
+
+
+class RecordingRegistry(ProcessRegistry):
+    def __init__(self):
+        super().__init__()
+        self.started = []
+
+    def register(self, process):
+        self.started.append(process)
+        super().register(process)
+
+
+@pytest.fixture
+def hanging_ffmpeg(tmp_path):
+    """Reports one progress block, then never exits on its own"""
+    script = tmp_path / "ffmpeg"
+    script.write_text("#!/bin/sh\nprintf 'out_time_us=1000000\\nspeed=2.0x\\nprogress=continue\\n'\nexec sleep 60\n")
+    script.chmod(0o755)
+    return str(script)
+
+
+def test_failing_progress_callback_kills_ffmpeg(config, hanging_ffmpeg):
+    processes = RecordingRegistry()
+    engine = FFmpegEngine(config, FFmpegHandler(config, Translations()), processes)
+    reports = []
+
+    def progress(seconds, speed):
+        reports.append((seconds, speed))
+        raise ValueError("listener went away")
+
+    with pytest.raises(ValueError, match="listener went away"):
+        engine.run([hanging_ffmpeg, '-i', 'in.m4a', 'out.mp3'], progress)
+
+    assert reports == [(1.0, 2.0)]
+    [process] = processes.started
+    assert process.poll() is not None
+    assert processes.live_pids() == []
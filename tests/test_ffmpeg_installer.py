@@ -0,0 +1,197 @@
+import hashlib
+import http.client
+import io
+import json
+import os
+import sys
+import tarfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src import ffmpeg_installer
+from src.ffmpeg_installer import FFmpegBuild, FFmpegInstaller, InstallError, binary_names
+
+ETAG = '"build-1"'
+
+
+class FileServer:
+    """Serves fixed files with ETag and Range support; can cut responses short
+
+    cuts lists byte counts: each of the next responses stops after that
+    many body bytes and drops the connection.
+    """
+
+    def __init__(self, files):
+        self.files = files
+        self.cuts = []
+        self.requests = []  # (path, Range, If-Range) of each GET
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                server.requests.append((self.path, self.headers.get('Range'), self.headers.get('If-Range')))
+                data = server.files.get(self.path)
+                if data is None:
+                    self.send_error(404)
+                    return
+                start, status = 0, 200
+                requested = self.headers.get('Range')
+                if requested and self.headers.get('If-Range') in (None, ETAG):
+                    start = int(requested.split('=')[1].rstrip('-'))
+                    if start >= len(data):
+                        self.send_response(416)
+                        self.send_header('Content-Range', f"bytes */{len(data)}")
+                        self.send_header('Content-Length', '0')
+                        self.end_headers()
+                        return
+                    status = 206
+                body = data[start:]
+                self.send_response(status)
+                self.send_header('ETag', ETAG)
+                self.send_header('Content-Length', str(len(body)))
+                if status == 206:
+                    self.send_header('Content-Range', f"bytes {start}-{len(data) - 1}/{len(data)}")
+                self.end_headers()
+                if server.cuts:
+                    self.wfile.write(body[:server.cuts.pop(0)])
+                    self.close_connection = True
+                    return
+                self.wfile.write(body)
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}{path}"
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def installer_config(config, tmp_path, monkeypatch):
+    config.FFMPEG_INSTALL_DIR = tmp_path / "ffmpeg"
+    config.FFMPEG_DOWNLOAD_RETRIES = 2
+    config.FFMPEG_DOWNLOAD_TIMEOUT = 5
+    # Retries back off for seconds; not in tests
+    monkeypatch.setattr(ffmpeg_installer.time, "sleep", lambda seconds: None)
+    return config
+
+
+@pytest.fixture
+def payload():
+    return os.urandom(300_000)
+
+
+@pytest.fixture
+def server(payload):
+    server = FileServer({'/build.tar.xz': payload})
+    yield server
+    server.close()
+
+
+def make_archive(contents):
+    """A tar.xz holding each name under a release folder, as the FFmpeg builds are laid out"""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w:xz') as archive:
+        for name, data in contents.items():
+            member = tarfile.TarInfo(f"ffmpeg-master-latest/bin/{name}")
+            member.size = len(data)
+            archive.addfile(member, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+def test_download_resumes_after_connection_drops(installer_config, server, payload, tmp_path):
+    server.cuts = [100_000]
+    progress = []
+    installer = FFmpegInstaller(installer_config, progress_callback=lambda done, total: progress.append(done))
+
+    target = installer.download(server.url('/build.tar.xz'), tmp_path / "build.tar.xz")
+
+    assert target.read_bytes() == payload
+    assert [request[1:] for request in server.requests] == [(None, None), ("bytes=100000-", ETAG)]
+    assert progress[-1] == len(payload)
+    assert not (tmp_path / "build.tar.xz.part").exists()
+    assert not (tmp_path / "build.tar.xz.state").exists()
+
+
+def test_gives_up_after_retries(installer_config, server, tmp_path):
+    server.cuts = [1000, 1000, 1000]
+    installer = FFmpegInstaller(installer_config)
+    with pytest.raises((OSError, http.client.HTTPException)):
+        installer.download(server.url('/build.tar.xz'), tmp_path / "build.tar.xz")
+    assert len(server.requests) == installer_config.FFMPEG_DOWNLOAD_RETRIES + 1
+    # What arrived is kept for the next attempt
+    assert (tmp_path / "build.tar.xz.part").stat().st_size == 3000
+
+
+def test_part_file_from_earlier_run_is_resumed(installer_config, server, payload, tmp_path):
+    (tmp_path / "build.tar.xz.part").write_bytes(payload[:5000])
+    (tmp_path / "build.tar.xz.state").write_text(json.dumps({'validator': ETAG}))
+
+    target = FFmpegInstaller(installer_config).download(server.url('/build.tar.xz'), tmp_path / "build.tar.xz")
+
+    assert target.read_bytes() == payload
+    assert server.requests[0][1] == "bytes=5000-"
+
+
+def test_changed_build_restarts_download(installer_config, server, payload, tmp_path):
+    (tmp_path / "build.tar.xz.part").write_bytes(b"x" * 5000)
+    (tmp_path / "build.tar.xz.state").write_text(json.dumps({'validator': '"older-build"'}))
+
+    target = FFmpegInstaller(installer_config).download(server.url('/build.tar.xz'), tmp_path / "build.tar.xz")
+
+    assert target.read_bytes() == payload
+
+
+def test_complete_part_file_is_accepted(installer_config, server, payload, tmp_path):
+    (tmp_path / "build.tar.xz.part").write_bytes(payload)
+    (tmp_path / "build.tar.xz.state").write_text(json.dumps({'validator': ETAG}))
+
+    target = FFmpegInstaller(installer_config).download(server.url('/build.tar.xz'), tmp_path / "build.tar.xz")
+
+    assert target.read_bytes() == payload
+
+
+def test_checksum_mismatch_installs_nothing(installer_config, tmp_path):
+    archive = make_archive({name: b"binary" for name in binary_names()})
+    server = FileServer({'/build.tar.xz': archive})
+    installer_config.FFMPEG_SHA256 = hashlib.sha256(b"another build").hexdigest()
+    try:
+        build = FFmpegBuild(server.url('/build.tar.xz'), 'build.tar.xz', None)
+        with pytest.raises(InstallError, match="Checksum mismatch"):
+            FFmpegInstaller(installer_config).install(build)
+    finally:
+        server.close()
+    install_dir = installer_config.FFMPEG_INSTALL_DIR
+    assert not any((install_dir / name).exists() for name in binary_names())
+    assert not (install_dir.parent / 'downloads' / 'build.tar.xz').exists()
+
+
+def test_install_verifies_against_checksum_file(installer_config, tmp_path):
+    contents = {name: name.encode() * 100 for name in binary_names()}
+    archive = make_archive({**contents, 'README.txt': b"not installed"})
+    checksums = f"{hashlib.sha256(archive).hexdigest()}  build.tar.xz\n".encode()
+    server = FileServer({'/build.tar.xz': archive, '/checksums.sha256': checksums})
+    statuses = []
+    try:
+        build = FFmpegBuild(server.url('/build.tar.xz'), 'build.tar.xz', server.url('/checksums.sha256'))
+        installed = FFmpegInstaller(installer_config, status_callback=statuses.append).install(build)
+    finally:
+        server.close()
+
+    install_dir = installer_config.FFMPEG_INSTALL_DIR
+    assert installed == install_dir / binary_names()[0]
+    for name, data in contents.items():
+        assert (install_dir / name).read_bytes() == data
+        if sys.platform != 'win32':
+            assert os.access(install_dir / name, os.X_OK)
+    assert not (install_dir / 'README.txt').exists()
+    assert statuses == ["downloading_ffmpeg", "verifying_ffmpeg", "installing_ffmpeg"]
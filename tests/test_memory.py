@@ -0,0 +1,56 @@
+import subprocess
+import sys
+import time
+
+import pytest
+
+from src.memory import MemoryMonitor, process_peak_rss, process_rss
+from src.metrics import FileMetrics
+from src.process_registry import ProcessRegistry
+
+pytestmark = pytest.mark.skipif(process_rss() is None, reason="memory sampling needs /proc")
+
+
+@pytest.fixture
+def child():
+    """A child process that allocates about 50 MB and then waits"""
+    script = "import sys; data = bytearray(50 * 2 ** 20); sys.stdin.read()"
+    process = subprocess.Popen([sys.executable, "-c", script], stdin=subprocess.PIPE)
+    while (process_rss(process.pid) or 0) < 40 * 2 ** 20:
+        time.sleep(0.01)
+    yield process
+    process.stdin.close()
+    process.wait()
+
+
+def test_child_memory_is_attributed_to_its_job(child):
+    batch = ProcessRegistry()
+    own, other = ProcessRegistry(parent=batch), ProcessRegistry(parent=batch)
+    own.register(child)
+    monitor = MemoryMonitor(batch)
+    monitor.start()
+    converting, idle, in_process = FileMetrics("a.m4a"), FileMetrics("b.m4a"), FileMetrics("c.m4a")
+    try:
+        with monitor.track(converting, processes=own), monitor.track(idle, processes=other), \
+                monitor.track(in_process):
+            child_peak = process_peak_rss(child.pid)
+    finally:
+        monitor.stop()
+
+    assert converting.peak_rss_scope == "job"
+    assert converting.peak_rss == child_peak
+    # A job whose processes never ran has no measurement rather than another job's memory
+    assert idle.peak_rss is None
+    assert in_process.peak_rss_scope == "batch"
+    assert in_process.peak_rss > child_peak
+    assert monitor.peak >= in_process.peak_rss
+
+
+def test_shared_process_is_split_across_its_files(child):
+    processes = ProcessRegistry()
+    processes.register(child)
+    records = [FileMetrics(f"{name}.m4a") for name in "ab"]
+    monitor = MemoryMonitor(ProcessRegistry())
+    with monitor.track(*records, processes=processes):
+        pass
+    assert [record.peak_rss for record in records] == [process_peak_rss(child.pid) // 2] * 2
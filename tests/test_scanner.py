@@ -0,0 +1,32 @@
+import os
+
+from src.scanner import DirectoryScanner
+
+
+def test_scan_applies_filters_below_each_root(tmp_path):
+    for name in ("a.m4a", "b.M4A", "c.mp3", "drafts/d.m4a", "music/e.m4a", "music/drafts/f.m4a"):
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_bytes(b"")
+    scanner = DirectoryScanner(exclude=["drafts"], recursive=True)
+
+    found = sorted(os.path.relpath(path, tmp_path) for path in scanner.scan([tmp_path]))
+
+    assert found == ["a.m4a", "b.M4A", os.path.join("music", "e.m4a")]
+
+
+def test_named_files_match_like_scanned_ones(tmp_path):
+    scanner = DirectoryScanner(exclude=["drafts", "music/live/*"])
+    assert scanner.matches(str(tmp_path / "music" / "e.m4a"), str(tmp_path))
+    assert not scanner.matches(str(tmp_path / "c.mp3"), str(tmp_path))
+    assert not scanner.matches(str(tmp_path / "music" / "drafts" / "f.m4a"), str(tmp_path))
+    assert not scanner.matches(str(tmp_path / "music" / "live" / "g.m4a"), str(tmp_path))
+    # Without a root only the name counts
+    assert scanner.matches(str(tmp_path / "drafts" / "d.m4a"))
+
+
+def test_descends_into(tmp_path):
+    scanner = DirectoryScanner(exclude=["drafts"], recursive=True)
+    assert scanner.descends_into(str(tmp_path), str(tmp_path))
+    assert scanner.descends_into(str(tmp_path / "music" / "live"), str(tmp_path))
+    assert not scanner.descends_into(str(tmp_path / "music" / "drafts" / "old"), str(tmp_path))
+    assert not DirectoryScanner(recursive=False).descends_into(str(tmp_path / "music"), str(tmp_path))
@@ -0,0 +1,166 @@
+import http.client
+import json
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from src.ffmpeg_handler import FFmpegHandler
+from src.service import EMPTY_UPLOAD, UNDECODABLE_UPLOAD, AdmissionControl, TranscodeService
+from src.translations import Translations
+
+
+def test_admits_up_to_max_concurrent():
+    admission = AdmissionControl(2, 0, 1)
+    assert admission.acquire()
+    assert admission.acquire()
+    assert not admission.acquire()
+    admission.release()
+    assert admission.acquire()
+
+
+def test_queued_request_times_out():
+    admission = AdmissionControl(1, 1, 0.05)
+    assert admission.acquire()
+    assert not admission.acquire()
+    assert admission.snapshot()['queued'] == 0
+
+
+def test_release_admits_queued_request():
+    admission = AdmissionControl(1, 1, 5)
+    assert admission.acquire()
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(admission.acquire()))
+    waiter.start()
+    while admission.snapshot()['queued'] == 0:
+        time.sleep(0.001)
+    # The queue is full, so a third request is turned away at once
+    assert not admission.acquire()
+
+    admission.release()
+    waiter.join(5)
+    assert results == [True]
+    assert admission.snapshot()['active'] == 1
+
+
+@pytest.fixture
+def service(config):
+    config.SERVICE_MAX_CONCURRENT = 1
+    config.SERVICE_QUEUE_SIZE = 0
+    config.SERVICE_QUEUE_TIMEOUT = 7
+    service = TranscodeService(config, FFmpegHandler(config, Translations()), "127.0.0.1:0")
+    service.start()
+    yield service
+    service.close()
+
+
+def post(service, body=b"not really audio"):
+    connection = http.client.HTTPConnection(*service.address, timeout=5)
+    try:
+        connection.request('POST', '/convert', body, {'Content-Type': 'audio/mp4'})
+        response = connection.getresponse()
+        return response, json.loads(response.read())
+    finally:
+        connection.close()
+
+
+def test_busy_service_replies_503(service):
+    assert service.admission.acquire()
+    try:
+        response, reply = post(service)
+    finally:
+        service.admission.release()
+
+    assert response.status == 503
+    assert response.getheader('Retry-After') == "7"
+    assert reply == {'error': 'too many requests'}
+    assert service.admission.snapshot()['active'] == 0
+
+
+def test_rejected_upload_is_not_read_as_next_request(service):
+    request = (b"POST /convert HTTP/1.1\r\nHost: test\r\nContent-Length: 20\r\n\r\n"
+               b"GET /health HTTP/1.1")
+    assert service.admission.acquire()
+    try:
+        with socket.create_connection(service.address, timeout=5) as connection:
+            connection.sendall(request)
+            received = b""
+            # The server hangs up after the 503; a kept-open connection would time out here
+            while True:
+                chunk = connection.recv(65536)
+                if not chunk:
+                    break
+                received += chunk
+    finally:
+        service.admission.release()
+    assert received.startswith(b"HTTP/1.1 503")
+    assert received.count(b"HTTP/1.1") == 1
+
+
+def test_health_reports_admission_state(service):
+    assert service.admission.acquire()
+    try:
+        connection = http.client.HTTPConnection(*service.address, timeout=5)
+        connection.request('GET', '/health')
+        reply = json.loads(connection.getresponse().read())
+        connection.close()
+    finally:
+        service.admission.release()
+    assert reply == {'active': 1, 'queued': 0, 'max_concurrent': 1, 'queue_size': 0}
+
+
+@pytest.fixture
+def spawned(monkeypatch):
+    """Every process the service starts; they all fail to start"""
+    commands = []
+
+    def popen(args, *rest, **kwargs):
+        commands.append(args)
+        raise FileNotFoundError(args[0])
+
+    monkeypatch.setattr(subprocess, "Popen", popen)
+    return commands
+
+
+def raw_request(service, request):
+    """Send request as is and return the status line of the reply"""
+    with socket.create_connection(service.address, timeout=5) as connection:
+        connection.sendall(request)
+        return connection.makefile('rb').readline()
+
+
+@pytest.mark.parametrize("headers", [
+    b"Content-Length: 0\r\n",
+    b"",  # Neither Content-Length nor chunked
+    b"Transfer-Encoding: chunked\r\n\r\n0",  # Chunked, last chunk right away
+])
+def test_empty_upload_is_rejected_before_ffmpeg_starts(service, spawned, headers):
+    status = raw_request(service, b"POST /convert HTTP/1.1\r\nHost: test\r\n" + headers + b"\r\n\r\n")
+    assert status.startswith(b"HTTP/1.1 400")
+    assert spawned == []
+
+
+def test_empty_upload_reply(service, spawned):
+    response, reply = post(service, b"")
+    assert response.status == 400
+    assert reply == {'error': EMPTY_UPLOAD}
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason="the stand-in ffmpeg is a shell script")
+def test_undecodable_upload_gets_422(service, tmp_path, monkeypatch):
+    # Fails like ffmpeg does on input that is not audio
+    bin_folder = tmp_path / "bin"
+    bin_folder.mkdir()
+    ffmpeg = bin_folder / "ffmpeg"
+    ffmpeg.write_text("#!/bin/sh\ncat > /dev/null\n"
+                      "echo 'pipe:0: Invalid data found when processing input' >&2\nexit 183\n")
+    ffmpeg.chmod(0o755)
+    monkeypatch.setenv("PATH", str(bin_folder))
+
+    response, reply = post(service, b"this is not audio" * 100)
+
+    assert response.status == 422
+    assert reply == {'error': UNDECODABLE_UPLOAD}
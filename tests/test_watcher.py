@@ -0,0 +1,89 @@
+import queue
+import threading
+
+import pytest
+
+from src import watcher as watcher_module
+from src.scanner import DirectoryScanner
+from src.watcher import FolderWatcher
+
+
+@pytest.fixture(params=["inotify", "polling"])
+def backend(request, monkeypatch):
+    if request.param == "inotify":
+        if not watcher_module.sys.platform.startswith('linux'):
+            pytest.skip("inotify is Linux only")
+    else:
+        def unavailable(folders, scanner):
+            raise OSError("disabled for this test")
+
+        monkeypatch.setattr(watcher_module, "InotifyBackend", unavailable)
+    return request.param
+
+
+class Batches:
+    """Runs FolderWatcher.batches on a thread so a test can wait for batches with a timeout"""
+
+    def __init__(self, watcher):
+        self.watcher = watcher
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        for batch in self.watcher.batches():
+            self._queue.put(batch)
+
+    def until(self, path, timeout=5):
+        """Every file handed out until a batch with path arrives"""
+        seen = []
+        while path not in seen:
+            seen += self._queue.get(timeout=timeout)
+        return seen
+
+    def stop(self):
+        self.watcher.stop()
+        self._thread.join(5)
+
+
+def write(path, data=b"audio"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return str(path)
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "inbox"
+    for name in ("a.m4a", "skip-me.m4a", "notes.txt", "sub/b.m4a", "tmp/c.m4a"):
+        write(root / name)
+    return root
+
+
+def watch(root, scanner=None):
+    return Batches(FolderWatcher([root], settle_seconds=0, poll_interval=0.05, scanner=scanner))
+
+
+def test_default_watches_m4a_directly_inside(backend, tree):
+    batches = watch(tree)
+    try:
+        expected = [str(tree / "a.m4a"), str(tree / "skip-me.m4a")]
+        assert sorted(batches.until(expected[1])) == expected
+    finally:
+        batches.stop()
+
+
+def test_scanner_filters_and_recursion_apply(backend, tree):
+    scanner = DirectoryScanner(exclude=["skip-*", "tmp"], recursive=True)
+    batches = watch(tree, scanner)
+    try:
+        assert sorted(batches.until(str(tree / "sub" / "b.m4a"))) == [str(tree / "a.m4a"),
+                                                                      str(tree / "sub" / "b.m4a")]
+        # Excluded files and folders never show up, new subfolders are watched too
+        write(tree / "tmp" / "later.m4a")
+        write(tree / "skip-later.m4a")
+        write(tree / "new" / "deeper" / "later.txt")
+        added = write(tree / "new" / "deeper" / "later.m4a")
+        assert batches.until(added) == [added]
+    finally:
+        batches.stop()